@@ -6,5 +6,9 @@ load_dotenv(verbose=True)
 
 elastic_client = Elasticsearch(
     [os.environ['ELASTICSEARCH_URL']],
-    verify_certs=False
+    verify_certs=False,
+    http_compress=True,
+    connections_per_node=int(os.environ.get('ELASTICSEARCH_CONNECTIONS_PER_NODE', 16)),
+    retry_on_timeout=True,
+    max_retries=3
 )
@@ -6,12 +6,12 @@ from kafka import KafkaConsumer
 load_dotenv(verbose=True)
 
 
-def create_kafka_consumer(topic: str) -> KafkaConsumer:
+def create_kafka_consumer(topic: str, group_id: str = 'terror_events_group') -> KafkaConsumer:
     return KafkaConsumer(
         topic,
         bootstrap_servers=os.environ['BOOTSTRAP_SERVERS'],
         value_deserializer=lambda v: json.loads(v.decode('utf-8')),
-        group_id='terror_events_group',
+        group_id=group_id,
         auto_offset_reset='earliest',
         enable_auto_commit=False
     )
@@ -8,4 +8,9 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 load_dotenv(PROJECT_ROOT / '.env')
 
 EVENTS_GRAPH_NETWORKX = PROJECT_ROOT / 'data' / f'terror_graph.pickle'
+EVENTS_GRAPH_NETWORKX_LOG = PROJECT_ROOT / 'data' / 'terror_graph.log'
+EVENTS_GRAPH_COMPACT = PROJECT_ROOT / 'data' / 'terror_graph_compact.pickle'
+GROUP_COACTIVITY_GRAPH = PROJECT_ROOT / 'data' / 'group_coactivity.pickle'
+EVENTS_GRAPH_MEMGRAPH_MANIFEST = PROJECT_ROOT / 'data' / 'memgraph_sync_manifest.pickle'
+IMAGE_TILE_CACHE = PROJECT_ROOT / 'data' / 'image_tiles'
 EVENTS_GRAPH_NETWORKX_SECOND = PROJECT_ROOT / 'data' / f'terror_graph_{formatted_datetime()}.pickle'
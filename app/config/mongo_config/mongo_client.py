@@ -9,3 +9,5 @@ mongo_client = MongoClient(os.environ['MONGO_URL'])
 mongo_db = mongo_client[os.environ['MONGO_DB_NAME']]
 
 terror_events_collection = mongo_db['terror_events']
+
+centroids_collection = mongo_db['centroids']
@@ -1,12 +1,77 @@
 import os
-from neo4j import GraphDatabase
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Dict, Iterator
+
+from neo4j import GraphDatabase, READ_ACCESS
 from dotenv import load_dotenv
 
 load_dotenv(verbose=True)
 
+max_connection_pool_size = int(os.environ.get('NEO4J_MAX_POOL_SIZE', 50))
+connection_acquisition_timeout = float(os.environ.get('NEO4J_ACQUISITION_TIMEOUT_SECONDS', 30))
+max_connection_lifetime = float(os.environ.get('NEO4J_MAX_CONNECTION_LIFETIME_SECONDS', 3600))
+fetch_size = int(os.environ.get('NEO4J_FETCH_SIZE', 1000))
+
 # driver = GraphDatabase.driver(
 #     os.environ['NEO4J_URI'],
 #     auth=(os.environ['NEO4J_USER'], os.environ['NEO4J_PASSWORD'])
 # )
 
-driver = GraphDatabase.driver(os.environ['NEO4J_URI'])
+driver = GraphDatabase.driver(
+    os.environ['NEO4J_URI'],
+    max_connection_pool_size=max_connection_pool_size,
+    connection_acquisition_timeout=connection_acquisition_timeout,
+    max_connection_lifetime=max_connection_lifetime,
+    fetch_size=fetch_size,
+    keep_alive=True
+)
+
+_session_stats = {'active': 0, 'peak': 0, 'opened': 0, 'failed': 0}
+_session_stats_lock = Lock()
+
+
+@contextmanager
+def tracked_session(**session_config) -> Iterator:
+    with _session_stats_lock:
+        _session_stats['active'] += 1
+        _session_stats['opened'] += 1
+        _session_stats['peak'] = max(_session_stats['peak'], _session_stats['active'])
+
+    try:
+        with driver.session(**session_config) as session:
+            yield session
+    except Exception:
+        with _session_stats_lock:
+            _session_stats['failed'] += 1
+        raise
+    finally:
+        with _session_stats_lock:
+            _session_stats['active'] -= 1
+
+
+def read_session() -> Iterator:
+    return tracked_session(default_access_mode=READ_ACCESS, fetch_size=fetch_size)
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    # Sessions are counted by tracked_session, a session holds a pooled connection only while it runs a query
+    with _session_stats_lock:
+        metrics = {f'sessions_{name}': value for name, value in _session_stats.items()}
+
+    metrics['max_pool_size'] = max_connection_pool_size
+    metrics['acquisition_timeout_seconds'] = connection_acquisition_timeout
+    metrics['fetch_size'] = fetch_size
+
+    # The driver does not expose pool state publicly; read it best-effort.
+    pool = getattr(driver, '_pool', None)
+    try:
+        with pool.lock:
+            connections = [connection for queue in pool.connections.values() for connection in queue]
+        metrics['connections_open'] = len(connections)
+        metrics['connections_in_use'] = sum(1 for connection in connections if connection.in_use)
+        metrics['pool_utilization'] = metrics['connections_in_use'] / max_connection_pool_size
+    except Exception:
+        metrics['connections_open'] = metrics['connections_in_use'] = metrics['pool_utilization'] = None
+
+    return metrics
@@ -1,9 +1,13 @@
 from flask import Flask
 
 from app.routes.elasticsearch_routes import elastic_bp
+from app.routes.geojson_routes import geojson_bp
 from app.routes.graph_routes import graph_bp
+from app.routes.image_routes import image_bp
+from app.routes.popup_routes import popup_bp
 from app.routes.terror_events_routes import event_bp
 from app.services.consume_kafka_service import consume_real_time_for_mongo_and_elastic
+from app.utils.http_util import register_response_layer
 from app.utils.process_utils import run_parallel
 
 
@@ -12,14 +16,18 @@ def run_flask():
     app.register_blueprint(event_bp, url_prefix="/terror_events")
     app.register_blueprint(graph_bp, url_prefix="/graph_events")
     app.register_blueprint(elastic_bp, url_prefix="/search")
+    app.register_blueprint(geojson_bp, url_prefix="/geojson")
+    app.register_blueprint(popup_bp, url_prefix="/popup")
+    app.register_blueprint(image_bp, url_prefix="/images")
+    register_response_layer(app)
     app.run()
 
 
 STARTUP_TASKS = [
     run_flask,
-    consume_real_time_for_mongo_and_elastic()
+    consume_real_time_for_mongo_and_elastic
 ]
 
 
 if __name__ == '__main__':
-    run_parallel(STARTUP_TASKS)
+    run_parallel(*STARTUP_TASKS)
@@ -1,14 +1,27 @@
 import os
-from typing import Dict, Any, List, Optional
-from elasticsearch import Elasticsearch
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple, Iterable, Iterator
+from elasticsearch import Elasticsearch, ConnectionError, TransportError
 from dotenv import load_dotenv
-from elasticsearch.helpers import streaming_bulk
+from elasticsearch.helpers import parallel_bulk
 
 from app.config.elastic_config.elastic_connection import elastic_client
+from app.repositories.elastic_repositories.setup_es_indices import ensure_partition, get_event_year
 
 load_dotenv(verbose=True)
 
-terror_events_index = os.environ.get("TERROR_EVENTS_INDEX")
+bulk_thread_count = int(os.environ.get("ELASTIC_BULK_THREADS", 4))
+bulk_chunk_size = int(os.environ.get("ELASTIC_BULK_CHUNK_SIZE", 1000))
+bulk_max_chunk_bytes = int(os.environ.get("ELASTIC_BULK_MAX_CHUNK_BYTES", 5 * 1024 * 1024))
+bulk_max_retries = int(os.environ.get("ELASTIC_BULK_MAX_RETRIES", 3))
+
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+SUGGEST_FIELDS = {
+    "groups": "terror_groups",
+    "cities": "location.city",
+    "attack_types": "attack_types"
+}
 
 
 def transform_event_for_elastic(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -24,7 +37,8 @@ def transform_event_for_elastic(event: Dict[str, Any]) -> Dict[str, Any]:
         "terror_groups": event.get("terror_groups", []),
         "attack_types": event.get("attack_types", []),
         "target_details": event.get("target_details", []),
-        "data_source": event.get("data_source")
+        "data_source": event.get("data_source"),
+        "received_at": event.get("received_at")
     }
 
     if "latitude" in event and "longitude" in event:
@@ -41,31 +55,87 @@ def transform_event_for_elastic(event: Dict[str, Any]) -> Dict[str, Any]:
     return elastic_doc
 
 
+def generate_terror_event_actions(
+        events: Iterable[Dict[str, Any]],
+        elastic_client: Elasticsearch = elastic_client) -> Iterator[Dict[str, Any]]:
+    for event in events:
+        yield {
+            "_index": ensure_partition(elastic_client, get_event_year(event.get("event_date"))),
+            "_id": event["event_id"],
+            "_source": transform_event_for_elastic(event)
+        }
+
+
+def is_retryable_failure(result: Dict[str, Any]) -> bool:
+    status = result.get("status")
+    return not isinstance(status, int) or status in RETRYABLE_STATUSES
+
+
+def index_terror_events(
+        events: List[Dict[str, Any]],
+        elastic_client: Elasticsearch,
+        thread_count: int) -> Tuple[int, int, Set[str]]:
+    success, failed, retry_ids = 0, 0, set()
+
+    # Transport errors are raised rather than reported per document, so the whole batch can be retried
+    for ok, item in parallel_bulk(
+            elastic_client,
+            generate_terror_event_actions(events, elastic_client),
+            thread_count=thread_count,
+            chunk_size=bulk_chunk_size,
+            max_chunk_bytes=bulk_max_chunk_bytes,
+            raise_on_error=False,
+            raise_on_exception=True):
+        if ok:
+            success += 1
+            continue
+
+        result = next(iter(item.values()))
+        if is_retryable_failure(result):
+            retry_ids.add(result.get("_id"))
+        else:
+            failed += 1
+            print(f"Failed to index document {result.get('_id')}: {result.get('error')}")
+
+    return success, failed, retry_ids
+
+
 def save_terror_events_to_elastic(
         events: List[Dict[str, Any]],
-        elastic_client: Elasticsearch = elastic_client) -> None:
-    try:
-        actions = [
-            {
-                "_index": terror_events_index,
-                "_id": event["event_id"],
-                "_source": transform_event_for_elastic(event)
-            }
-            for event in events
-        ]
+        elastic_client: Elasticsearch = elastic_client,
+        thread_count: int = bulk_thread_count) -> None:
+    success, failed = 0, 0
+    pending = events
 
-        success, failed = 0, 0
-        for ok, item in streaming_bulk(elastic_client, actions, chunk_size=500, max_retries=3):
-            if ok:
-                success += 1
-            else:
-                failed += 1
-                print(f"Failed to index document: {item}")
+    for attempt in range(bulk_max_retries + 1):
+        try:
+            indexed, not_indexed, retry_ids = index_terror_events(pending, elastic_client, thread_count)
+        except (ConnectionError, TransportError) as e:
+            if attempt >= bulk_max_retries:
+                print(f"Error saving to Elasticsearch after {attempt + 1} attempts: {e}")
+                raise
+            # Documents written before the error are overwritten by _id, so the pending batch is sent again
+            print(f"Error saving to Elasticsearch, retrying batch (attempt {attempt + 1}/{bulk_max_retries}): {e}")
+            time.sleep(min(2 ** attempt, 30))
+            continue
+        except Exception as e:
+            print(f"Error saving to Elasticsearch: {e}")
+            raise
 
-        print(f"Indexed {success} documents to Elasticsearch. Failed: {failed}")
+        success += indexed
+        failed += not_indexed
+        if not retry_ids:
+            break
 
-    except Exception as e:
-        print(f"Error saving to Elasticsearch: {e}")
+        if attempt >= bulk_max_retries:
+            # Raised so the consumer does not commit offsets for events that were never indexed
+            raise Exception(f"{len(retry_ids)} documents could not be indexed after {attempt + 1} attempts")
+
+        print(f"Retrying {len(retry_ids)} documents (attempt {attempt + 1}/{bulk_max_retries})")
+        time.sleep(min(2 ** attempt, 30))
+        pending = [event for event in pending if event["event_id"] in retry_ids]
+
+    print(f"Indexed {success} documents to Elasticsearch. Failed: {failed}")
 
 
 def create_base_query(keywords: str, limit: Optional[int] = None) -> Dict[str, Any]:
@@ -90,6 +160,96 @@ def create_base_query(keywords: str, limit: Optional[int] = None) -> Dict[str, A
     return body
 
 
+def create_filtered_query(
+        keywords: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: Optional[int] = None
+) -> Dict[str, Any]:
+    if keywords:
+        body = create_base_query(keywords, limit)
+    else:
+        body = {"query": {"bool": {}}, "sort": [{"event_date": "desc"}]}
+        if limit:
+            body["size"] = limit
+
+    body["query"]["bool"]["filter"] = []
+
+    if start_date or end_date:
+        date_range = {}
+        if start_date:
+            date_range["gte"] = start_date
+        if end_date:
+            date_range["lte"] = end_date
+        body["query"]["bool"]["filter"].append({"range": {"event_date": date_range}})
+
+    return body
+
+
+def add_bounding_box_filter(
+        query: Dict[str, Any],
+        top_left: Tuple[float, float],
+        bottom_right: Tuple[float, float]
+) -> Dict[str, Any]:
+    query["query"]["bool"]["filter"].append({
+        "geo_bounding_box": {
+            "location.coordinates": {
+                "top_left": {"lat": top_left[0], "lon": top_left[1]},
+                "bottom_right": {"lat": bottom_right[0], "lon": bottom_right[1]}
+            }
+        }
+    })
+    return query
+
+
+def add_radius_filter(
+        query: Dict[str, Any],
+        center: Tuple[float, float],
+        distance: str
+) -> Dict[str, Any]:
+    query["query"]["bool"]["filter"].append({
+        "geo_distance": {
+            "distance": distance,
+            "location.coordinates": {"lat": center[0], "lon": center[1]}
+        }
+    })
+    return query
+
+
+def add_geotile_grid_aggregation(query: Dict[str, Any], zoom: int, max_cells: int = 10000) -> Dict[str, Any]:
+    query["size"] = 0
+    query.pop("sort", None)
+    query["aggs"] = {
+        "grid": {
+            "geotile_grid": {
+                "field": "location.coordinates",
+                "precision": zoom,
+                "size": max_cells
+            },
+            "aggs": {
+                "centroid": {"geo_centroid": {"field": "location.coordinates"}}
+            }
+        }
+    }
+    return query
+
+
+def create_suggest_query(prefix: str, field: str, limit: int = 10) -> Dict[str, Any]:
+    return {
+        "_source": False,
+        "suggest": {
+            "typeahead": {
+                "prefix": prefix,
+                "completion": {
+                    "field": f"{SUGGEST_FIELDS[field]}.suggest",
+                    "size": limit,
+                    "skip_duplicates": True
+                }
+            }
+        }
+    }
+
+
 def search_by_query(
         index_name: str,
         query: Dict[str, Any],
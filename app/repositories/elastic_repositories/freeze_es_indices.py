@@ -0,0 +1,27 @@
+import sys
+from typing import Optional
+from elasticsearch import Elasticsearch
+
+from app.repositories.elastic_repositories.setup_es_indices import (
+    terror_events_index, get_hot_years, get_partition_year
+)
+
+
+def freeze_historic_partitions(elastic_client: Elasticsearch, before_year: Optional[int] = None) -> None:
+    # Frozen partitions reject writes, so run this only once history replays into them are done
+    before_year = before_year or min(get_hot_years())
+
+    for index in elastic_client.indices.get_alias(index=f"{terror_events_index}-*-v*"):
+        year = get_partition_year(index)
+        if year is None or year >= before_year:
+            continue
+
+        elastic_client.indices.forcemerge(index=index, max_num_segments=1)
+        elastic_client.indices.put_settings(index=index, settings={"index.blocks.write": True})
+        print(f"Partition '{index}' force-merged and made read-only.")
+
+
+if __name__ == '__main__':
+    from app.config.elastic_config.elastic_connection import elastic_client
+
+    freeze_historic_partitions(elastic_client, int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,177 @@
+import os
+import time
+from datetime import datetime, timedelta, UTC
+from typing import Dict, Any, List, Optional, Tuple
+from elasticsearch import Elasticsearch
+from dotenv import load_dotenv
+
+from app.repositories.elastic_repositories.setup_es_indices import (
+    terror_events_index, MAPPING_VERSION, get_terror_events_mapping, get_partition_alias, get_partition_index,
+    get_partition_year
+)
+
+load_dotenv(verbose=True)
+
+reindex_slices = os.environ.get("ELASTIC_REINDEX_SLICES", "auto")
+
+CATCH_UP_MARGIN = timedelta(minutes=1)
+PROGRESS_POLL_SECONDS = 5
+
+
+def get_index_version(index_name: str) -> Optional[int]:
+    version = index_name.rsplit("-v", 1)[-1]
+    return int(version) if version.isdigit() else None
+
+
+def get_partitions_to_migrate(
+        elastic_client: Elasticsearch,
+        version: int = MAPPING_VERSION
+) -> List[Tuple[int, str]]:
+    partitions = []
+    for index, data in elastic_client.indices.get_alias(index=f"{terror_events_index}-*-v*").items():
+        year = get_partition_year(index)
+        index_version = get_index_version(index)
+        if year is None or index_version is None or get_partition_alias(year) not in data["aliases"]:
+            continue
+        if index_version < version:
+            partitions.append((year, index))
+    return sorted(partitions)
+
+
+def wait_for_reindex_task(elastic_client: Elasticsearch, task_id: str, label: str) -> Dict[str, Any]:
+    while True:
+        task = elastic_client.tasks.get(task_id=task_id)
+        status = task["task"]["status"]
+        copied = status["created"] + status["updated"] + status["version_conflicts"]
+        total = status["total"] or 0
+        percent = (copied / total * 100) if total else 100.0
+        print(f"[{label}] {copied}/{total} documents ({percent:.1f}%)")
+
+        if task.get("completed"):
+            response = task.get("response", {})
+            if response.get("failures"):
+                raise Exception(f"Reindex {label} failed: {response['failures'][:5]}")
+            return response
+
+        time.sleep(PROGRESS_POLL_SECONDS)
+
+
+def reindex_partition(
+        elastic_client: Elasticsearch,
+        source_index: str,
+        target_index: str,
+        label: str,
+        received_since: Optional[datetime] = None,
+        op_type: str = "index"
+) -> Dict[str, Any]:
+    source = {"index": source_index}
+    if received_since:
+        source["query"] = {"range": {"received_at": {"gte": received_since.isoformat()}}}
+
+    task = elastic_client.reindex(
+        body={
+            "source": source,
+            "dest": {"index": target_index, "op_type": op_type},
+            "conflicts": "proceed"
+        },
+        slices=reindex_slices,
+        refresh=True,
+        wait_for_completion=False
+    )
+    return wait_for_reindex_task(elastic_client, task["task"], label)
+
+
+def create_target_index(elastic_client: Elasticsearch, target_index: str) -> None:
+    body = get_terror_events_mapping()
+    body["settings"]["number_of_replicas"] = 0
+    body["settings"]["refresh_interval"] = "-1"
+    elastic_client.indices.create(index=target_index, body=body)
+
+
+def restore_target_settings(elastic_client: Elasticsearch, target_index: str) -> None:
+    replicas = get_terror_events_mapping()["settings"]["number_of_replicas"]
+    elastic_client.indices.put_settings(
+        index=target_index,
+        settings={"index": {"number_of_replicas": replicas, "refresh_interval": None}}
+    )
+    elastic_client.cluster.health(index=target_index, wait_for_status="yellow")
+
+
+def swap_aliases(elastic_client: Elasticsearch, source_index: str, target_index: str) -> None:
+    aliases = elastic_client.indices.get_alias(index=source_index)[source_index]["aliases"]
+
+    actions = []
+    for alias, options in aliases.items():
+        actions.append({"remove": {"index": source_index, "alias": alias}})
+        add = {"index": target_index, "alias": alias}
+        if options.get("is_write_index"):
+            add["is_write_index"] = True
+        actions.append({"add": add})
+
+    elastic_client.indices.update_aliases(actions=actions)
+    print(f"Aliases {sorted(aliases)} moved from '{source_index}' to '{target_index}'.")
+
+
+def migrate_partition(
+        elastic_client: Elasticsearch,
+        year: int,
+        source_index: str,
+        version: int = MAPPING_VERSION,
+        delete_source: bool = False
+) -> str:
+    target_index = get_partition_index(year, version)
+    print(f"Migrating '{source_index}' -> '{target_index}'")
+
+    if elastic_client.indices.exists(index=target_index):
+        elastic_client.indices.delete(index=target_index)
+    create_target_index(elastic_client, target_index)
+
+    copy_started = datetime.now(UTC) - CATCH_UP_MARGIN
+    reindex_partition(elastic_client, source_index, target_index, label=f"{year} copy")
+
+    catch_up_started = datetime.now(UTC) - CATCH_UP_MARGIN
+    reindex_partition(
+        elastic_client, source_index, target_index,
+        label=f"{year} catch-up", received_since=copy_started
+    )
+
+    restore_target_settings(elastic_client, target_index)
+    swap_aliases(elastic_client, source_index, target_index)
+
+    reindex_partition(
+        elastic_client, source_index, target_index,
+        label=f"{year} final catch-up", received_since=catch_up_started, op_type="create"
+    )
+
+    if delete_source:
+        elastic_client.indices.delete(index=source_index)
+        print(f"Deleted old partition '{source_index}'.")
+
+    return target_index
+
+
+def migrate_terror_events_indices(
+        elastic_client: Elasticsearch,
+        version: int = MAPPING_VERSION,
+        delete_source: bool = False
+) -> List[str]:
+    partitions = get_partitions_to_migrate(elastic_client, version)
+    if not partitions:
+        print(f"All '{terror_events_index}' partitions are already at mapping version {version}.")
+        return []
+
+    migrated = []
+    for year, source_index in partitions:
+        try:
+            migrated.append(migrate_partition(elastic_client, year, source_index, version, delete_source))
+        except Exception as e:
+            print(f"Error migrating partition '{source_index}': {e}")
+
+    print(f"Migrated {len(migrated)} of {len(partitions)} partitions to mapping version {version}.")
+    return migrated
+
+
+if __name__ == '__main__':
+    from app.config.elastic_config.elastic_connection import elastic_client
+
+    migrate_terror_events_indices(elastic_client)
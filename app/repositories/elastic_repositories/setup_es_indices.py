@@ -1,68 +1,252 @@
 import os
-from elasticsearch import Elasticsearch
+from datetime import datetime, timedelta, UTC
+from threading import Lock
+from typing import Dict, Any, Set, List, Optional
+from elasticsearch import Elasticsearch, NotFoundError, BadRequestError
 from dotenv import load_dotenv
 
 load_dotenv(verbose=True)
 
 terror_events_index = os.environ.get("TERROR_EVENTS_INDEX")
+terror_events_hot_alias = f"{terror_events_index}-hot"
 
+MAPPING_VERSION = 3
 
-def setup_terror_events_index(elastic_client: Elasticsearch) -> None:
-    if not elastic_client.indices.exists(index=terror_events_index):
-        mapping = {
-            "settings": {
-                "number_of_shards": 3,
-                "number_of_replicas": 1,
-                "analysis": {
-                    "analyzer": {
-                        "standard": {
-                            "type": "standard"
-                        }
+# Older mapping versions and converted legacy indices have no completion subfields
+terror_events_suggest_indices = f"{terror_events_index}-*-v{MAPPING_VERSION}"
+
+_known_partitions: Set[int] = set()
+_hot_alias_years: List[int] = []
+_partitions_lock = Lock()
+
+
+def get_terror_events_mapping() -> Dict[str, Any]:
+    return {
+        "settings": {
+            "number_of_shards": 3,
+            "number_of_replicas": 1,
+            "analysis": {
+                "analyzer": {
+                    "standard": {
+                        "type": "standard"
                     }
                 }
-            },
-            "mappings": {
-                "properties": {
-                    "event_id": {"type": "keyword"},
-                    "event_date": {"type": "date"},
-                    "location": {
-                        "properties": {
-                            "country": {"type": "keyword"},
-                            "city": {"type": "keyword"},
-                            "region": {"type": "keyword"},
-                            "province_or_state": {"type": "keyword"},
-                            "coordinates": {"type": "geo_point"}
-                        }
-                    },
-                    "description": {
-                        "type": "text",
-                        "analyzer": "standard",
-                        "fields": {
-                            "keyword": {"type": "keyword"}
-                        }
-                    },
-                    "summary": {
-                        "type": "text",
-                        "analyzer": "standard",
-                        "fields": {
-                            "keyword": {"type": "keyword"}
-                        }
-                    },
-                    "terror_groups": {
-                        "type": "keyword"
-                    },
-                    "attack_types": {
-                        "type": "keyword"
-                    },
-                    "target_details": {
-                        "type": "keyword"
-                    },
-                    "data_source": {"type": "keyword"}
-                }
+            }
+        },
+        "mappings": {
+            "properties": {
+                "event_id": {"type": "keyword"},
+                "event_date": {"type": "date"},
+                "location": {
+                    "properties": {
+                        "country": {"type": "keyword"},
+                        "city": {
+                            "type": "keyword",
+                            "fields": {
+                                "suggest": {"type": "completion"}
+                            }
+                        },
+                        "region": {"type": "keyword"},
+                        "province_or_state": {"type": "keyword"},
+                        "coordinates": {"type": "geo_point"}
+                    }
+                },
+                "description": {
+                    "type": "text",
+                    "analyzer": "standard",
+                    "fields": {
+                        "keyword": {"type": "keyword"}
+                    }
+                },
+                "summary": {
+                    "type": "text",
+                    "analyzer": "standard",
+                    "fields": {
+                        "keyword": {"type": "keyword"}
+                    }
+                },
+                "terror_groups": {
+                    "type": "keyword",
+                    "fields": {
+                        "suggest": {"type": "completion"}
+                    }
+                },
+                "attack_types": {
+                    "type": "keyword",
+                    "fields": {
+                        "suggest": {"type": "completion"}
+                    }
+                },
+                "target_details": {
+                    "type": "keyword"
+                },
+                "data_source": {"type": "keyword"},
+                "received_at": {"type": "date"}
             }
         }
+    }
+
+
+def get_partition_alias(year: int) -> str:
+    return f"{terror_events_index}-{year}"
+
+
+def get_partition_index(year: int, version: int = MAPPING_VERSION) -> str:
+    return f"{get_partition_alias(year)}-v{version}"
+
+
+def get_partition_year(index_name: str) -> Optional[int]:
+    year = index_name[len(terror_events_index) + 1:].split("-")[0]
+    return int(year) if year.isdigit() else None
+
+
+def get_event_year(event_date: Any) -> int:
+    if isinstance(event_date, datetime):
+        return event_date.year
+    if event_date:
+        try:
+            return int(str(event_date)[:4])
+        except ValueError:
+            pass
+    return datetime.now(UTC).year
+
+
+def get_hot_years() -> List[int]:
+    now = datetime.now(UTC)
+    return sorted({(now - timedelta(days=1)).year, now.year})
+
+
+def is_legacy_index(elastic_client: Elasticsearch) -> bool:
+    return bool(
+        elastic_client.indices.exists(index=terror_events_index)
+        and not elastic_client.indices.exists_alias(name=terror_events_index)
+    )
+
+
+def create_partition(elastic_client: Elasticsearch, year: int, read_alias: bool = True) -> bool:
+    aliases = {get_partition_alias(year): {"is_write_index": True}}
+    if read_alias:
+        aliases[terror_events_index] = {}
+
+    body = get_terror_events_mapping()
+    body["aliases"] = aliases
+    try:
+        elastic_client.indices.create(index=get_partition_index(year), body=body)
+    except BadRequestError as e:
+        # Another consumer process created the same partition first
+        if e.error != "resource_already_exists_exception":
+            raise
+        return False
+
+    print(f"Partition '{get_partition_index(year)}' created behind alias '{get_partition_alias(year)}'.")
+    return True
+
+
+def ensure_partition(elastic_client: Elasticsearch, year: int, read_alias: bool = True) -> str:
+    partition_alias = get_partition_alias(year)
+    if get_hot_years() != _hot_alias_years:
+        with _partitions_lock:
+            # parallel_bulk threads all notice the rollover, only the first one moves the alias
+            if get_hot_years() != _hot_alias_years:
+                refresh_hot_alias(elastic_client)
+    if year in _known_partitions:
+        return partition_alias
+
+    with _partitions_lock:
+        if year in _known_partitions:
+            return partition_alias
+
+        if not elastic_client.indices.exists_alias(name=partition_alias):
+            if create_partition(elastic_client, year, read_alias) and year in get_hot_years():
+                refresh_hot_alias(elastic_client)
+
+        _known_partitions.add(year)
+
+    return partition_alias
+
+
+def refresh_hot_alias(elastic_client: Elasticsearch) -> None:
+    hot_years = get_hot_years()
+    try:
+        current = list(elastic_client.indices.get_alias(name=terror_events_hot_alias).keys())
+    except NotFoundError:
+        current = []
+
+    actions = [{"remove": {"index": index, "alias": terror_events_hot_alias}} for index in current]
+    for year in hot_years:
+        if elastic_client.indices.exists_alias(name=get_partition_alias(year)):
+            actions.extend(
+                {"add": {"index": index, "alias": terror_events_hot_alias}}
+                for index in elastic_client.indices.get_alias(name=get_partition_alias(year))
+            )
+
+    if actions:
+        elastic_client.indices.update_aliases(actions=actions)
+        print(f"Alias '{terror_events_hot_alias}' now covers {hot_years}.")
+
+    # The alias is checked again once the years roll over, even if no new partition gets created
+    _hot_alias_years[:] = hot_years
+
+
+def get_legacy_years(elastic_client: Elasticsearch) -> List[int]:
+    results = elastic_client.search(index=terror_events_index, body={
+        "size": 0,
+        "aggs": {
+            "years": {
+                "date_histogram": {"field": "event_date", "calendar_interval": "year", "min_doc_count": 1}
+            }
+        }
+    })
+    return [int(bucket["key_as_string"][:4]) for bucket in results["aggregations"]["years"]["buckets"]]
+
+
+def convert_legacy_index(elastic_client: Elasticsearch) -> None:
+    print(f"Converting legacy index '{terror_events_index}' into yearly partitions...")
+
+    current_year = datetime.now(UTC).year
+    years = set(get_legacy_years(elastic_client)) | {current_year}
+    for year in sorted(years):
+        ensure_partition(elastic_client, year, read_alias=False)
+
+    elastic_client.reindex(
+        body={
+            "source": {"index": terror_events_index},
+            "dest": {"index": get_partition_index(current_year)},
+            "script": {
+                "lang": "painless",
+                "source": """
+                    def date = ctx._source.event_date;
+                    String year = date == null ? params.default_year : String.valueOf(date).substring(0, 4);
+                    ctx._index = params.prefix + year + params.suffix;
+                """,
+                "params": {
+                    "prefix": f"{terror_events_index}-",
+                    "suffix": f"-v{MAPPING_VERSION}",
+                    "default_year": str(current_year)
+                }
+            }
+        },
+        wait_for_completion=True,
+        refresh=True
+    )
+
+    elastic_client.indices.update_aliases(actions=[
+        {"remove_index": {"index": terror_events_index}},
+        *[{"add": {"index": get_partition_index(year), "alias": terror_events_index}} for year in sorted(years)]
+    ])
+    print(f"Legacy index '{terror_events_index}' replaced by {len(years)} partitions.")
+
+
+def setup_terror_events_index(elastic_client: Elasticsearch) -> None:
+    if is_legacy_index(elastic_client):
+        convert_legacy_index(elastic_client)
+
+    ensure_partition(elastic_client, datetime.now(UTC).year)
+    refresh_hot_alias(elastic_client)
+    print(f"Index alias '{terror_events_index}' is ready with yearly partitions.")
+
+
+if __name__ == '__main__':
+    from app.config.elastic_config.elastic_connection import elastic_client
 
-        elastic_client.indices.create(index=terror_events_index, body=mapping)
-        print(f"Index '{terror_events_index}' created successfully with 3 shards and 1 replica.")
-    else:
-        print(f"Index '{terror_events_index}' already exists.")
+    setup_terror_events_index(elastic_client)
@@ -0,0 +1,354 @@
+import os
+import pickle
+import time
+import tracemalloc
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from app.config.local_files_config.local_files import EVENTS_GRAPH_COMPACT
+
+MISSING_CODE = -1
+MISSING_INT = -2 ** 63
+
+# Typed columns and the array codes of their values
+COLUMN_TYPECODES = {'int': 'q', 'float': 'd', 'str': 'i'}
+COLUMN_DTYPES = {'int': np.int64, 'float': np.float64, 'str': np.int32}
+
+
+def get_value_kind(value: Any) -> str:
+    # Values that collide with a column's missing marker are kept as objects
+    if isinstance(value, bool):
+        return 'object'
+    if isinstance(value, int):
+        return 'int' if MISSING_INT < value < 2 ** 63 else 'object'
+    if isinstance(value, float):
+        return 'float' if value == value else 'object'
+    if isinstance(value, str):
+        return 'str'
+    return 'object'
+
+
+class PropertyColumn:
+    def __init__(self):
+        self.kind: Optional[str] = None
+        self.values: Any = []
+        self.labels: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self.length = 0
+
+    def _missing(self) -> Any:
+        return {'int': MISSING_INT, 'float': float('nan'), 'str': MISSING_CODE}.get(self.kind)
+
+    def _reset(self, kind: str) -> None:
+        self.kind = kind
+        self.values = array(COLUMN_TYPECODES[kind]) if kind in COLUMN_TYPECODES else []
+        self.labels, self.codes = [], {}
+
+    def _convert(self, kind: str) -> None:
+        existing = [self.get(row) for row in range(self.length)]
+        self._reset(kind)
+        self.length = 0
+        self.resize(len(existing))
+        for row, value in enumerate(existing):
+            if value is not None:
+                self.set(row, value)
+
+    def resize(self, length: int) -> None:
+        if length > self.length:
+            missing = self._missing()
+            self.values.extend([missing] * (length - self.length))
+            self.length = length
+
+    def set(self, row: int, value: Any) -> None:
+        self.resize(row + 1)
+        if value is None:
+            if self.kind is not None:
+                self.values[row] = self._missing()
+            return
+
+        kind = get_value_kind(value)
+        if self.kind is None:
+            self._convert(kind)
+        elif kind != self.kind and self.kind != 'object':
+            self._convert('object')
+
+        if self.kind in ('int', 'float'):
+            self.values[row] = value
+        elif self.kind == 'str':
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.labels)
+                self.labels.append(value)
+            self.values[row] = code
+        else:
+            self.values[row] = value
+
+    def get(self, row: int) -> Any:
+        if self.kind is None or row >= self.length:
+            return None
+
+        value = self.values[row]
+        if self.kind == 'int':
+            return None if value == MISSING_INT else value
+        if self.kind == 'float':
+            return None if value != value else value
+        if self.kind == 'str':
+            return None if value == MISSING_CODE else self.labels[value]
+        return value
+
+    def to_numpy(self) -> np.ndarray:
+        if self.kind in COLUMN_DTYPES:
+            return np.frombuffer(self.values, dtype=COLUMN_DTYPES[self.kind])
+        return np.array(self.values, dtype=object)
+
+
+class CompactGraph:
+    def __init__(self):
+        self.node_index: Dict[str, int] = {}
+        self.node_ids: List[str] = []
+        self.type_names: List[str] = []
+        self.type_codes: Dict[str, int] = {}
+        self.node_types = array('h')
+        self.node_columns: Dict[str, PropertyColumn] = {}
+
+        self.edge_index: Dict[int, int] = {}
+        self.edge_sources = array('q')
+        self.edge_targets = array('q')
+        self.edge_types = array('h')
+        self.edge_columns: Dict[str, PropertyColumn] = {}
+
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['_csr'] = None
+        return state
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.edge_sources)
+
+    def _intern_type(self, type_name: str) -> int:
+        code = self.type_codes.get(type_name)
+        if code is None:
+            code = self.type_codes[type_name] = len(self.type_names)
+            self.type_names.append(type_name)
+        return code
+
+    def _intern_node(self, node_id: Any) -> int:
+        node_id = str(node_id)
+        index = self.node_index.get(node_id)
+        if index is None:
+            index = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            self.node_types.append(MISSING_CODE)
+        return index
+
+    @staticmethod
+    def _set_properties(columns: Dict[str, PropertyColumn], row: int, properties: Dict[str, Any]) -> None:
+        for key, value in properties.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = PropertyColumn()
+            column.set(row, value)
+
+    def add_nodes(self, node_type: str, nodes: List[Dict]) -> None:
+        type_code = self._intern_type(node_type)
+        for node in nodes:
+            index = self._intern_node(node['id'])
+            self.node_types[index] = type_code
+            self._set_properties(self.node_columns, index, {k: v for k, v in node.items() if k not in ('id', 'type')})
+
+    def add_relationships(self, relationships: List[Dict]) -> None:
+        for rel in relationships:
+            source = self._intern_node(rel['source_id'])
+            target = self._intern_node(rel['target_id'])
+            low, high = min(source, target), max(source, target)
+            key = (low << 32) | high
+
+            edge = self.edge_index.get(key)
+            if edge is None:
+                edge = self.edge_index[key] = len(self.edge_sources)
+                self.edge_sources.append(source)
+                self.edge_targets.append(target)
+                self.edge_types.append(self._intern_type(rel['relation_type']))
+                self._csr = None
+            else:
+                self.edge_types[edge] = self._intern_type(rel['relation_type'])
+
+            self._set_properties(self.edge_columns, edge, rel.get('properties') or {})
+
+    def apply_change(self, change: Dict) -> None:
+        if change['type'] == 'nodes':
+            self.add_nodes(change['node_type'], change['data'])
+        elif change['type'] == 'relationships':
+            self.add_relationships(change['data'])
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._csr is None:
+            sources = np.frombuffer(self.edge_sources, dtype=np.int64)
+            targets = np.frombuffer(self.edge_targets, dtype=np.int64)
+            edge_ids = np.arange(len(sources), dtype=np.int64)
+            reverse = sources != targets
+
+            all_sources = np.concatenate([sources, targets[reverse]])
+            all_targets = np.concatenate([targets, sources[reverse]])
+            all_edge_ids = np.concatenate([edge_ids, edge_ids[reverse]])
+
+            order = np.argsort(all_sources, kind='stable')
+            indptr = np.zeros(self.number_of_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(all_sources, minlength=self.number_of_nodes), out=indptr[1:])
+            self._csr = (indptr, all_targets[order], all_edge_ids[order])
+        return self._csr
+
+    def degrees(self) -> np.ndarray:
+        indptr, _, _ = self.csr()
+        return np.diff(indptr)
+
+    def neighbor_indices(self, index: int) -> np.ndarray:
+        indptr, indices, _ = self.csr()
+        return indices[indptr[index]:indptr[index + 1]]
+
+    def expand(self, frontier: np.ndarray) -> np.ndarray:
+        indptr, indices, _ = self.csr()
+        starts, ends = indptr[frontier], indptr[frontier + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return indices[offsets + np.arange(lengths.sum())]
+
+    def neighbors(self, node_id: Any) -> List[str]:
+        return [self.node_ids[i] for i in self.neighbor_indices(self.node_index[str(node_id)])]
+
+    def node_type(self, index: int) -> Optional[str]:
+        code = self.node_types[index]
+        return None if code == MISSING_CODE else self.type_names[code]
+
+    def node_data(self, node_id: Any) -> Dict[str, Any]:
+        index = self.node_index[str(node_id)]
+        data = {key: column.get(index) for key, column in self.node_columns.items()}
+        data = {key: value for key, value in data.items() if value is not None}
+        data['id'] = self.node_ids[index]
+        if self.node_type(index) is not None:
+            data['type'] = self.node_type(index)
+        return data
+
+    def edge_data(self, edge: int) -> Dict[str, Any]:
+        data = {key: column.get(edge) for key, column in self.edge_columns.items()}
+        data = {key: value for key, value in data.items() if value is not None}
+        data['type'] = self.type_names[self.edge_types[edge]]
+        return data
+
+    def to_networkx(self) -> nx.Graph:
+        G = nx.Graph()
+        G.add_nodes_from((node_id, self.node_data(node_id)) for node_id in self.node_ids)
+        G.add_edges_from(
+            (self.node_ids[source], self.node_ids[target], self.edge_data(edge))
+            for edge, (source, target) in enumerate(zip(self.edge_sources, self.edge_targets))
+        )
+        return G
+
+    @classmethod
+    def from_networkx(cls, G: nx.Graph) -> 'CompactGraph':
+        graph = cls()
+        nodes_by_type: Dict[str, List[Dict]] = {}
+        for node_id, data in G.nodes(data=True):
+            nodes_by_type.setdefault(data.get('type', 'unknown'), []).append({**data, 'id': node_id})
+        for node_type, nodes in nodes_by_type.items():
+            graph.add_nodes(node_type, nodes)
+
+        graph.add_relationships([
+            {
+                'source_id': source,
+                'target_id': target,
+                'relation_type': data.get('type', 'RELATED_TO'),
+                'properties': {k: v for k, v in data.items() if k != 'type'}
+            }
+            for source, target, data in G.edges(data=True)
+        ])
+        return graph
+
+
+def load_or_create_compact_graph(path: Path = EVENTS_GRAPH_COMPACT) -> CompactGraph:
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return CompactGraph()
+
+
+def save_compact_graph(graph: CompactGraph, path: Path = EVENTS_GRAPH_COMPACT) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(path.suffix + '.tmp')
+
+    with open(temp_path, 'wb') as f:
+        pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+def measure_loaded_size(payload: bytes) -> int:
+    tracemalloc.start()
+    loaded = pickle.loads(payload)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    return size
+
+
+def benchmark_against_networkx(G: nx.Graph, sample_size: int = 1000) -> Dict[str, float]:
+    started = time.perf_counter()
+    compact = CompactGraph.from_networkx(G)
+    results = {'conversion_seconds': time.perf_counter() - started}
+
+    nx_payload = pickle.dumps(G, protocol=pickle.HIGHEST_PROTOCOL)
+    compact_payload = pickle.dumps(compact, protocol=pickle.HIGHEST_PROTOCOL)
+    results['networkx_pickle_mb'] = len(nx_payload) / 2 ** 20
+    results['compact_pickle_mb'] = len(compact_payload) / 2 ** 20
+    results['networkx_memory_mb'] = measure_loaded_size(nx_payload) / 2 ** 20
+    results['compact_memory_mb'] = measure_loaded_size(compact_payload) / 2 ** 20
+
+    sample = list(G.nodes)[:sample_size]
+
+    started = time.perf_counter()
+    compact.csr()
+    results['compact_csr_build_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    dict(G.degree())
+    results['networkx_degree_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compact.degrees()
+    results['compact_degree_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    nx_reached = sum(len({second for first in G[node] for second in G[first]}) for node in sample)
+    results['networkx_two_hop_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compact_reached = 0
+    for node in sample:
+        first = compact.neighbor_indices(compact.node_index[str(node)])
+        compact_reached += len(np.unique(compact.expand(first)))
+    results['compact_two_hop_seconds'] = time.perf_counter() - started
+
+    if nx_reached != compact_reached:
+        print(f"Warning: two-hop results differ ({nx_reached} vs {compact_reached})")
+
+    return results
+
+
+if __name__ == '__main__':
+    from app.repositories.graph_repository.networkx_graph_repository import load_or_create_graph
+
+    for metric, value in benchmark_against_networkx(load_or_create_graph()).items():
+        print(f"{metric}: {value:,.3f}")
@@ -1,19 +1,50 @@
-def get_regions_high_group_activity_query(filter_by: str = None, filter_value: str = None) -> str:
-    query = """
-    MATCH (l:locations)<-[:OCCURRED_IN]-(a:attacks)<-[:ATTACKED]-(g:terror_groups)
+from typing import Any, Dict, Optional, Tuple
+
+FILTERABLE_LOCATION_PROPERTIES = ('country', 'region')
+
+
+def validate_location_filter(filter_by: str = None, filter_value: str = None) -> Optional[str]:
+    if not (filter_by and filter_value):
+        return None
+    if filter_by not in FILTERABLE_LOCATION_PROPERTIES:
+        raise ValueError(f"Invalid filter_by. Must be one of: {', '.join(FILTERABLE_LOCATION_PROPERTIES)}")
+    return filter_by
+
+
+def get_attack_paths_match(filter_by: str = None, filter_value: str = None) -> str:
+    filter_property = validate_location_filter(filter_by, filter_value)
+    location = f"(l:locations {{{filter_property}: $filter_value}})" if filter_property else "(l:locations)"
+    return f"MATCH {location}<-[:OCCURRED_IN]-(a:attacks)<-[:ATTACKED]-(g:terror_groups)"
+
+
+def get_query_parameters(filter_value: str = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    parameters = {}
+    if filter_value:
+        parameters['filter_value'] = filter_value
+    if limit:
+        parameters['limit'] = limit
+    return parameters
+
+
+def get_limit_clause(limit: Optional[int] = None) -> str:
+    return "LIMIT $limit" if limit else ""
+
+
+# 16
+def get_regions_high_group_activity_query(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Tuple[str, Dict[str, Any]]:
+    query = f"""
+    {get_attack_paths_match(filter_by, filter_value)}
     WITH l, g, COUNT(a) as attacks_count
-    WITH l, COLLECT({
+    WITH l, COLLECT({{
         id: g.id,
         name: g.name,
         subname: g.subname,
         attacks: attacks_count
-    }) as groups, SUM(attacks_count) as total_attacks
-    """
-
-    if filter_by and filter_value:
-        query += f"WHERE l.{filter_by} = '{filter_value}' "
-
-    query += """
+    }}) as groups, SUM(attacks_count) as total_attacks
     RETURN l.country as country,
            l.region as region,
            l.latitude as latitude,
@@ -22,29 +53,28 @@ def get_regions_high_group_activity_query(filter_by: str = None, filter_value: s
            size(groups) as unique_groups_count,
            total_attacks
     ORDER BY total_attacks DESC
+    {get_limit_clause(limit)}
     """
-    return query
+    return query, get_query_parameters(filter_value, limit)
 
 
 # 14
-def get_shared_attack_types_query(filter_by: str = None, filter_value: str = None) -> str:
-    query = """
-    MATCH (l:locations)<-[:OCCURRED_IN]-(a:attacks)<-[:ATTACKED]-(g:terror_groups)
+def get_shared_attack_types_query(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Tuple[str, Dict[str, Any]]:
+    query = f"""
+    {get_attack_paths_match(filter_by, filter_value)}
     WITH l, g, a.attack_types as attack_type
     UNWIND attack_type as single_type
     WITH l, single_type, COLLECT(DISTINCT g.name) as groups
-    WITH l, 
-         COLLECT({
+    WITH l,
+         COLLECT({{
             attack_type: single_type,
             groups: groups,
             groups_count: SIZE(groups)
-         }) as attack_strategies
-    """
-
-    if filter_by and filter_value:
-        query += f"WHERE l.{filter_by} = '{filter_value}' "
-
-    query += """
+         }}) as attack_strategies
     RETURN l.country as country,
            l.region as region,
            l.latitude as latitude,
@@ -52,29 +82,28 @@ def get_shared_attack_types_query(filter_by: str = None, filter_value: str = Non
            attack_strategies,
            SIZE(attack_strategies) as unique_attack_types_count
     ORDER BY unique_attack_types_count DESC
+    {get_limit_clause(limit)}
     """
-    return query
+    return query, get_query_parameters(filter_value, limit)
 
 
 # 11
-def get_groups_shared_targets_query(filter_by: str = None, filter_value: str = None) -> str:
-    query = """
-    MATCH (l:locations)<-[:OCCURRED_IN]-(a:attacks)<-[:ATTACKED]-(g:terror_groups)
+def get_groups_shared_targets_query(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Tuple[str, Dict[str, Any]]:
+    query = f"""
+    {get_attack_paths_match(filter_by, filter_value)}
     WITH l, g, COLLECT(DISTINCT a.attack_types) as target_types
     WITH l, target_types, COLLECT(DISTINCT g.name) as group_names
-    WITH l, COLLECT({
+    WITH l, COLLECT({{
         target_types: target_types,
         groups: group_names,
         groups_count: SIZE(group_names)
-    }) as shared_targets
+    }}) as shared_targets
     WITH l, shared_targets,
          REDUCE(max = 0, x IN shared_targets | CASE WHEN x.groups_count > max THEN x.groups_count ELSE max END) as max_shared_groups
-    """
-
-    if filter_by and filter_value:
-        query += f"WHERE l.{filter_by} = '{filter_value}' "
-
-    query += """
     RETURN l.country as country,
            l.region as region,
            l.latitude as latitude,
@@ -82,5 +111,6 @@ def get_groups_shared_targets_query(filter_by: str = None, filter_value: str = N
            shared_targets,
            max_shared_groups
     ORDER BY max_shared_groups DESC
+    {get_limit_clause(limit)}
     """
-    return query
+    return query, get_query_parameters(filter_value, limit)
@@ -0,0 +1,362 @@
+import copy
+import heapq
+import os
+import pickle
+import time
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+from networkx.algorithms.community import louvain_communities
+
+from app.config.local_files_config.local_files import GROUP_COACTIVITY_GRAPH, EVENTS_GRAPH_NETWORKX_LOG
+from app.repositories.graph_repository.graph_queries_repository import validate_location_filter
+from app.repositories.graph_repository.networkx_graph_repository import save_graph, read_change_log
+from app.repositories.graph_repository.networkx_queries_repository import get_neighbors_by_relation, \
+    get_location_fields, get_attack_types, get_top_records, get_file_version, get_local_graph_state, \
+    local_graph_refresh_seconds
+
+SHARED_FEATURES = ('locations', 'attack_types', 'targets')
+TOP_PAIRS_CACHED = 1000
+
+_projection: Dict[str, Any] = {'version': None, 'offset': 0, 'projection': None, 'checked_at': 0.0}
+_projection_lock = Lock()
+
+
+class GroupCoactivityGraph:
+    def __init__(self):
+        self.groups: Dict[Any, Dict[str, Any]] = {}
+        self.group_keys: Dict[str, Any] = {}
+        self.locations: Dict[Any, Dict[str, Any]] = {}
+        self.location_groups: Dict[Any, Dict[Any, Set[Any]]] = defaultdict(lambda: defaultdict(set))
+        self.location_features: Dict[Any, Dict[str, Dict[Any, Set[Any]]]] = defaultdict(
+            lambda: {'attack_types': defaultdict(set), 'targets': defaultdict(set)}
+        )
+        self.graph = nx.Graph()
+        self.scores: Dict[str, Any] = {}
+        self.dirty = True
+        self.graph_size: Optional[Tuple[int, int]] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['location_groups'] = {l: dict(groups) for l, groups in self.location_groups.items()}
+        state['location_features'] = {
+            l: {kind: dict(values) for kind, values in features.items()}
+            for l, features in self.location_features.items()
+        }
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        fresh = GroupCoactivityGraph()
+        for l, groups in state.pop('location_groups').items():
+            fresh.location_groups[l].update(groups)
+        for l, features in state.pop('location_features').items():
+            for kind, values in features.items():
+                fresh.location_features[l][kind].update(values)
+        self.__dict__.update(fresh.__dict__)
+        self.__dict__.update(state)
+
+    def _set_group(self, G: nx.Graph, group: Any) -> None:
+        data = G.nodes[group]
+        self.groups[group] = {'id': data.get('id'), 'name': data.get('name'), 'subname': data.get('subname')}
+        for key in (group, data.get('id'), data.get('name')):
+            if key is not None:
+                self.group_keys[str(key)] = group
+
+    def _link(self, group: Any, others: Set[Any], kind: str) -> None:
+        for other in others:
+            if other == group:
+                continue
+            if not self.graph.has_edge(group, other):
+                self.graph.add_edge(group, other, weight=0, **{feature: 0 for feature in SHARED_FEATURES})
+            edge = self.graph[group][other]
+            edge[kind] += 1
+            edge['weight'] += 1
+        self.dirty = True
+
+    def _add_to_location(self, location: Any, group: Any, attack: Any) -> None:
+        groups = self.location_groups[location]
+        if group not in groups:
+            self._link(group, set(groups), 'locations')
+        groups[group].add(attack)
+
+    def _add_feature(self, location: Any, kind: str, value: Any, group: Any) -> None:
+        groups = self.location_features[location][kind][value]
+        if group not in groups:
+            self._link(group, set(groups), kind)
+            groups.add(group)
+
+    def index_attack(self, G: nx.Graph, attack: Any) -> None:
+        if G.nodes[attack].get('type') != 'attacks':
+            return
+
+        groups = get_neighbors_by_relation(G, attack, 'terror_groups', 'ATTACKED')
+        locations = get_neighbors_by_relation(G, attack, 'locations', 'OCCURRED_IN')
+        attack_types = get_attack_types(G.nodes[attack])
+
+        for group in groups:
+            self._set_group(G, group)
+            self.graph.add_node(group)
+
+        for location in locations:
+            self.locations[location] = get_location_fields(G, location)
+            for group in groups:
+                self._add_to_location(location, group, attack)
+                for attack_type in attack_types:
+                    self._add_feature(location, 'attack_types', attack_type, group)
+                if attack_types:
+                    self._add_feature(location, 'targets', tuple(attack_types), group)
+
+    def apply_change(self, G: nx.Graph, change: Dict) -> None:
+        if change['type'] == 'relationships':
+            touched = {node for rel in change['data'] for node in (rel['source_id'], rel['target_id'])}
+        elif change['type'] == 'nodes' and change['node_type'] == 'attacks':
+            touched = {node['id'] for node in change['data']}
+        elif change['type'] == 'nodes' and change['node_type'] in ('locations', 'terror_groups'):
+            self._refresh_node_fields(G, [node['id'] for node in change['data']])
+            return
+        else:
+            return
+
+        for node in touched:
+            if node in G:
+                self.index_attack(G, node)
+
+    def _refresh_node_fields(self, G: nx.Graph, nodes: List[Any]) -> None:
+        for node in nodes:
+            if node in self.locations:
+                self.locations[node] = get_location_fields(G, node)
+            elif node in self.groups:
+                self._set_group(G, node)
+
+    @classmethod
+    def from_graph(cls, G: nx.Graph) -> 'GroupCoactivityGraph':
+        projection = cls()
+        for node, data in G.nodes(data=True):
+            if data.get('type') == 'attacks':
+                projection.index_attack(G, node)
+        projection.graph_size = (G.number_of_nodes(), G.number_of_edges())
+        return projection
+
+    def refresh_scores(self, seed: int = 42) -> Dict[str, Any]:
+        if not self.dirty and self.scores:
+            return self.scores
+
+        strength = dict(self.graph.degree(weight='weight'))
+        communities = louvain_communities(self.graph, weight='weight', seed=seed) if self.graph.number_of_edges() else []
+        community_of = {group: index for index, members in enumerate(communities) for group in members}
+        top_pairs = heapq.nlargest(
+            TOP_PAIRS_CACHED, self.graph.edges(data=True), key=lambda edge: edge[2]['weight']
+        )
+
+        self.scores = {
+            'strength': strength,
+            'degree_centrality': nx.degree_centrality(self.graph) if self.graph.number_of_nodes() > 1 else {},
+            'community': community_of,
+            'communities': [sorted(members, key=lambda g: -strength.get(g, 0)) for members in communities],
+            'top_pairs': [(source, target, dict(data)) for source, target, data in top_pairs]
+        }
+        self.dirty = False
+        return self.scores
+
+    def resolve_group(self, group: str) -> Optional[Any]:
+        return self.group_keys.get(str(group))
+
+    def describe_group(self, group: Any) -> Dict[str, Any]:
+        scores = self.refresh_scores()
+        return {
+            **self.groups.get(group, {}),
+            'strength': scores['strength'].get(group, 0),
+            'degree_centrality': scores['degree_centrality'].get(group, 0.0),
+            'community': scores['community'].get(group)
+        }
+
+    def describe_pair(self, source: Any, target: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'groups': [self.groups.get(source, {}).get('name'), self.groups.get(target, {}).get('name')],
+            'weight': data['weight'],
+            **{f'shared_{feature}': data[feature] for feature in SHARED_FEATURES}
+        }
+
+    def get_partners(self, group: Any, limit: int = 10) -> List[Dict[str, Any]]:
+        if group not in self.graph:
+            return []
+        partners = heapq.nlargest(limit, self.graph[group].items(), key=lambda item: item[1]['weight'])
+        return [
+            {**self.describe_group(partner), **self.describe_pair(group, partner, data)}
+            for partner, data in partners
+        ]
+
+    def get_top_pairs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return [self.describe_pair(*pair) for pair in self.refresh_scores()['top_pairs'][:limit]]
+
+    def get_communities(self, limit: int = 20, members: int = 10) -> List[Dict[str, Any]]:
+        return [
+            {
+                'community': index,
+                'size': len(groups),
+                'top_groups': [self.groups.get(group, {}).get('name') for group in groups[:members]]
+            }
+            for index, groups in enumerate(self.refresh_scores()['communities'][:limit])
+        ]
+
+    def iter_locations(self, filter_by: str = None, filter_value: str = None):
+        filter_by = validate_location_filter(filter_by, filter_value)
+        for location, fields in self.locations.items():
+            if filter_by and fields.get(filter_by) != filter_value:
+                continue
+            yield location, fields
+
+
+def load_or_build_coactivity(G: nx.Graph, path: Path = GROUP_COACTIVITY_GRAPH) -> GroupCoactivityGraph:
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            projection = pickle.load(f)
+        if projection.graph_size == (G.number_of_nodes(), G.number_of_edges()):
+            return projection
+
+    projection = GroupCoactivityGraph.from_graph(G)
+    projection.refresh_scores()
+    return projection
+
+
+def save_coactivity(projection: GroupCoactivityGraph, G: nx.Graph, path: Path = GROUP_COACTIVITY_GRAPH) -> None:
+    projection.refresh_scores()
+    projection.graph_size = (G.number_of_nodes(), G.number_of_edges())
+    save_graph(projection, path)
+
+
+def load_projection_base(G: nx.Graph, offset: int) -> Tuple[GroupCoactivityGraph, int]:
+    # A saved projection matches the graph snapshot, so it catches up from the start of the change log
+    if os.path.exists(GROUP_COACTIVITY_GRAPH):
+        with open(GROUP_COACTIVITY_GRAPH, 'rb') as f:
+            return pickle.load(f), 0
+    return GroupCoactivityGraph.from_graph(G), offset
+
+
+def refresh_projection() -> None:
+    G, snapshot, offset = get_local_graph_state()
+    version = (get_file_version(GROUP_COACTIVITY_GRAPH), snapshot)
+    projection, projection_offset = _projection['projection'], _projection['offset']
+
+    if projection is None or version != _projection['version']:
+        projection, projection_offset = load_projection_base(G, offset)
+
+    if projection_offset < offset:
+        changes, _ = read_change_log(EVENTS_GRAPH_NETWORKX_LOG, projection_offset, offset)
+        if changes:
+            if projection is _projection['projection']:
+                projection = copy.deepcopy(projection)
+            for change in changes:
+                projection.apply_change(G, change)
+
+    projection.refresh_scores()
+    _projection.update(version=version, offset=offset, projection=projection, checked_at=time.time())
+
+
+def get_coactivity_projection() -> GroupCoactivityGraph:
+    if _projection['projection'] is None or time.time() - _projection['checked_at'] >= local_graph_refresh_seconds:
+        # Like the local graph, one request refreshes the projection while the others use the published one
+        if _projection_lock.acquire(blocking=_projection['projection'] is None):
+            try:
+                if _projection['projection'] is None \
+                        or time.time() - _projection['checked_at'] >= local_graph_refresh_seconds:
+                    refresh_projection()
+            finally:
+                _projection_lock.release()
+    return _projection['projection']
+
+
+# 16
+def get_regions_high_group_activity_projection(
+        projection: GroupCoactivityGraph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    records = []
+    for location, fields in projection.iter_locations(filter_by, filter_value):
+        groups = [
+            {**projection.groups[group], 'attacks': len(attacks)}
+            for group, attacks in projection.location_groups.get(location, {}).items()
+        ]
+        if groups:
+            records.append({
+                **fields,
+                'groups': groups,
+                'unique_groups_count': len(groups),
+                'total_attacks': sum(group['attacks'] for group in groups)
+            })
+    return get_top_records(records, 'total_attacks', limit)
+
+
+# 14
+def get_shared_attack_types_projection(
+        projection: GroupCoactivityGraph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    records = []
+    for location, fields in projection.iter_locations(filter_by, filter_value):
+        attack_types = projection.location_features.get(location, {}).get('attack_types', {})
+        attack_strategies = [
+            {
+                'attack_type': attack_type,
+                'groups': [projection.groups[group]['name'] for group in groups],
+                'groups_count': len(groups)
+            }
+            for attack_type, groups in attack_types.items()
+        ]
+        if attack_strategies:
+            records.append({
+                **fields,
+                'attack_strategies': attack_strategies,
+                'unique_attack_types_count': len(attack_strategies)
+            })
+    return get_top_records(records, 'unique_attack_types_count', limit)
+
+
+# 11
+def get_groups_shared_targets_projection(
+        projection: GroupCoactivityGraph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    records = []
+    for location, fields in projection.iter_locations(filter_by, filter_value):
+        targets_by_group: Dict[Any, Set[Tuple]] = defaultdict(set)
+        for target_types, groups in projection.location_features.get(location, {}).get('targets', {}).items():
+            for group in groups:
+                targets_by_group[group].add(target_types)
+        if not targets_by_group:
+            continue
+
+        groups_by_targets = defaultdict(dict)
+        for group, target_types in targets_by_group.items():
+            groups_by_targets[tuple(sorted(target_types))][projection.groups[group]['name']] = None
+
+        shared_targets = [
+            {
+                'target_types': [list(types) for types in target_types],
+                'groups': list(group_names),
+                'groups_count': len(group_names)
+            }
+            for target_types, group_names in groups_by_targets.items()
+        ]
+        records.append({
+            **fields,
+            'shared_targets': shared_targets,
+            'max_shared_groups': max(target['groups_count'] for target in shared_targets)
+        })
+    return get_top_records(records, 'max_shared_groups', limit)
+
+
+if __name__ == '__main__':
+    projection = get_coactivity_projection()
+    print(f"{projection.graph.number_of_nodes()} groups, {projection.graph.number_of_edges()} co-activity links")
+    for pair in projection.get_top_pairs(10):
+        print(pair)
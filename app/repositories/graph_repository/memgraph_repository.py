@@ -1,61 +1,280 @@
-from typing import List
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, List, Dict, Iterator, Optional, Tuple
 
 import networkx as nx
-import pickle
 
-from app.config.local_files_config.local_files import EVENTS_GRAPH_NETWORKX
-from app.config.neo4j_config.neo4j_connection import driver
+from app.config.local_files_config.local_files import EVENTS_GRAPH_MEMGRAPH_MANIFEST
+from app.config.neo4j_config.neo4j_connection import driver, read_session
 from app.repositories.graph_repository.graph_queries_repository import get_regions_high_group_activity_query, \
-    get_shared_attack_types_query, get_groups_shared_targets_query
+    get_shared_attack_types_query, get_groups_shared_targets_query, FILTERABLE_LOCATION_PROPERTIES, \
+    validate_location_filter
+from app.repositories.graph_repository.neo4j_queries_repository import quote_name, RELATIONSHIP_ENDPOINT_LABELS
+from app.repositories.graph_repository.networkx_graph_repository import load_or_create_graph
+from app.utils.batch_utils import chunked
+
+memgraph_batch_size = int(os.environ.get('MEMGRAPH_BATCH_SIZE', 5000))
 
 
 def load_local_graph():
-    with open(EVENTS_GRAPH_NETWORKX, 'rb') as f:
-        return pickle.load(f)
+    return load_or_create_graph()
 
 
-def load_graph_to_memgraph(nx_graph: nx.Graph):
-    with driver.session() as session:
-        session.run("MATCH (n) DETACH DELETE n")
+def get_node_properties(node_id: Any, data: Dict) -> Dict[str, Any]:
+    properties = {k: v for k, v in data.items() if k != 'type'}
+    properties['id'] = str(node_id)
+    return properties
 
-        for node_id, data in nx_graph.nodes(data=True):
-            node_type = data.get('type')
-            properties = {k: v for k, v in data.items() if k != 'type'}
-            properties['id'] = str(node_id)
 
-            props_str = ", ".join([f"{k}: ${k}" for k in properties.keys()])
-            query = f"CREATE (:{node_type} {{{props_str}}})"
-            session.run(query, parameters=properties)
+def get_edge_properties(data: Dict) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if k != 'type'}
 
-        for source, target, data in nx_graph.edges(data=True):
-            rel_type = data.get('type', 'RELATED_TO')
-            properties = {k: v for k, v in data.items() if k != 'type'}
 
-            query = f"""
-            MATCH (source), (target)
-            WHERE source.id = $source_id AND target.id = $target_id
-            CREATE (source)-[r:{rel_type}]->(target)
-            SET r += $properties
-            """
+def get_edge_key(source: Any, target: Any, data: Dict) -> Tuple[str, str, str]:
+    return str(source), str(target), data.get('type', 'RELATED_TO')
+
+
+def orient_edge(nx_graph: nx.Graph, source: Any, target: Any, data: Dict) -> Tuple[Any, Any]:
+    # An undirected graph yields endpoints in insertion order, the relationship type decides the direction
+    endpoint_labels = RELATIONSHIP_ENDPOINT_LABELS.get(data.get('type'))
+    node_labels = (nx_graph.nodes[source].get('type'), nx_graph.nodes[target].get('type'))
+    if endpoint_labels and node_labels == endpoint_labels[::-1]:
+        return target, source
+    return source, target
+
+
+def iter_oriented_edges(nx_graph: nx.Graph) -> Iterator[Tuple[Any, Any, Dict]]:
+    for source, target, data in nx_graph.edges(data=True):
+        yield *orient_edge(nx_graph, source, target, data), data
+
+
+def get_element_hash(properties: Dict[str, Any]) -> str:
+    payload = json.dumps(properties, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
 
-            session.run(query, {
-                'source_id': str(source),
-                'target_id': str(target),
-                'properties': properties
+def build_sync_manifest(nx_graph: nx.Graph) -> Dict[str, Dict]:
+    node_labels = nx_graph.nodes(data='type')
+    nodes = {
+        str(node_id): (data.get('type'), get_element_hash(get_node_properties(node_id, data)))
+        for node_id, data in nx_graph.nodes(data=True)
+    }
+    edges = {
+        get_edge_key(source, target, data): (
+            node_labels[source], node_labels[target], get_element_hash(get_edge_properties(data))
+        )
+        for source, target, data in iter_oriented_edges(nx_graph)
+    }
+    return {'nodes': nodes, 'edges': edges}
+
+
+def load_sync_manifest(path: Path = EVENTS_GRAPH_MEMGRAPH_MANIFEST) -> Optional[Dict[str, Dict]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_sync_manifest(manifest: Dict[str, Dict], path: Path = EVENTS_GRAPH_MEMGRAPH_MANIFEST) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(path.suffix + '.tmp')
+
+    with open(temp_path, 'wb') as f:
+        pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+def read_memgraph_manifest(session) -> Dict[str, Dict]:
+    nodes = {
+        record['id']: (record['label'], None)
+        for record in session.run("MATCH (n) RETURN labels(n)[0] AS label, n.id AS id")
+        if record['id'] is not None
+    }
+    edges = {
+        (record['source_id'], record['target_id'], record['type']): (
+            record['source_label'], record['target_label'], None
+        )
+        for record in session.run("""
+            MATCH (s)-[r]->(t)
+            RETURN s.id AS source_id, t.id AS target_id, type(r) AS type,
+                   labels(s)[0] AS source_label, labels(t)[0] AS target_label
+        """)
+    }
+    return {'nodes': nodes, 'edges': edges}
+
+
+def get_previous_manifest(session, manifest_path: Path) -> Dict[str, Dict]:
+    manifest = load_sync_manifest(manifest_path)
+    memgraph_nodes = session.run("MATCH (n) RETURN count(n) AS count").single()['count']
+
+    if manifest is None or (manifest['nodes'] and not memgraph_nodes):
+        print("Sync manifest missing or out of date, reconciling against Memgraph contents")
+        return read_memgraph_manifest(session)
+    return manifest
+
+
+def get_upsert_nodes_query(label: str) -> str:
+    return f"""
+    UNWIND $batch AS properties
+    MERGE (n:{quote_name(label)} {{id: properties.id}})
+    SET n = properties
+    """
+
+
+def get_upsert_edges_query(rel_type: str, source_label: str, target_label: str) -> str:
+    return f"""
+    UNWIND $batch AS rel
+    MATCH (source:{quote_name(source_label)} {{id: rel.source_id}})
+    MATCH (target:{quote_name(target_label)} {{id: rel.target_id}})
+    MERGE (source)-[r:{quote_name(rel_type)}]->(target)
+    SET r = rel.properties
+    """
+
+
+def get_delete_edges_query(rel_type: str, source_label: str, target_label: str) -> str:
+    return f"""
+    UNWIND $batch AS rel
+    MATCH (:{quote_name(source_label)} {{id: rel.source_id}})-[r:{quote_name(rel_type)}]->(:{quote_name(target_label)} {{id: rel.target_id}})
+    DELETE r
+    """
+
+
+def get_delete_nodes_query(label: str) -> str:
+    return f"""
+    UNWIND $batch AS id
+    MATCH (n:{quote_name(label)} {{id: id}})
+    DETACH DELETE n
+    """
+
+
+def diff_graph_against_manifest(
+        nx_graph: nx.Graph,
+        previous: Dict[str, Dict],
+        current: Dict[str, Dict]
+) -> Dict[str, Dict[Any, List]]:
+    changes = {key: defaultdict(list) for key in ('upsert_nodes', 'upsert_edges', 'delete_edges', 'delete_nodes')}
+
+    for node_id, data in nx_graph.nodes(data=True):
+        key = str(node_id)
+        if previous['nodes'].get(key) != current['nodes'][key]:
+            changes['upsert_nodes'][data.get('type')].append(get_node_properties(node_id, data))
+
+    for source, target, data in iter_oriented_edges(nx_graph):
+        key = get_edge_key(source, target, data)
+        source_label, target_label, _ = entry = current['edges'][key]
+        if previous['edges'].get(key) != entry:
+            changes['upsert_edges'][(key[2], source_label, target_label)].append({
+                'source_id': key[0],
+                'target_id': key[1],
+                'properties': get_edge_properties(data)
+            })
+
+    for key, (source_label, target_label, _) in previous['edges'].items():
+        entry = current['edges'].get(key)
+        if entry is None or entry[:2] != (source_label, target_label):
+            changes['delete_edges'][(key[2], source_label, target_label)].append({
+                'source_id': key[0],
+                'target_id': key[1]
             })
 
+    for key, (label, _) in previous['nodes'].items():
+        entry = current['nodes'].get(key)
+        if entry is None or entry[0] != label:
+            changes['delete_nodes'][label].append(key)
+
+    return changes
+
+
+def create_index(session, label: str, property_name: str) -> None:
+    try:
+        session.run(f"CREATE INDEX ON :{quote_name(label)}({quote_name(property_name)})").consume()
+    except Exception as e:
+        print(f"Error creating index on :{label}({property_name}): {e}")
+
+
+def create_id_indexes(session, labels) -> None:
+    for label in labels:
+        create_index(session, label, 'id')
+
+
+def create_filter_indexes(session) -> None:
+    for property_name in FILTERABLE_LOCATION_PROPERTIES:
+        create_index(session, 'locations', property_name)
+
+
+def run_in_batches(session, query: str, rows: List[Dict], batch_size: int, description: str) -> int:
+    started = time.time()
+    loaded = 0
+
+    for batch in chunked(rows, batch_size):
+        session.execute_write(lambda tx: tx.run(query, batch=batch).consume())
+        loaded += len(batch)
+        rate = loaded / max(time.time() - started, 1e-6)
+        print(f"{description}: {loaded}/{len(rows)} ({rate:,.0f}/s)")
+
+    return loaded
+
+
+def sync_graph_to_memgraph(
+        nx_graph: nx.Graph,
+        batch_size: int = memgraph_batch_size,
+        manifest_path: Path = EVENTS_GRAPH_MEMGRAPH_MANIFEST
+) -> Dict[str, int]:
+    started = time.time()
+    current = build_sync_manifest(nx_graph)
+
+    with driver.session() as session:
+        previous = get_previous_manifest(session, manifest_path)
+        changes = diff_graph_against_manifest(nx_graph, previous, current)
+
+        create_id_indexes(session, changes['upsert_nodes'].keys())
+        create_filter_indexes(session)
+
+        # Upserts go first and deletes last, so readers never see an emptied graph
+        counts = {}
+        counts['nodes_upserted'] = sum(
+            run_in_batches(session, get_upsert_nodes_query(label), rows, batch_size, f"Upsert :{label}")
+            for label, rows in changes['upsert_nodes'].items()
+        )
+        counts['edges_upserted'] = sum(
+            run_in_batches(session, get_upsert_edges_query(*key), rows, batch_size, f"Upsert :{key[0]}")
+            for key, rows in changes['upsert_edges'].items()
+        )
+        counts['edges_deleted'] = sum(
+            run_in_batches(session, get_delete_edges_query(*key), rows, batch_size, f"Delete :{key[0]}")
+            for key, rows in changes['delete_edges'].items()
+        )
+        counts['nodes_deleted'] = sum(
+            run_in_batches(session, get_delete_nodes_query(label), rows, batch_size, f"Delete :{label}")
+            for label, rows in changes['delete_nodes'].items()
+        )
+
+    save_sync_manifest(current, manifest_path)
+
+    elapsed = time.time() - started
+    print(f"Synced graph to Memgraph in {elapsed:.1f}s: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+    return counts
+
 
 def init_database():
     try:
         nx_graph = load_local_graph()
 
-        load_graph_to_memgraph(nx_graph)
+        sync_graph_to_memgraph(nx_graph)
 
         with driver.session() as session:
             nodes = session.run("MATCH (n) RETURN count(n) as count").single()['count']
             rels = session.run("MATCH ()-[r]->() RETURN count(r) as count").single()['count']
 
-        print(f"Loaded {nodes} nodes and {rels} relationships")
+        print(f"Memgraph holds {nodes} nodes and {rels} relationships")
         return True
 
     except Exception as e:
@@ -63,40 +282,46 @@ def init_database():
         return False
 
 
+def stream_read_query(query: str, parameters: Dict[str, Any], description: str) -> Iterator[Dict[str, Any]]:
+    try:
+        with read_session() as session:
+            with session.begin_transaction() as tx:
+                for record in tx.run(query, parameters):
+                    yield record.data()
+    except Exception as e:
+        # A failed or interrupted stream must not reach the map builders as a short but valid result
+        print(f"Error in {description}: {e}")
+        raise
+
+
 # 16
-def get_regions_high_group_activity(filter_by: str = None, filter_value: str = None) -> list:
-    with driver.session() as session:
-        try:
-            query = get_regions_high_group_activity_query(filter_by, filter_value)
-            result = session.run(query)
-            return [record.data() for record in result]
-        except Exception as e:
-            print(f"Error in get_regions_high_group_activity: {e}")
-            return []
+def get_regions_high_group_activity(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    query, parameters = get_regions_high_group_activity_query(filter_by, filter_value, limit)
+    return stream_read_query(query, parameters, 'get_regions_high_group_activity')
 
 
 # 14
-def get_shared_attack_types(filter_by: str = None, filter_value: str = None) -> list:
-    with driver.session() as session:
-        try:
-            query = get_shared_attack_types_query(filter_by, filter_value)
-            result = session.run(query)
-            return [record.data() for record in result]
-        except Exception as e:
-            print(f"Error in get_shared_attack_types: {e}")
-            return []
+def get_shared_attack_types(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    query, parameters = get_shared_attack_types_query(filter_by, filter_value, limit)
+    return stream_read_query(query, parameters, 'get_shared_attack_types')
 
 
 # 11
-def get_groups_shared_targets(filter_by: str = None, filter_value: str = None) -> list:
-    with driver.session() as session:
-        try:
-            query = get_groups_shared_targets_query(filter_by, filter_value)
-            result = session.run(query)
-            return [record.data() for record in result]
-        except Exception as e:
-            print(f"Error in get_groups_shared_targets: {e}")
-            return []
+def get_groups_shared_targets(
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    query, parameters = get_groups_shared_targets_query(filter_by, filter_value, limit)
+    return stream_read_query(query, parameters, 'get_groups_shared_targets')
 
 
 #########
@@ -110,13 +335,11 @@ def connection():
 def find_group_activity_by_region(filter_by: str = None, filter_value: str = None):
     with driver.session() as session:
         try:
-            where_clause = ""
-            if filter_by and filter_value:
-                where_clause = f"WHERE l.{filter_by} = '{filter_value}'"
+            filter_property = validate_location_filter(filter_by, filter_value)
+            location = f"(l:Location {{{filter_property}: $filter_value}})" if filter_property else "(l:Location)"
 
             query = f"""
-            MATCH (l:Location)<-[:OCCURRED_IN]-(a:Attack)<-[:ATTACKED]-(g:TerrorGroup)
-            {where_clause}
+            MATCH {location}<-[:OCCURRED_IN]-(a:Attack)<-[:ATTACKED]-(g:TerrorGroup)
             WITH l, collect(DISTINCT g) as groups
             RETURN l.country as country,
                    l.region as region,
@@ -127,7 +350,7 @@ def find_group_activity_by_region(filter_by: str = None, filter_value: str = Non
             ORDER BY unique_groups_count DESC
             """
 
-            result = session.run(query)
+            result = session.run(query, filter_value=filter_value)
             return [record.data() for record in result]
 
         except Exception as e:
@@ -138,5 +361,5 @@ def find_group_activity_by_region(filter_by: str = None, filter_value: str = Non
 if __name__ == "__main__":
     # init_database()
     print(
-        get_regions_high_group_activity()
+        list(get_regions_high_group_activity())
     )
@@ -1,8 +1,12 @@
-from typing import Dict, List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 
 from app.config.neo4j_config.neo4j_connection import driver
 from app.repositories.graph_repository.neo4j_queries_repository import (
-    get_create_constraints_queries, get_create_nodes_query, get_create_relationships_query
+    get_create_constraints_queries, get_create_nodes_query, get_create_relationships_query,
+    RELATIONSHIP_ENDPOINT_LABELS
 )
 
 def create_constraints() -> bool:
@@ -28,19 +32,64 @@ def handle_nodes(node_type: str, nodes: List[Dict]) -> Optional[List[Dict]]:
             print(f"Error handling nodes: {e}")
             return None
 
+
+def group_relationships(relationships: List[Dict]) -> Dict[Tuple[str, Optional[str], Optional[str]], List[Dict]]:
+    groups = defaultdict(list)
+    for rel in relationships:
+        source_label, target_label = RELATIONSHIP_ENDPOINT_LABELS.get(rel['relation_type'], (None, None))
+        key = (
+            rel['relation_type'],
+            rel.get('source_label', source_label),
+            rel.get('target_label', target_label)
+        )
+        groups[key].append(rel)
+    return groups
+
+
 def handle_relationships(relationships: List[Dict]) -> Optional[List[Dict]]:
     with driver.session() as session:
         try:
             print(f"Attempting to create {len(relationships)} relationships")
-            query = get_create_relationships_query()
-            result = session.run(query, relationships=relationships)
+            results = []
+            for (relation_type, source_label, target_label), group in group_relationships(relationships).items():
+                query = get_create_relationships_query(relation_type, source_label, target_label)
+                results.extend(session.run(query, relationships=group).data())
             print(f"Finished creating relationships")
-            return result.data()
+            return results
         except Exception as e:
             print(f"Error handling relationships: {e}")
             return None
 
 
+def write_nodes(tx, node_type: str, nodes: List[Dict]) -> None:
+    tx.run(get_create_nodes_query(node_type), nodes=nodes).consume()
+
+
+def write_relationships(tx, relationships: List[Dict]) -> None:
+    for (relation_type, source_label, target_label), group in group_relationships(relationships).items():
+        query = get_create_relationships_query(relation_type, source_label, target_label)
+        tx.run(query, relationships=group).consume()
+
+
+def handle_graph_batch(nodes_by_type: Dict[str, List[Dict]], relationships: List[Dict]) -> bool:
+    def apply_batch(tx):
+        for node_type, nodes in nodes_by_type.items():
+            write_nodes(tx, node_type, nodes)
+        if relationships:
+            write_relationships(tx, relationships)
+
+    with driver.session() as session:
+        try:
+            session.execute_write(apply_batch)
+            nodes_count = sum(len(nodes) for nodes in nodes_by_type.values())
+            print(f"Committed {nodes_count} nodes and {len(relationships)} relationships")
+            return True
+        except (ServiceUnavailable, SessionExpired, TransientError) as e:
+            # Only these are worth retrying, any other error is raised to the caller
+            print(f"Transient error handling graph batch: {e}")
+            return False
+
+
 def verify_data():
     with driver.session() as session:
         try:
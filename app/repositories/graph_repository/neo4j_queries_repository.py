@@ -1,17 +1,40 @@
+from typing import Optional
+
+NODE_LABELS = ['terror_groups', 'locations', 'attacks']
+
+RELATIONSHIP_ENDPOINT_LABELS = {
+    'ATTACKED': ('terror_groups', 'attacks'),
+    'OCCURRED_IN': ('attacks', 'locations'),
+}
+
+
+def quote_name(name: str) -> str:
+    return f"`{str(name).replace('`', '``')}`"
+
+
+def get_node_pattern(variable: str, label: Optional[str], id_expression: str) -> str:
+    label_part = f":{quote_name(label)}" if label else ""
+    return f"({variable}{label_part} {{id: {id_expression}}})"
+
+
 def get_create_nodes_query(node_type: str) -> str:
     return f"""
     UNWIND $nodes AS node
-    MERGE (n:{node_type} {{id: node.id}})
+    MERGE (n:{quote_name(node_type)} {{id: node.id}})
     SET n += node
     """
 
 
-def get_create_relationships_query() -> str:
-    return """
+def get_create_relationships_query(
+        relation_type: str,
+        source_label: Optional[str] = None,
+        target_label: Optional[str] = None
+) -> str:
+    return f"""
     UNWIND $relationships AS rel
-    MATCH (source) WHERE source.id = rel.source_id
-    MATCH (target) WHERE target.id = rel.target_id
-    MERGE (source)-[r:`${rel.relation_type}`]->(target)
+    MATCH {get_node_pattern('source', source_label, 'rel.source_id')}
+    MATCH {get_node_pattern('target', target_label, 'rel.target_id')}
+    MERGE (source)-[r:{quote_name(relation_type)}]->(target)
     SET r += rel.properties
     """
 
@@ -21,5 +44,9 @@ def get_create_constraints_queries() -> list[str]:
         "CREATE CONSTRAINT IF NOT EXISTS FOR (g:TerrorGroup) REQUIRE g.id IS UNIQUE",
         "CREATE CONSTRAINT IF NOT EXISTS FOR (l:Location) REQUIRE l.id IS UNIQUE",
         "CREATE CONSTRAINT IF NOT EXISTS FOR (a:Attack) REQUIRE a.id IS UNIQUE",
-        "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Target) REQUIRE t.id IS UNIQUE"
+        "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Target) REQUIRE t.id IS UNIQUE",
+        *[
+            f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+            for label in NODE_LABELS
+        ]
     ]
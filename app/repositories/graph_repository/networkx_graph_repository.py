@@ -1,21 +1,107 @@
+import json
 import networkx as nx
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
 import os
 import pickle
 
-from app.config.local_files_config.local_files import EVENTS_GRAPH_NETWORKX
+from app.config.local_files_config.local_files import EVENTS_GRAPH_NETWORKX, EVENTS_GRAPH_NETWORKX_LOG
+
+
+def load_graph_snapshot(path: Path = EVENTS_GRAPH_NETWORKX) -> nx.Graph:
+    if not os.path.exists(path):
+        return nx.Graph()
+    with open(path, 'rb') as f:
+        return pickle.load(f)
 
 
 def load_or_create_graph() -> nx.Graph:
-    if os.path.exists(EVENTS_GRAPH_NETWORKX):
-        with open(EVENTS_GRAPH_NETWORKX, 'rb') as f:
-            return pickle.load(f)
-    return nx.Graph()
+    G = load_graph_snapshot()
+
+    replayed = replay_change_log(G)
+    if replayed:
+        print(f"Replayed {replayed} changes from {EVENTS_GRAPH_NETWORKX_LOG}")
+    return G
+
+
+def save_graph(G: nx.Graph, path: Path = EVENTS_GRAPH_NETWORKX):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(path.suffix + '.tmp')
+
+    with open(temp_path, 'wb') as f:
+        pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+def apply_graph_change(G: nx.Graph, change: Dict) -> None:
+    if change['type'] == 'nodes':
+        handle_nodes_networkx(G, change['node_type'], change['data'])
+    elif change['type'] == 'relationships':
+        handle_relationships_networkx(G, change['data'])
+
+
+def read_change_log(
+        log_path: Path = EVENTS_GRAPH_NETWORKX_LOG,
+        start: int = 0,
+        end: Optional[int] = None
+) -> Tuple[List[Dict], int]:
+    if not os.path.exists(log_path):
+        return [], start
+
+    with open(log_path, 'rb') as f:
+        f.seek(start)
+        content = f.read() if end is None else f.read(max(end - start, 0))
+
+    # A line still being written by the consumer is left for the next read
+    changes, offset = [], start
+    for line in content[:content.rfind(b'\n') + 1].splitlines(keepends=True):
+        try:
+            changes.append(json.loads(line))
+        except json.JSONDecodeError:
+            print(f"Stopped reading at a truncated entry in {log_path}")
+            break
+        offset += len(line)
+    return changes, offset
+
+
+def replay_change_log(G: nx.Graph, log_path: Path = EVENTS_GRAPH_NETWORKX_LOG) -> int:
+    changes, _ = read_change_log(log_path)
+    for change in changes:
+        apply_graph_change(G, change)
+    return len(changes)
+
+
+def repair_change_log(log_path: Path = EVENTS_GRAPH_NETWORKX_LOG) -> None:
+    if not os.path.exists(log_path):
+        return
+
+    with open(log_path, 'rb+') as f:
+        content = f.read()
+        if content and not content.endswith(b'\n'):
+            f.truncate(content.rfind(b'\n') + 1)
+            print(f"Dropped a partially written entry from {log_path}")
+
+
+def open_change_log(log_path: Path = EVENTS_GRAPH_NETWORKX_LOG) -> TextIO:
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    repair_change_log(log_path)
+    return open(log_path, 'a', encoding='utf-8')
+
+
+def append_change(log_file: TextIO, change: Dict) -> None:
+    log_file.write(json.dumps(change, default=str) + '\n')
+    log_file.flush()
+    os.fsync(log_file.fileno())
 
 
-def save_graph(G: nx.Graph):
-    with open(EVENTS_GRAPH_NETWORKX, 'wb') as f:
-        pickle.dump(G, f)
+def compact_graph(G: nx.Graph, log_file: TextIO) -> None:
+    save_graph(G)
+    log_file.truncate(0)
+    log_file.flush()
+    os.fsync(log_file.fileno())
 
 
 def handle_nodes_networkx(G: nx.Graph, node_type: str, nodes: List[Dict]) -> None:
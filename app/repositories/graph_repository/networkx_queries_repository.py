@@ -0,0 +1,218 @@
+import heapq
+import os
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import networkx as nx
+from dotenv import load_dotenv
+
+from app.config.local_files_config.local_files import EVENTS_GRAPH_NETWORKX, EVENTS_GRAPH_NETWORKX_LOG
+from app.repositories.graph_repository.graph_queries_repository import validate_location_filter
+from app.repositories.graph_repository.networkx_graph_repository import load_graph_snapshot, read_change_log, \
+    apply_graph_change
+
+load_dotenv(verbose=True)
+
+local_graph_refresh_seconds = float(os.environ.get('LOCAL_GRAPH_REFRESH_SECONDS', 30))
+
+_local_graph: Dict[str, Any] = {'state': None, 'checked_at': 0.0}
+_local_graph_lock = Lock()
+
+
+def get_file_version(path) -> Optional[Tuple[float, int]]:
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def get_file_size(path) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def refresh_local_graph() -> None:
+    snapshot = get_file_version(EVENTS_GRAPH_NETWORKX)
+    published = _local_graph['state'] or (None, None, 0)
+    G, published_snapshot, offset = published
+
+    # The whole graph is loaded again only after the consumer wrote a new snapshot and truncated the log
+    if G is None or snapshot != published_snapshot or get_file_size(EVENTS_GRAPH_NETWORKX_LOG) < offset:
+        G, offset = load_graph_snapshot(EVENTS_GRAPH_NETWORKX), 0
+
+    changes, offset = read_change_log(EVENTS_GRAPH_NETWORKX_LOG, offset)
+    if changes:
+        if G is published[0]:
+            # Requests may still be iterating the published graph, so changes go into a copy
+            G = G.copy()
+        for change in changes:
+            apply_graph_change(G, change)
+
+    _local_graph['state'] = (G, snapshot, offset)
+    _local_graph['checked_at'] = time.time()
+
+
+def is_local_graph_stale() -> bool:
+    return _local_graph['state'] is None or time.time() - _local_graph['checked_at'] >= local_graph_refresh_seconds
+
+
+def get_local_graph_state() -> Tuple[nx.Graph, Optional[Tuple[float, int]], int]:
+    if is_local_graph_stale():
+        # Only one request refreshes the graph, the others keep answering from the published one
+        if _local_graph_lock.acquire(blocking=_local_graph['state'] is None):
+            try:
+                if is_local_graph_stale():
+                    refresh_local_graph()
+            finally:
+                _local_graph_lock.release()
+    return _local_graph['state']
+
+
+def get_local_graph() -> nx.Graph:
+    return get_local_graph_state()[0]
+
+
+def get_neighbors_by_relation(G: nx.Graph, node: Any, node_type: str, relation_type: str) -> List[Any]:
+    return [
+        neighbor for neighbor, edge in G[node].items()
+        if G.nodes[neighbor].get('type') == node_type and edge.get('type') == relation_type
+    ]
+
+
+def iter_attack_paths(
+        G: nx.Graph,
+        filter_by: str = None,
+        filter_value: str = None
+) -> Iterator[Tuple[Any, Dict, Any]]:
+    filter_by = validate_location_filter(filter_by, filter_value)
+    for attack, attack_data in G.nodes(data=True):
+        if attack_data.get('type') != 'attacks':
+            continue
+
+        locations = get_neighbors_by_relation(G, attack, 'locations', 'OCCURRED_IN')
+        if filter_by:
+            locations = [l for l in locations if G.nodes[l].get(filter_by) == filter_value]
+        if not locations:
+            continue
+
+        groups = get_neighbors_by_relation(G, attack, 'terror_groups', 'ATTACKED')
+        for location in locations:
+            for group in groups:
+                yield location, attack_data, group
+
+
+def get_location_fields(G: nx.Graph, location: Any) -> Dict[str, Any]:
+    data = G.nodes[location]
+    return {
+        'country': data.get('country'),
+        'region': data.get('region'),
+        'latitude': data.get('latitude'),
+        'longitude': data.get('longitude')
+    }
+
+
+def get_attack_types(attack_data: Dict) -> List[str]:
+    attack_types = attack_data.get('attack_types')
+    if attack_types is None:
+        return []
+    return list(attack_types) if isinstance(attack_types, (list, tuple)) else [attack_types]
+
+
+def get_top_records(records: List[Dict[str, Any]], key: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    if limit:
+        return heapq.nlargest(limit, records, key=lambda record: record[key])
+    return sorted(records, key=lambda record: record[key], reverse=True)
+
+
+# 16
+def get_regions_high_group_activity_local(
+        G: nx.Graph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    attacks_by_location = defaultdict(Counter)
+    for location, _, group in iter_attack_paths(G, filter_by, filter_value):
+        attacks_by_location[location][group] += 1
+
+    records = []
+    for location, attacks in attacks_by_location.items():
+        groups = [
+            {
+                'id': G.nodes[group].get('id'),
+                'name': G.nodes[group].get('name'),
+                'subname': G.nodes[group].get('subname'),
+                'attacks': count
+            }
+            for group, count in attacks.items()
+        ]
+        records.append({
+            **get_location_fields(G, location),
+            'groups': groups,
+            'unique_groups_count': len(groups),
+            'total_attacks': sum(attacks.values())
+        })
+
+    return get_top_records(records, 'total_attacks', limit)
+
+
+# 14
+def get_shared_attack_types_local(
+        G: nx.Graph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    groups_by_location_type = defaultdict(dict)
+    for location, attack_data, group in iter_attack_paths(G, filter_by, filter_value):
+        for attack_type in get_attack_types(attack_data):
+            groups_by_location_type[location].setdefault(attack_type, {})[G.nodes[group].get('name')] = None
+
+    records = []
+    for location, groups_by_type in groups_by_location_type.items():
+        attack_strategies = [
+            {'attack_type': attack_type, 'groups': list(groups), 'groups_count': len(groups)}
+            for attack_type, groups in groups_by_type.items()
+        ]
+        records.append({
+            **get_location_fields(G, location),
+            'attack_strategies': attack_strategies,
+            'unique_attack_types_count': len(attack_strategies)
+        })
+
+    return get_top_records(records, 'unique_attack_types_count', limit)
+
+
+# 11
+def get_groups_shared_targets_local(
+        G: nx.Graph,
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    target_types_by_group = defaultdict(lambda: defaultdict(set))
+    for location, attack_data, group in iter_attack_paths(G, filter_by, filter_value):
+        target_types_by_group[location][group].add(tuple(get_attack_types(attack_data)))
+
+    records = []
+    for location, groups in target_types_by_group.items():
+        groups_by_targets = defaultdict(dict)
+        for group, target_types in groups.items():
+            groups_by_targets[tuple(sorted(target_types))][G.nodes[group].get('name')] = None
+
+        shared_targets = [
+            {
+                'target_types': [list(types) for types in target_types],
+                'groups': list(group_names),
+                'groups_count': len(group_names)
+            }
+            for target_types, group_names in groups_by_targets.items()
+        ]
+        records.append({
+            **get_location_fields(G, location),
+            'shared_targets': shared_targets,
+            'max_shared_groups': max((target['groups_count'] for target in shared_targets), default=0)
+        })
+
+    return get_top_records(records, 'max_shared_groups', limit)
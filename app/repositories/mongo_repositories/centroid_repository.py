@@ -0,0 +1,125 @@
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+from app.config.mongo_config.mongo_client import terror_events_collection, centroids_collection
+from app.repositories.mongo_repositories.mongo_queries_repository import query_centroids
+
+# Each level is keyed by its fields, most general first, so cities stay distinct across countries
+CENTROID_LEVELS = {
+    'region': ['region'],
+    'country': ['country'],
+    'city': ['country', 'city']
+}
+
+
+def get_centroid_key(level: str, event: Dict[str, Any]) -> Optional[str]:
+    values = [event.get(field) for field in CENTROID_LEVELS[level]]
+    if not all(isinstance(value, str) and value for value in values):
+        return None
+    return f"{level}:{'/'.join(values)}"
+
+
+def get_unit_vector(event: Dict[str, Any]) -> Optional[Tuple[float, float, float]]:
+    try:
+        latitude, longitude = float(event['latitude']), float(event['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)) or (latitude == 0 and longitude == 0):
+        return None
+
+    # Summing unit vectors instead of raw degrees keeps centroids correct across the antimeridian
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    return (
+        math.cos(latitude) * math.cos(longitude),
+        math.cos(latitude) * math.sin(longitude),
+        math.sin(latitude)
+    )
+
+
+def get_centroid_increments(events: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    increments = {}
+    for event in events:
+        vector = get_unit_vector(event)
+        if vector is None:
+            continue
+
+        for level, fields in CENTROID_LEVELS.items():
+            key = get_centroid_key(level, event)
+            if key is None:
+                continue
+
+            increment = increments.setdefault(key, {
+                'level': level,
+                'name': event[fields[-1]],
+                'fields': {field: event[field] for field in fields},
+                'sums': defaultdict(float)
+            })
+            increment['sums']['x'] += vector[0]
+            increment['sums']['y'] += vector[1]
+            increment['sums']['z'] += vector[2]
+            increment['sums']['count'] += 1
+
+    return increments
+
+
+def update_centroids(events: Iterable[Dict[str, Any]], collection: Collection = centroids_collection) -> int:
+    increments = get_centroid_increments(events)
+    if not increments:
+        return 0
+
+    operations = [
+        UpdateOne(
+            {'_id': key},
+            {
+                '$inc': {**increment['sums'], 'count': int(increment['sums']['count'])},
+                '$setOnInsert': {'level': increment['level'], 'name': increment['name'], **increment['fields']}
+            },
+            upsert=True
+        )
+        for key, increment in increments.items()
+    ]
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def rebuild_centroids(
+        source: Collection = terror_events_collection,
+        collection: Collection = centroids_collection
+) -> None:
+    collection.delete_many({})
+    for level, fields in CENTROID_LEVELS.items():
+        source.aggregate(query_centroids(level, fields, into=collection.name), allowDiskUse=True)
+    collection.create_index([('level', 1), ('name', 1)])
+    print(f"Rebuilt {collection.estimated_document_count()} centroids")
+
+
+def ensure_centroids(
+        source: Collection = terror_events_collection,
+        collection: Collection = centroids_collection
+) -> None:
+    if collection.estimated_document_count() == 0 and source.estimated_document_count() > 0:
+        rebuild_centroids(source, collection)
+
+
+def to_coordinates(x: float, y: float, z: float) -> Optional[Tuple[float, float]]:
+    horizontal = math.hypot(x, y)
+    if horizontal == 0 and z == 0:
+        return None
+    return math.degrees(math.atan2(z, horizontal)), math.degrees(math.atan2(y, x))
+
+
+def get_centroids(level: str, collection: Collection = centroids_collection) -> Dict[str, Tuple[float, float]]:
+    centroids = {}
+    for centroid in collection.find({'level': level}, projection={'x': 1, 'y': 1, 'z': 1}):
+        coordinates = to_coordinates(centroid['x'], centroid['y'], centroid['z'])
+        if coordinates:
+            centroids[centroid['_id'].split(':', 1)[1]] = coordinates
+    return centroids
+
+
+if __name__ == '__main__':
+    rebuild_centroids()
@@ -51,12 +51,6 @@ def query_casualties_by_region(top_n: Optional[int] = None) -> List[Dict[str, An
                             {'$ifNull': ['$num_wounded', 0]}
                         ]
                     }
-                },
-                'representative_location': {
-                    '$first': {
-                        'latitude': '$latitude',
-                        'longitude': '$longitude'
-                    }
                 }
             }
         },
@@ -302,3 +296,134 @@ def query_terror_heatmap_data(time_period: str = 'year', start_year: int = 1970)
     ]
 
     return pipeline
+
+
+# 7 - animated
+def query_terror_heatmap_frames(start_year: int = 1970, end_year: int = 2100, precision: int = 2) -> List[Dict[str, Any]]:
+
+    pipeline = [
+        {
+            "$match": {
+                "latitude": {"$exists": True, "$ne": None},
+                "longitude": {"$exists": True, "$ne": None},
+                "event_date": {"$exists": True, "$ne": None}
+            }
+        },
+        {
+            "$addFields": {
+                "year": {"$year": {"$toDate": "$event_date"}},
+                "month": {"$month": {"$toDate": "$event_date"}}
+            }
+        },
+        {
+            "$match": {
+                "year": {
+                    "$gte": start_year,
+                    "$lt": end_year
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "latitude": {"$round": [{"$toDouble": "$latitude"}, precision]},
+                    "longitude": {"$round": [{"$toDouble": "$longitude"}, precision]},
+                    "year": "$year",
+                    "month": "$month"
+                },
+                "events_count": {"$sum": 1},
+                "total_casualties": {
+                    "$sum": {
+                        "$add": [
+                            {"$ifNull": ["$num_killed", 0]},
+                            {"$ifNull": ["$num_wounded", 0]}
+                        ]
+                    }
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "year": "$_id.year",
+                    "month": "$_id.month"
+                },
+                "points": {
+                    "$push": ["$_id.latitude", "$_id.longitude", "$events_count", "$total_casualties"]
+                }
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "year": "$_id.year",
+                "month": "$_id.month",
+                "points": 1
+            }
+        },
+        {
+            "$sort": {"year": 1, "month": 1}
+        }
+    ]
+
+    return pipeline
+
+
+# Centroids
+def query_centroids(level: str, key_fields: List[str], into: str = 'centroids') -> List[Dict[str, Any]]:
+    latitude = {'$degreesToRadians': {'$convert': {'input': '$latitude', 'to': 'double', 'onError': None}}}
+    longitude = {'$degreesToRadians': {'$convert': {'input': '$longitude', 'to': 'double', 'onError': None}}}
+
+    key_parts = []
+    for field in key_fields:
+        key_parts.extend(['/', f'${field}'] if key_parts else [f'{level}:', f'${field}'])
+
+    pipeline = [
+        {
+            '$match': {
+                **{field: {'$type': 'string', '$ne': ''} for field in key_fields},
+                'latitude': {'$ne': None},
+                'longitude': {'$ne': None},
+                '$nor': [{'latitude': 0, 'longitude': 0}]
+            }
+        },
+        {
+            '$project': {
+                'key': {'$concat': key_parts},
+                **{field: 1 for field in key_fields},
+                'latitude': latitude,
+                'longitude': longitude
+            }
+        },
+        {
+            '$match': {
+                'latitude': {'$ne': None},
+                'longitude': {'$ne': None}
+            }
+        },
+        {
+            '$group': {
+                '_id': '$key',
+                **{field: {'$first': f'${field}'} for field in key_fields},
+                'x': {'$sum': {'$multiply': [{'$cos': '$latitude'}, {'$cos': '$longitude'}]}},
+                'y': {'$sum': {'$multiply': [{'$cos': '$latitude'}, {'$sin': '$longitude'}]}},
+                'z': {'$sum': {'$sin': '$latitude'}},
+                'count': {'$sum': 1}
+            }
+        },
+        {
+            '$addFields': {
+                'level': level,
+                'name': f'${key_fields[-1]}'
+            }
+        },
+        {
+            '$merge': {
+                'into': into,
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+    return pipeline
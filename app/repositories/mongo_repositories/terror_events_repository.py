@@ -5,7 +5,7 @@ from app.config.mongo_config.mongo_client import terror_events_collection
 from app.repositories.mongo_repositories.mongo_queries_repository import (
     query_deadly_attack_types, query_casualties_by_region, query_top_terrorist_groups,
     query_attack_frequency, query_attack_type_target_correlation, query_attack_change_by_region,
-    query_terror_heatmap_data,
+    query_terror_heatmap_data, query_terror_heatmap_frames
 )
 
 
@@ -72,6 +72,24 @@ def get_terror_heatmap_data(
     return list(collection.aggregate(pipeline))
 
 
+# 7 - animated
+def get_terror_heatmap_frames(
+        collection=terror_events_collection,
+        start_year: int = 1970,
+        end_year: int = 2100,
+        precision: int = 2
+) -> List[Dict[str, Any]]:
+    pipeline = query_terror_heatmap_frames(start_year, end_year, precision)
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+def get_terror_events_version(collection=terror_events_collection) -> str:
+    # Events are only ever appended, so the count and the newest _id together identify the data
+    latest = collection.find_one({}, projection={'_id': 1}, sort=[('_id', -1)])
+    latest_id = latest['_id'] if latest else 'empty'
+    return f"{collection.estimated_document_count()}-{latest_id}"
+
+
 if __name__ == '__main__':
     print(
         get_casualties_by_region()
@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify
+from app.repositories.elastic_repositories.elastic_repository import SUGGEST_FIELDS
 from app.services.elastic_service import elastic_service as search_service
 
 elastic_bp = Blueprint('search', __name__)
@@ -66,3 +67,84 @@ def search_combined():
         return jsonify(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+def get_geo_filters() -> dict:
+    filters = {
+        "keywords": request.args.get('q'),
+        "start_date": request.args.get('start_date'),
+        "end_date": request.args.get('end_date')
+    }
+
+    bbox = [request.args.get(name, type=float) for name in
+            ('top_left_lat', 'top_left_lon', 'bottom_right_lat', 'bottom_right_lon')]
+    if any(value is not None for value in bbox):
+        if any(value is None for value in bbox):
+            raise ValueError("Bounding box requires top_left_lat, top_left_lon, bottom_right_lat and bottom_right_lon")
+        filters["top_left"] = (bbox[0], bbox[1])
+        filters["bottom_right"] = (bbox[2], bbox[3])
+
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    distance = request.args.get('distance')
+    if lat is not None or lon is not None or distance:
+        if lat is None or lon is None or not distance:
+            raise ValueError("Radius filter requires lat, lon and distance (e.g. 50km)")
+        filters["center"] = (lat, lon)
+        filters["distance"] = distance
+
+    return filters
+
+
+@elastic_bp.route('/geo', methods=['GET'])
+def search_geo():
+    limit = request.args.get('limit', type=int)
+
+    try:
+        filters = get_geo_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        results = search_service.search_geo(limit=limit, **filters)
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@elastic_bp.route('/geo/grid', methods=['GET'])
+def search_geo_grid():
+    zoom = request.args.get('zoom', default=3, type=int)
+
+    if not 0 <= zoom <= 29:
+        return jsonify({"error": "zoom must be between 0 and 29"}), 400
+
+    try:
+        filters = get_geo_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        results = search_service.get_geo_grid(zoom=zoom, **filters)
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@elastic_bp.route('/suggest', methods=['GET'])
+def suggest():
+    prefix = request.args.get('q', '').strip()
+    field = request.args.get('field', 'groups')
+    limit = request.args.get('limit', default=10, type=int)
+
+    if not prefix:
+        return jsonify({"error": "Missing search prefix"}), 400
+
+    if field not in SUGGEST_FIELDS:
+        return jsonify({"error": f"Invalid field. Must be one of: {', '.join(SUGGEST_FIELDS)}"}), 400
+
+    try:
+        results = search_service.suggest(prefix=prefix, field=field, limit=min(max(limit, 1), 50))
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
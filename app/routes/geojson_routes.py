@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from app.services.geojson_service import get_geojson_layer, GEOJSON_LAYERS
+
+geojson_bp = Blueprint('geojson', __name__)
+
+
+@geojson_bp.route('/map', methods=['GET'])
+def map_shell_route():
+    return current_app.send_static_file('map_shell.html')
+
+
+@geojson_bp.route('/layers', methods=['GET'])
+def layers_route():
+    return jsonify(sorted(GEOJSON_LAYERS))
+
+
+@geojson_bp.route('/<layer>', methods=['GET'])
+def geojson_layer_route(layer):
+    params = {
+        'top_n': request.args.get('top', type=int),
+        'time_period': request.args.get('time_period', default='year'),
+        'start_year': request.args.get('start_year', default=1970, type=int),
+        'filter_by': request.args.get('filter_by'),
+        'filter_value': request.args.get('filter_value'),
+        'backend': request.args.get('backend', 'memgraph'),
+        'limit': request.args.get('limit', type=int)
+    }
+
+    if layer not in GEOJSON_LAYERS:
+        return jsonify({'error': f"Unknown layer. Must be one of: {', '.join(sorted(GEOJSON_LAYERS))}"}), 404
+
+    try:
+        if params['top_n'] is not None and params['top_n'] <= 0:
+            raise ValueError("Invalid top parameter. Must be a positive integer.")
+        if params['limit'] is not None and params['limit'] < 1:
+            raise ValueError("limit must be a positive integer")
+        if params['time_period'] not in ('year', '3_years', '5_years'):
+            raise ValueError("Invalid time_period. Must be one of: year, 3_years, 5_years")
+
+        chunks = get_geojson_layer(layer, **params)
+        return Response(stream_with_context(chunks), mimetype='application/geo+json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,21 +1,38 @@
 from flask import Blueprint, jsonify, request
 
-from app.repositories.graph_repository.memgraph_repository import get_regions_high_group_activity
+from app.config.neo4j_config.neo4j_connection import get_pool_metrics
 from app.services.graph_service import get_regions_high_group_activity_data, get_attack_strategies_data, \
-    create_attack_strategies_map, get_shared_targets_data, create_shared_targets_map
+    create_attack_strategies_map, get_shared_targets_data, create_shared_targets_map, get_group_partners, \
+    get_top_group_pairs, get_group_communities, get_graph_data_version
+from app.services.map_cache_service import MapQuery
 from app.services.map_service import create_high_group_activity_map
+from app.utils.http_util import make_html_response, parse_bool
 
 graph_bp = Blueprint('groups', __name__)
 
+
+def get_graph_map_query(get_data, filter_by: str, filter_value: str, backend: str, limit: int) -> MapQuery:
+    params = {'filter_by': filter_by, 'filter_value': filter_value, 'backend': backend, 'limit': limit}
+    return MapQuery(get_data, params, version=get_graph_data_version)
+
+
 # 16
 @graph_bp.route('/high-group-activity', methods=['GET'])
 def high_group_activity_route():
     filter_by = request.args.get('filter_by')
     filter_value = request.args.get('filter_value')
+    backend = request.args.get('backend', 'memgraph')
+    limit = request.args.get('limit', type=int)
+    clustered = request.args.get('clustered', type=parse_bool, default=False)
+    popups = request.args.get('popups', 'lazy')
 
     try:
-        data = get_regions_high_group_activity(filter_by, filter_value)
-        return create_high_group_activity_map(data)
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        data = get_graph_map_query(get_regions_high_group_activity_data, filter_by, filter_value, backend, limit)
+        return make_html_response(create_high_group_activity_map(data, clustered=clustered, popups=popups))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -25,11 +42,19 @@ def high_group_activity_route():
 def attack_strategies_route():
     filter_by = request.args.get('filter_by')
     filter_value = request.args.get('filter_value')
+    backend = request.args.get('backend', 'memgraph')
+    limit = request.args.get('limit', type=int)
+    clustered = request.args.get('clustered', type=parse_bool, default=False)
+    popups = request.args.get('popups', 'lazy')
 
     try:
-        data = get_attack_strategies_data(filter_by, filter_value)
-        map_html = create_attack_strategies_map(data)
-        return map_html
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        data = get_graph_map_query(get_attack_strategies_data, filter_by, filter_value, backend, limit)
+        map_html = create_attack_strategies_map(data, clustered=clustered, popups=popups)
+        return make_html_response(map_html)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -39,10 +64,55 @@ def attack_strategies_route():
 def shared_targets_route():
     filter_by = request.args.get('filter_by')
     filter_value = request.args.get('filter_value')
+    backend = request.args.get('backend', 'memgraph')
+    limit = request.args.get('limit', type=int)
+    popups = request.args.get('popups', 'lazy')
+
+    try:
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        data = get_graph_map_query(get_shared_targets_data, filter_by, filter_value, backend, limit)
+        map_html = create_shared_targets_map(data, popups=popups)
+        return make_html_response(map_html)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@graph_bp.route('/groups/<path:group>/partners', methods=['GET'])
+def group_partners_route(group):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+
+    try:
+        result = get_group_partners(group, limit)
+        if result is None:
+            return jsonify({'error': f"Unknown group: {group}"}), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@graph_bp.route('/groups/top-pairs', methods=['GET'])
+def top_group_pairs_route():
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 1000)
+
+    try:
+        return jsonify(get_top_group_pairs(limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@graph_bp.route('/groups/communities', methods=['GET'])
+def group_communities_route():
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
 
     try:
-        data = get_shared_targets_data(filter_by, filter_value)
-        map_html = create_shared_targets_map(data)
-        return map_html
+        return jsonify(get_group_communities(limit))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@graph_bp.route('/pool-metrics', methods=['GET'])
+def pool_metrics_route():
+    return jsonify(get_pool_metrics())
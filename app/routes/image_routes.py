@@ -0,0 +1,53 @@
+from flask import Blueprint, jsonify, request
+
+from app.services.image_service import get_image, IMAGE_LAYERS
+from app.utils.http_util import make_cached_response
+
+image_bp = Blueprint('images', __name__)
+
+IMAGE_MAX_AGE_SECONDS = 3600
+
+
+def get_image_params():
+    params = {
+        'top_n': request.args.get('top', type=int),
+        'time_period': request.args.get('time_period', default='year'),
+        'start_year': request.args.get('start_year', default=1970, type=int)
+    }
+
+    if params['top_n'] is not None and params['top_n'] <= 0:
+        raise ValueError("Invalid top parameter. Must be a positive integer.")
+    if params['time_period'] not in ('year', '3_years', '5_years'):
+        raise ValueError("Invalid time_period. Must be one of: year, 3_years, 5_years")
+    if params['start_year'] < 1970:
+        raise ValueError("start_year must be >= 1970")
+    return params
+
+
+def image_response(layer, tile=None):
+    if layer not in IMAGE_LAYERS:
+        return jsonify({'error': f"Unknown layer. Must be one of: {', '.join(sorted(IMAGE_LAYERS))}"}), 404
+
+    try:
+        image, etag = get_image(
+            layer,
+            get_image_params(),
+            tile=tile,
+            width=request.args.get('width', default=1024, type=int),
+            height=request.args.get('height', default=1024, type=int)
+        )
+        return make_cached_response(image, 'image/png', etag=etag, max_age=IMAGE_MAX_AGE_SECONDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@image_bp.route('/<layer>.png', methods=['GET'])
+def image_route(layer):
+    return image_response(layer)
+
+
+@image_bp.route('/<layer>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def image_tile_route(layer, z, x, y):
+    return image_response(layer, tile=(z, x, y))
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+
+from app.services.popup_service import render_popup
+from app.utils.http_util import make_cached_response
+
+popup_bp = Blueprint('popup', __name__)
+
+POPUP_MAX_AGE_SECONDS = 86400
+
+
+@popup_bp.route('/<kind>/<popup_id>', methods=['GET'])
+def popup_route(kind, popup_id):
+    try:
+        html = render_popup(kind, popup_id)
+        if html is None:
+            return jsonify({'error': f"Unknown popup: {kind}/{popup_id}"}), 404
+
+        # The id is a hash of the popup record, so the content behind it never changes
+        return make_cached_response(html, 'text/html', etag=popup_id, max_age=POPUP_MAX_AGE_SECONDS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
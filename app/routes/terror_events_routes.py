@@ -1,10 +1,18 @@
-from flask import Blueprint, jsonify, request
+from datetime import datetime
+from urllib.parse import urlencode
 
-from app.services.map_service import create_attack_change_map, create_attack_change_map_detailed
+from flask import Blueprint, jsonify, request, url_for
+
+from app.services.heatmap_frames_service import get_heatmap_frames
+from app.services.map_service import create_attack_change_map, create_attack_change_map_detailed, \
+    create_animated_heatmap
+from app.services.map_cache_service import MapQuery
 from app.services.terror_events_service import (
     process_deadly_attack_types, process_casualties_by_region, process_top_terrorist_groups, process_attack_frequency,
-    process_attack_type_target_correlation, process_attack_change_by_region, process_terror_heatmap_data
+    process_attack_type_target_correlation, process_attack_change_by_region, process_terror_heatmap_data,
+    get_events_data_version
 )
+from app.utils.http_util import make_html_response, make_cached_response, parse_bool
 from app.utils.valid_date_util import is_valid_date
 
 event_bp = Blueprint('events', __name__)
@@ -40,7 +48,7 @@ def get_casualties_by_region():
         )
 
         if isinstance(results, str):
-            return results, 200, {'Content-Type': 'text/html'}
+            return make_html_response(results)
 
         return jsonify(results)
 
@@ -123,12 +131,11 @@ def get_attack_change_by_region():
                 'error': 'Invalid top parameter. Must be a positive integer.'
             }), 400
 
-        results = process_attack_change_by_region(top_n=top_n)
-
         if include_map:
-            map_html = create_attack_change_map(results)
-            return map_html, 200, {'Content-Type': 'text/html'}
+            query = MapQuery(process_attack_change_by_region, {'top_n': top_n}, version=get_events_data_version)
+            return make_html_response(create_attack_change_map(query))
 
+        results = process_attack_change_by_region(top_n=top_n)
         return jsonify(results)
 
     except Exception as e:
@@ -151,12 +158,12 @@ def get_attack_change_by_region_2():
                 'error': 'Invalid top parameter. Must be a positive integer.'
             }), 400
 
-        results = process_attack_change_by_region(top_n=top_n)
-
         if include_map:
-            map_html = create_attack_change_map_detailed(results) if detailed else create_attack_change_map(results)
-            return map_html, 200, {'Content-Type': 'text/html'}
+            query = MapQuery(process_attack_change_by_region, {'top_n': top_n}, version=get_events_data_version)
+            map_html = create_attack_change_map_detailed(query) if detailed else create_attack_change_map(query)
+            return make_html_response(map_html)
 
+        results = process_attack_change_by_region(top_n=top_n)
         return jsonify(results)
 
     except Exception as e:
@@ -192,7 +199,7 @@ def get_terror_hotspots():
         )
 
         if isinstance(results, str):
-            return results, 200, {'Content-Type': 'text/html'}
+            return make_html_response(results)
 
         return jsonify(results)
 
@@ -203,6 +210,80 @@ def get_terror_hotspots():
         }), 500
 
 
+FRAME_MAX_AGE_SECONDS = 3600
+
+
+def get_frame_params():
+    start_year = request.args.get('start_year', default=1970, type=int)
+    end_year = request.args.get('end_year', default=datetime.now().year + 1, type=int)
+    weight = request.args.get('weight', default='events')
+
+    if start_year < 1970:
+        raise ValueError('start_year must be >= 1970')
+    return {'start_year': start_year, 'end_year': end_year, 'weight': weight}
+
+
+# 7 - animated
+@event_bp.route('/terror_hotspots/frames', methods=['GET'])
+def get_terror_hotspots_frames_index():
+    try:
+        params = get_frame_params()
+        frames = get_heatmap_frames(**params)
+        return jsonify({'frames': frames.index, 'max_weight': frames.max_weight, **params})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': 'An unexpected error occurred',
+            'details': str(e)
+        }), 500
+
+
+@event_bp.route('/terror_hotspots/frames/<frame>', methods=['GET'])
+def get_terror_hotspots_frame(frame):
+    try:
+        frames = get_heatmap_frames(**get_frame_params())
+        points = frames.get_frame(frame)
+        if points is None:
+            return jsonify({'error': f"Unknown frame: {frame}"}), 404
+
+        return make_cached_response(
+            points, 'application/json', etag=frames.etags[frame], max_age=FRAME_MAX_AGE_SECONDS
+        )
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': 'An unexpected error occurred',
+            'details': str(e)
+        }), 500
+
+
+@event_bp.route('/terror_hotspots/animated', methods=['GET'])
+def get_terror_hotspots_animated():
+    try:
+        params = get_frame_params()
+        inline = request.args.get('inline', type=parse_bool, default=False)
+        frames = get_heatmap_frames(**params)
+
+        if inline:
+            map_html = create_animated_heatmap(frames.index, frames=frames.get_all_points())
+        else:
+            frame_url = f"{url_for('.get_terror_hotspots_frames_index')}/{{frame}}?{urlencode(params)}"
+            map_html = create_animated_heatmap(frames.index, frame_url=frame_url)
+        return make_html_response(map_html)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': 'An unexpected error occurred',
+            'details': str(e)
+        }), 500
+
+
 @event_bp.route('/geographic_terror_hotspots_2', methods=['GET'])
 def get_geographic_hotspots_2():
     try:
@@ -223,7 +304,7 @@ def get_geographic_hotspots_2():
         )
 
         if isinstance(results, str):
-            return results, 200, {'Content-Type': 'text/html'}
+            return make_html_response(results)
 
         return jsonify(results)
 
@@ -0,0 +1,47 @@
+import os
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.repositories.mongo_repositories.centroid_repository import get_centroids, update_centroids, \
+    ensure_centroids, CENTROID_LEVELS
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+centroid_cache = LRUCache(
+    max_size=len(CENTROID_LEVELS),
+    ttl_seconds=int(os.environ.get('CENTROID_CACHE_TTL_SECONDS', 300))
+)
+
+
+def get_centroid_table(level: str) -> Dict[str, Tuple[float, float]]:
+    table = centroid_cache.get(level)
+    if table is None:
+        try:
+            table = get_centroids(level)
+        except Exception as e:
+            print(f"Error loading {level} centroids: {e}")
+            table = {}
+        centroid_cache.set(level, table)
+    return table
+
+
+def get_centroid(level: str, *names: str) -> Optional[Tuple[float, float]]:
+    return get_centroid_table(level).get('/'.join(names))
+
+
+def refresh_centroids(events) -> bool:
+    try:
+        update_centroids(events)
+        return True
+    except Exception as e:
+        print(f"Error updating centroids: {e}")
+        return False
+
+
+def setup_centroid_index() -> None:
+    try:
+        ensure_centroids()
+    except Exception as e:
+        print(f"Error building centroid index: {e}")
@@ -1,23 +1,31 @@
 import json
 import os
 import time
+from collections import defaultdict
 from datetime import datetime, UTC
 from functools import partial
-from typing import List
+from typing import List, Dict, Tuple, Optional
+
+from kafka import KafkaConsumer
 
 from app.config.elastic_config.elastic_connection import elastic_client
 from app.config.kafka_config.consumer import create_kafka_consumer
 from app.repositories.elastic_repositories.elastic_repository import save_terror_events_to_elastic
 from app.repositories.elastic_repositories.setup_es_indices import setup_terror_events_index
 from app.repositories.graph_repository.neo4j_entities_repository import (
-    create_constraints, handle_nodes, handle_relationships
+    create_constraints, handle_graph_batch
 )
 from app.repositories.graph_repository.networkx_graph_repository import (
-    load_or_create_graph, handle_nodes_networkx, handle_relationships_networkx,
-    save_graph, print_graph_stats_networkx
+    load_or_create_graph, apply_graph_change, open_change_log, append_change, compact_graph,
+    print_graph_stats_networkx
+)
+from app.repositories.graph_repository.group_coactivity_repository import load_or_build_coactivity, save_coactivity
+from app.repositories.graph_repository.compact_graph_repository import (
+    load_or_create_compact_graph, save_compact_graph
 )
 
-from app.services.storage_service import save_terror_events_to_mongo
+from app.services.centroid_service import setup_centroid_index
+from app.services.storage_service import save_terror_events_to_mongo, setup_terror_events_collection
 
 
 def process_kafka_messages(topic: str, batch_size: int = 100, save_fns: List[callable] = None, timeout_seconds: int = 60) -> None:
@@ -44,16 +52,17 @@ def process_kafka_messages(topic: str, batch_size: int = 100, save_fns: List[cal
                 continue
 
     except Exception as e:
-        print(f"Error processing messages: {e}")
+        # Nothing of the failed batch is committed, Kafka delivers it again once the consumer restarts
+        print(f"Error processing messages, {len(batch)} events left uncommitted: {e}")
     finally:
-        if batch:
-            [save_fn(batch) for save_fn in save_fns]
         consumer.close()
 
 
 def consume_for_mongo_and_elastic(topic_name: str, batch_size: int = 100) -> None:
 
     setup_terror_events_index(elastic_client)
+    setup_terror_events_collection()
+    setup_centroid_index()
 
     save_functions = [
         save_terror_events_to_mongo,
@@ -77,54 +86,152 @@ consume_real_time_for_mongo_and_elastic = partial(
 consume_history_for_mongo_and_elastic = partial(
     consume_for_mongo_and_elastic,
     topic_name=os.environ['API_TERROR_EVENTS'],
-    batch_size=100
+    batch_size=2000
 )
 
 
-def consume_for_neo4j():
+graph_batch_max_attempts = int(os.environ.get('GRAPH_BATCH_MAX_ATTEMPTS', 5))
+
+
+def collect_graph_batch(
+        consumer: KafkaConsumer,
+        max_messages: int,
+        timeout_seconds: float
+) -> Tuple[Dict[str, List[Dict]], List[Dict], int]:
+    nodes_by_type = defaultdict(list)
+    relationships = []
+    count = 0
+    deadline = time.time() + timeout_seconds
+
+    while count < max_messages and (remaining := deadline - time.time()) > 0:
+        records = consumer.poll(timeout_ms=int(remaining * 1000), max_records=max_messages - count)
+        for messages in records.values():
+            for message in messages:
+                count += 1
+                try:
+                    data = message.value
+                    if data['type'] == 'nodes':
+                        nodes_by_type[data['node_type']].extend(data['data'])
+                    elif data['type'] == 'relationships':
+                        relationships.extend(data['data'])
+                except (KeyError, TypeError) as e:
+                    print(f"Error processing message at offset {message.offset}: {e}")
+
+    return nodes_by_type, relationships, count
+
+
+def rewind_to_committed(consumer: KafkaConsumer) -> None:
+    for partition in consumer.assignment():
+        committed = consumer.committed(partition)
+        if committed is None:
+            consumer.seek_to_beginning(partition)
+        else:
+            consumer.seek(partition, committed)
+
+
+def get_batch_offsets(consumer: KafkaConsumer) -> Dict[str, Tuple[Optional[int], int]]:
+    return {
+        f"{partition.topic}[{partition.partition}]": (consumer.committed(partition), consumer.position(partition))
+        for partition in consumer.assignment()
+    }
+
+
+def consume_for_neo4j(max_batch_messages: int = 500, batch_timeout_seconds: float = 5.0):
     consumer = create_kafka_consumer(os.environ['NEO4J_ENTITIES'])
+    attempts = 0
 
     try:
         create_constraints()
 
-        for message in consumer:
+        while True:
+            nodes_by_type, relationships, count = collect_graph_batch(
+                consumer, max_batch_messages, batch_timeout_seconds
+            )
+            if not count:
+                continue
+
             try:
-                data = message.value
-                if data['type'] == 'nodes':
-                    handle_nodes(data['node_type'], data['data'])
-                elif data['type'] == 'relationships':
-                    handle_relationships(data['data'])
-                consumer.commit()
+                written = handle_graph_batch(nodes_by_type, relationships)
             except Exception as e:
-                print(f"Error processing message: {e}")
+                # Retrying cannot fix a malformed batch, so it is skipped instead of blocking every later one
+                print(f"Skipping graph batch at offsets {get_batch_offsets(consumer)}: {e}")
+                written = True
+
+            if written:
+                consumer.commit()
+                attempts = 0
+                continue
+
+            attempts += 1
+            if attempts >= graph_batch_max_attempts:
+                # Left uncommitted, the batch is delivered again once the consumer restarts
+                raise Exception(
+                    f"Graph batch at offsets {get_batch_offsets(consumer)} failed after {attempts} attempts"
+                )
+            rewind_to_committed(consumer)
+            time.sleep(batch_timeout_seconds * attempts)
     finally:
         consumer.close()
 
 
-def consume_for_networkx():
-    consumer = create_kafka_consumer(os.environ['NEO4J_ENTITIES'])
+def consume_for_networkx(snapshot_every: int = int(os.environ.get('GRAPH_SNAPSHOT_EVERY', 50000))):
+    consumer = create_kafka_consumer(os.environ['NEO4J_ENTITIES'], group_id='terror_events_networkx_graph')
     G = load_or_create_graph()
+    coactivity = load_or_build_coactivity(G)
+    change_log = open_change_log()
+    compact_graph(G, change_log)
+    save_coactivity(coactivity, G)
+    changes_since_snapshot = 0
 
     try:
         for message in consumer:
             try:
                 data = message.value
-                if data['type'] == 'nodes':
-                    handle_nodes_networkx(G, data['node_type'], data['data'])
-                elif data['type'] == 'relationships':
-                    handle_relationships_networkx(G, data['data'])
+                apply_graph_change(G, data)
+                coactivity.apply_change(G, data)
+                append_change(change_log, data)
+                changes_since_snapshot += 1
 
-                if message.offset % 1000 == 0:
-                    save_graph(G)
+                if changes_since_snapshot >= snapshot_every:
+                    compact_graph(G, change_log)
+                    save_coactivity(coactivity, G)
+                    changes_since_snapshot = 0
 
                 consumer.commit()
             except Exception as e:
                 print(f"Error processing message: {e}")
     finally:
-        save_graph(G)
+        compact_graph(G, change_log)
+        save_coactivity(coactivity, G)
+        change_log.close()
         print_graph_stats_networkx(G)
 
 
+def consume_for_compact_graph(snapshot_every: int = int(os.environ.get('GRAPH_SNAPSHOT_EVERY', 50000))):
+    # Every graph sink needs its own group, a shared one would split the partitions and offsets between them
+    consumer = create_kafka_consumer(os.environ['NEO4J_ENTITIES'], group_id='terror_events_compact_graph')
+    graph = load_or_create_compact_graph()
+    changes_since_snapshot = 0
+
+    try:
+        for message in consumer:
+            try:
+                graph.apply_change(message.value)
+                changes_since_snapshot += 1
+
+                if changes_since_snapshot >= snapshot_every:
+                    save_compact_graph(graph)
+                    consumer.commit()
+                    changes_since_snapshot = 0
+            except Exception as e:
+                print(f"Error processing message: {e}")
+    finally:
+        save_compact_graph(graph)
+        consumer.commit()
+        consumer.close()
+        print(f"Compact graph: {graph.number_of_nodes} nodes, {graph.number_of_edges} edges")
+
+
 if __name__ == "__main__":
     consume_history_for_mongo_and_elastic()
     # consume_for_neo4j()
@@ -1,14 +1,25 @@
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, UTC
 
-from app.repositories.elastic_repositories.elastic_repository import create_base_query, search_by_query
+from app.repositories.elastic_repositories.elastic_repository import (
+    create_base_query, search_by_query, create_filtered_query, add_bounding_box_filter, add_radius_filter,
+    add_geotile_grid_aggregation, create_suggest_query
+)
+from app.repositories.elastic_repositories.setup_es_indices import terror_events_hot_alias, \
+    terror_events_suggest_indices
+from app.utils.cache_util import LRUCache
 
 load_dotenv(verbose=True)
 
 terror_events = os.environ['TERROR_EVENTS_INDEX']
 
+suggestions_cache = LRUCache(
+    max_size=int(os.environ.get('SUGGEST_CACHE_SIZE', 5000)),
+    ttl_seconds=int(os.environ.get('SUGGEST_CACHE_TTL_SECONDS', 300))
+)
+
 
 def format_results(results: Dict[str, Any]) -> Dict[str, Any]:
     return {
@@ -23,7 +34,7 @@ def search_all(keywords: str, limit: Optional[int] = None, index_name: str = ter
     return format_results(results)
 
 
-def search_news(keywords: str, limit: Optional[int] = None, index_name: str = terror_events) -> Dict[str, Any]:
+def search_news(keywords: str, limit: Optional[int] = None, index_name: str = terror_events_hot_alias) -> Dict[str, Any]:
     query = create_base_query(keywords, limit)
     now = datetime.now(UTC)
     last_24_hours = now - timedelta(days=1)
@@ -85,3 +96,76 @@ def search_combined(
 
     results = search_by_query(index_name, query)
     return format_results(results)
+
+
+def create_geo_query(
+        keywords: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        top_left: Optional[Tuple[float, float]] = None,
+        bottom_right: Optional[Tuple[float, float]] = None,
+        center: Optional[Tuple[float, float]] = None,
+        distance: Optional[str] = None,
+        limit: Optional[int] = None
+) -> Dict[str, Any]:
+    query = create_filtered_query(keywords, start_date, end_date, limit)
+
+    if top_left and bottom_right:
+        add_bounding_box_filter(query, top_left, bottom_right)
+    if center and distance:
+        add_radius_filter(query, center, distance)
+
+    return query
+
+
+def search_geo(limit: Optional[int] = None, index_name: str = terror_events, **filters) -> Dict[str, Any]:
+    query = create_geo_query(limit=limit, **filters)
+    results = search_by_query(index_name, query)
+    return format_results(results)
+
+
+def format_grid_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    cells = []
+    for bucket in results["aggregations"]["grid"]["buckets"]:
+        zoom, x, y = (int(part) for part in bucket["key"].split("/"))
+        centroid = bucket["centroid"].get("location") or {}
+        cells.append({
+            "cell": bucket["key"],
+            "zoom": zoom,
+            "x": x,
+            "y": y,
+            "count": bucket["doc_count"],
+            "latitude": centroid.get("lat"),
+            "longitude": centroid.get("lon")
+        })
+
+    return {
+        "total": results["hits"]["total"]["value"],
+        "cells": cells
+    }
+
+
+def get_geo_grid(zoom: int, index_name: str = terror_events, **filters) -> Dict[str, Any]:
+    query = create_geo_query(**filters)
+    add_geotile_grid_aggregation(query, zoom)
+    results = search_by_query(index_name, query)
+    return format_grid_results(results)
+
+
+def suggest(
+        prefix: str,
+        field: str = "groups",
+        limit: int = 10,
+        index_name: str = terror_events_suggest_indices
+) -> Dict[str, Any]:
+    cache_key = (field, prefix.lower(), limit)
+    suggestions = suggestions_cache.get(cache_key)
+
+    if suggestions is None:
+        query = create_suggest_query(prefix, field, limit)
+        results = search_by_query(index_name, query)
+        typeahead = results.get("suggest", {}).get("typeahead", [{}])
+        suggestions = [option["text"] for option in typeahead[0].get("options", [])]
+        suggestions_cache.set(cache_key, suggestions)
+
+    return {"field": field, "prefix": prefix, "suggestions": suggestions}
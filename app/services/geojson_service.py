@@ -0,0 +1,158 @@
+import json
+import os
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.services.graph_service import get_regions_high_group_activity_data, get_attack_strategies_data, \
+    get_shared_targets_data
+from app.services.map_service import get_region_coordinates
+from app.services.terror_events_service import process_casualties_by_region, process_attack_change_by_region, \
+    process_terror_heatmap_data
+
+coordinate_precision = int(os.environ.get('GEOJSON_COORDINATE_PRECISION', 4))
+
+MAX_LISTED_GROUPS = 5
+
+
+def create_feature(latitude: Any, longitude: Any, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if latitude == 0 and longitude == 0:
+        return None
+
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(longitude, coordinate_precision), round(latitude, coordinate_precision)]
+        },
+        'properties': properties
+    }
+
+
+def iter_feature_collection(features: Iterable[Optional[Dict[str, Any]]]) -> Iterator[str]:
+    yield '{"type":"FeatureCollection","features":['
+    separator = ''
+    for feature in features:
+        if feature is None:
+            continue
+        yield separator + json.dumps(feature, separators=(',', ':'), default=str)
+        separator = ','
+    yield ']}'
+
+
+# 2
+def casualties_features(top_n: Optional[int] = None, **_) -> Iterator[Optional[Dict[str, Any]]]:
+    for item in process_casualties_by_region(top_n=top_n):
+        yield create_feature(item['latitude'], item['longitude'], {
+            'label': item['region'],
+            'value': item['total_events'],
+            'avg_killed': round(item['avg_killed'] or 0, 2),
+            'avg_wounded': round(item['avg_wounded'] or 0, 2)
+        })
+
+
+# 6
+def attack_change_features(top_n: Optional[int] = None, **_) -> Iterator[Optional[Dict[str, Any]]]:
+    for item in process_attack_change_by_region(top_n=top_n):
+        changes = item['yearly_changes']
+        coordinates = get_region_coordinates(item['region'])
+        if not changes or not coordinates:
+            continue
+
+        latest = changes[-1]
+        yield create_feature(coordinates[0], coordinates[1], {
+            'label': item['region'],
+            'value': latest['percent_change'],
+            'years': f"{latest['previous_year']}-{latest['year']}",
+            'avg_change': round(sum(change['percent_change'] for change in changes) / len(changes), 2)
+        })
+
+
+# 7
+def hotspot_features(
+        time_period: str = 'year',
+        start_year: int = 1970,
+        **_
+) -> Iterator[Optional[Dict[str, Any]]]:
+    totals = defaultdict(lambda: [0, 0])
+    for item in process_terror_heatmap_data(time_period=time_period, start_year=start_year):
+        try:
+            key = (round(float(item['latitude']), coordinate_precision),
+                   round(float(item['longitude']), coordinate_precision))
+        except (TypeError, ValueError):
+            continue
+        totals[key][0] += item['events_count'] or 0
+        totals[key][1] += item['total_casualties'] or 0
+
+    for (latitude, longitude), (events_count, casualties) in totals.items():
+        yield create_feature(latitude, longitude, {'value': events_count, 'casualties': casualties})
+
+
+def graph_features(
+        get_data: Callable[..., Iterable[Dict[str, Any]]],
+        value_key: str,
+        describe: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> Callable[..., Iterator[Optional[Dict[str, Any]]]]:
+    def features(
+            filter_by: str = None,
+            filter_value: str = None,
+            backend: str = 'memgraph',
+            limit: Optional[int] = None,
+            **_
+    ) -> Iterator[Optional[Dict[str, Any]]]:
+        records = get_data(filter_by, filter_value, backend, limit)
+        return (
+            create_feature(record['latitude'], record['longitude'], {
+                'label': record['country'],
+                'region': record['region'],
+                'value': record[value_key],
+                **describe(record)
+            })
+            for record in records
+        )
+
+    return features
+
+
+def top_names(names: List[str]) -> List[str]:
+    return names[:MAX_LISTED_GROUPS]
+
+
+GEOJSON_LAYERS: Dict[str, Callable[..., Iterator[Optional[Dict[str, Any]]]]] = {
+    'casualties': casualties_features,
+    'attack_change': attack_change_features,
+    'hotspots': hotspot_features,
+    'high_group_activity': graph_features(
+        get_regions_high_group_activity_data, 'total_attacks',
+        lambda record: {
+            'groups_count': record['unique_groups_count'],
+            'groups': top_names([group['name'] for group in sorted(record['groups'], key=lambda g: -g['attacks'])])
+        }
+    ),
+    'attack_strategies': graph_features(
+        get_attack_strategies_data, 'unique_attack_types_count',
+        lambda record: {'attack_types': [strategy['attack_type'] for strategy in record['attack_strategies']]}
+    ),
+    'shared_targets': graph_features(
+        get_shared_targets_data, 'max_shared_groups',
+        lambda record: {
+            'groups': top_names(max(record['shared_targets'], key=lambda t: t['groups_count'])['groups'])
+            if record['shared_targets'] else []
+        }
+    )
+}
+
+
+def get_geojson_layer(layer: str, **params) -> Iterator[str]:
+    create_features = GEOJSON_LAYERS.get(layer)
+    if create_features is None:
+        raise KeyError(layer)
+
+    # Pull the first feature now so query errors surface before the response starts streaming
+    features = iter(create_features(**params))
+    first = next(features, None)
+    return iter_feature_collection(chain([first], features))
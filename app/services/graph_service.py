@@ -1,15 +1,59 @@
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Callable, Optional, Iterable
 import folium
-import branca.colormap as cm
 
 from app.repositories.graph_repository.memgraph_repository import get_regions_high_group_activity, \
     get_shared_attack_types, get_groups_shared_targets
-from app.services.map_service import create_circle_marker
+from app.config.local_files_config.local_files import EVENTS_GRAPH_NETWORKX, EVENTS_GRAPH_NETWORKX_LOG
+from app.repositories.graph_repository.networkx_queries_repository import get_local_graph, \
+    get_regions_high_group_activity_local, get_shared_attack_types_local, get_groups_shared_targets_local, \
+    get_file_version, get_file_size
+from app.repositories.graph_repository.group_coactivity_repository import get_coactivity_projection, \
+    get_regions_high_group_activity_projection, get_shared_attack_types_projection, \
+    get_groups_shared_targets_projection
+from app.services.map_cache_service import cached_map, degrade_with
+from app.services.map_service import prepare_markers, add_circle_markers, add_clustered_markers
+from app.services.popup_service import create_popup_factory, add_popup_loader
+from app.services.terror_events_service import get_events_data_version
+
+GRAPH_BACKENDS = ('memgraph', 'local', 'projection')
+
+
+def get_graph_data_version() -> str:
+    # Every backend is fed from the same events, the change log follows the local graph between snapshots
+    snapshot = get_file_version(EVENTS_GRAPH_NETWORKX)
+    return f"{snapshot}-{get_file_size(EVENTS_GRAPH_NETWORKX_LOG)}-{get_events_data_version()}"
+
+
+def run_graph_query(
+        backend: str,
+        memgraph_query: Callable[..., Iterable[Dict[str, Any]]],
+        local_query: Callable[..., List[Dict[str, Any]]],
+        projection_query: Callable[..., List[Dict[str, Any]]],
+        filter_by: str = None,
+        filter_value: str = None,
+        limit: Optional[int] = None
+) -> Iterable[Dict[str, Any]]:
+    if backend == 'memgraph':
+        return memgraph_query(filter_by, filter_value, limit)
+    if backend == 'local':
+        return local_query(get_local_graph(), filter_by, filter_value, limit)
+    if backend == 'projection':
+        return projection_query(get_coactivity_projection(), filter_by, filter_value, limit)
+    raise ValueError(f"Invalid backend. Must be one of: {', '.join(GRAPH_BACKENDS)}")
 
 
 # 16
-def get_regions_high_group_activity_data(filter_by: str = None, filter_value: str = None) -> List:
-    return get_regions_high_group_activity(filter_by, filter_value)
+def get_regions_high_group_activity_data(
+        filter_by: str = None,
+        filter_value: str = None,
+        backend: str = 'memgraph',
+        limit: Optional[int] = None
+) -> Iterable[Dict[str, Any]]:
+    return run_graph_query(
+        backend, get_regions_high_group_activity, get_regions_high_group_activity_local,
+        get_regions_high_group_activity_projection, filter_by, filter_value, limit
+    )
 
 
 def create_high_group_activity_map_old(data: List) -> str:
@@ -42,153 +86,113 @@ def create_high_group_activity_map_old(data: List) -> str:
 
 
 # 14
-def get_attack_strategies_data(filter_by: str = None, filter_value: str = None) -> list:
-    return get_shared_attack_types(filter_by, filter_value)
+def get_attack_strategies_data(
+        filter_by: str = None,
+        filter_value: str = None,
+        backend: str = 'memgraph',
+        limit: Optional[int] = None
+) -> Iterable[Dict[str, Any]]:
+    return run_graph_query(
+        backend, get_shared_attack_types, get_shared_attack_types_local, get_shared_attack_types_projection,
+        filter_by, filter_value, limit
+    )
 
 
-def create_attack_strategies_map(data: List[Dict[str, Any]]) -> str:
+@cached_map('attack_strategies', degrade=degrade_with(clustered=True, popups='none'))
+def create_attack_strategies_map(
+        data: Iterable[Dict[str, Any]],
+        clustered: bool = False,
+        popups: str = 'lazy'
+) -> str:
     m = folium.Map(location=[31.5, 34.8], zoom_start=4)
 
-    values = [item['unique_attack_types_count'] for item in data
-              if item.get('latitude') and item.get('longitude')]
-
-    if not values:
-        return m._repr_html_()
-
-    colormap = cm.LinearColormap(
-        colors=['yellow', 'orange', 'red'],
-        vmin=min(values),
-        vmax=max(values),
+    markers = prepare_markers(
+        data, 'unique_attack_types_count', create_popup_factory('attack_strategies', popups),
         caption='Number of Attack Types'
     )
-    colormap.add_to(m)
-
-    for location in data:
-        if not location['latitude'] or not location['longitude']:
-            continue
-
-        popup_html = f"""
-            <div style='font-family: Arial; min-width: 200px;'>
-                <h4 style='margin: 0 0 10px 0;'>{location['country']}</h4>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    <tr>
-                        <td><b>Region:</b></td>
-                        <td style='text-align: right;'>{location['region']}</td>
-                    </tr>
-                    <tr>
-                        <td><b>Attack Types:</b></td>
-                        <td style='text-align: right;'>{location['unique_attack_types_count']}</td>
-                    </tr>
-                </table>
-                <hr style='margin: 10px 0;'>
-                <p style='margin: 5px 0;'><b>Attack Strategies:</b></p>
-                <table style='width: 100%; border-spacing: 5px;'>
-        """
-
-        for strategy in location['attack_strategies']:
-            popup_html += f"""
-                <tr>
-                    <td colspan='2'><b>{strategy['attack_type']}</b></td>
-                </tr>
-                <tr>
-                    <td>Groups ({strategy['groups_count']}):</td>
-                    <td style='text-align: right;'>{', '.join(strategy['groups'])}</td>
-                </tr>
-            """
+    add_popup_loader(m, popups)
+    if markers is None:
+        return m._repr_html_()
 
-        popup_html += """
-                </table>
-            </div>
-        """
-
-        marker = create_circle_marker(
-            location=location,
-            colormap=colormap,
-            value_key='unique_attack_types_count',
-            min_value=min(values),
-            max_value=max(values),
-            popup_content=popup_html
-        )
-        marker.add_to(m)
+    markers.colormap.add_to(m)
+
+    if clustered:
+        add_clustered_markers(m, markers)
+    else:
+        add_circle_markers(m, markers)
 
     return m._repr_html_()
 
 
 # 11
-def get_shared_targets_data(filter_by: str = None, filter_value: str = None) -> list:
-    return get_groups_shared_targets(filter_by, filter_value)
+def get_shared_targets_data(
+        filter_by: str = None,
+        filter_value: str = None,
+        backend: str = 'memgraph',
+        limit: Optional[int] = None
+) -> Iterable[Dict[str, Any]]:
+    return run_graph_query(
+        backend, get_groups_shared_targets, get_groups_shared_targets_local, get_groups_shared_targets_projection,
+        filter_by, filter_value, limit
+    )
 
 
-def create_shared_targets_map(data: List[Dict[str, Any]]) -> str:
+@cached_map('shared_targets', degrade=degrade_with(popups='none'))
+def create_shared_targets_map(data: Iterable[Dict[str, Any]], popups: str = 'lazy') -> str:
     m = folium.Map(location=[31.5, 34.8], zoom_start=4)
 
-    values = [item['max_shared_groups'] for item in data
-              if item.get('latitude') and item.get('longitude')]
-
-    if not values:
-        return m._repr_html_()
-
-    colormap = cm.LinearColormap(
-        colors=['yellow', 'orange', 'red'],
-        vmin=min(values),
-        vmax=max(values),
+    markers = prepare_markers(
+        data, 'max_shared_groups', create_popup_factory('shared_targets', popups),
         caption='Number of Groups Sharing Targets'
     )
-    colormap.add_to(m)
-
-    for location in data:
-        if not location['latitude'] or not location['longitude']:
-            continue
-
-        popup_html = f"""
-            <div style='font-family: Arial; min-width: 200px;'>
-                <h4 style='margin: 0 0 10px 0;'>{location['country']}</h4>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    <tr>
-                        <td><b>Region:</b></td>
-                        <td style='text-align: right;'>{location['region']}</td>
-                    </tr>
-                    <tr>
-                        <td><b>Max Groups Sharing Targets:</b></td>
-                        <td style='text-align: right;'>{location['max_shared_groups']}</td>
-                    </tr>
-                </table>
-                <hr style='margin: 10px 0;'>
-                <p style='margin: 5px 0;'><b>Target Groups:</b></p>
-                <table style='width: 100%; border-spacing: 5px;'>
-        """
-
-        for target in location['shared_targets']:
-            attack_types = [item for sublist in target['target_types'] for item in sublist]
-            attack_types = list(set(attack_types))
-
-            popup_html += f"""
-                <tr>
-                    <td colspan='2'><b>Attack Types:</b></td>
-                </tr>
-                <tr>
-                    <td colspan='2'>{', '.join(attack_types)}</td>
-                </tr>
-                <tr>
-                    <td>Groups ({target['groups_count']}):</td>
-                    <td style='text-align: right;'>{', '.join(target['groups'])}</td>
-                </tr>
-                <tr><td colspan='2'><hr></td></tr>
-            """
+    add_popup_loader(m, popups)
+    if markers is None:
+        return m._repr_html_()
 
-        popup_html += """
-                </table>
-            </div>
-        """
-
-        folium.CircleMarker(
-            location=[location['latitude'], location['longitude']],
-            radius=10,
-            popup=folium.Popup(popup_html, max_width=300),
-            color=colormap(location['max_shared_groups']),
-            fill=True,
-            fill_color=colormap(location['max_shared_groups']),
-            fill_opacity=0.7
-        ).add_to(m)
+    markers.colormap.add_to(m)
+    add_circle_markers(m, markers, radius=10, popup_max_width=300)
 
     return m._repr_html_()
+
+
+def get_group_partners(group: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+    projection = get_coactivity_projection()
+    group_key = projection.resolve_group(group)
+    if group_key is None:
+        return None
+    return {**projection.describe_group(group_key), 'partners': projection.get_partners(group_key, limit)}
+
+
+def get_top_group_pairs(limit: int = 20) -> List[Dict[str, Any]]:
+    return get_coactivity_projection().get_top_pairs(limit)
+
+
+def get_group_communities(limit: int = 20) -> List[Dict[str, Any]]:
+    return get_coactivity_projection().get_communities(limit)
+
+
+def benchmark_graph_backends(filter_by: str = None, filter_value: str = None, repeat: int = 3) -> Dict[str, Dict]:
+    analytics = {
+        'high_group_activity': get_regions_high_group_activity_data,
+        'attack_strategies': get_attack_strategies_data,
+        'shared_targets': get_shared_targets_data
+    }
+
+    results = {}
+    for name, get_data in analytics.items():
+        results[name] = {}
+        for backend in GRAPH_BACKENDS:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                records = list(get_data(filter_by, filter_value, backend=backend))
+                timings.append(time.perf_counter() - started)
+            results[name][backend] = {'best_seconds': min(timings), 'records': len(records)}
+
+    return results
+
+
+if __name__ == '__main__':
+    for analytic, backends in benchmark_graph_backends().items():
+        for backend, stats in backends.items():
+            print(f"{analytic} [{backend}]: {stats['best_seconds']:.3f}s, {stats['records']} records")
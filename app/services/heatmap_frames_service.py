@@ -0,0 +1,91 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.repositories.mongo_repositories.terror_events_repository import get_terror_heatmap_frames
+from app.services.map_cache_service import get_content_hash
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+frames_coordinate_precision = int(os.environ.get('HEATMAP_FRAMES_PRECISION', 2))
+frames_cache_size = int(os.environ.get('HEATMAP_FRAMES_CACHE_SIZE', 32))
+frames_cache_ttl_seconds = int(os.environ.get('HEATMAP_FRAMES_CACHE_TTL_SECONDS', 3600))
+
+FRAME_WEIGHTS = ('events', 'casualties')
+WEIGHT_POSITIONS = {'events': 2, 'casualties': 3}
+
+
+class HeatmapFrames:
+    def __init__(self, index: List[str], frames: Dict[str, str], max_weight: float):
+        self.index = index
+        self.frames = frames
+        self.max_weight = max_weight
+        self.etags = {frame: get_content_hash(points.encode('utf-8')) for frame, points in frames.items()}
+
+    def get_frame(self, frame: str) -> Optional[str]:
+        return self.frames.get(frame)
+
+    def get_all_points(self) -> List[List[List[float]]]:
+        return [json.loads(self.frames[frame]) for frame in self.index]
+
+
+heatmap_frames_cache = LRUCache(max_size=frames_cache_size, ttl_seconds=frames_cache_ttl_seconds)
+
+
+def get_frame_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+def build_heatmap_frames(raw_frames: List[Dict], weight: str) -> HeatmapFrames:
+    position = WEIGHT_POSITIONS[weight]
+    max_weight = max(
+        (point[position] or 0 for frame in raw_frames for point in frame['points']),
+        default=0
+    ) or 1
+
+    index, frames = [], {}
+    for frame in raw_frames:
+        # Weights are normalized once over the whole range, so intensities stay comparable between frames
+        points = [
+            [point[0], point[1], round((point[position] or 0) / max_weight, 4)]
+            for point in frame['points']
+            if point[0] is not None and point[1] is not None
+            and not (point[0] == 0 and point[1] == 0)
+            and point[position]
+        ]
+        key = get_frame_key(frame['year'], frame['month'])
+        index.append(key)
+        frames[key] = json.dumps(points, separators=(',', ':'))
+
+    return HeatmapFrames(index, frames, max_weight)
+
+
+def get_heatmap_frames(start_year: int = 1970, end_year: int = 2100, weight: str = 'events') -> HeatmapFrames:
+    if weight not in FRAME_WEIGHTS:
+        raise ValueError(f"Invalid weight. Must be one of: {', '.join(FRAME_WEIGHTS)}")
+    if end_year <= start_year:
+        raise ValueError("end_year must be greater than start_year")
+
+    cache_key: Tuple = (start_year, end_year, frames_coordinate_precision)
+    frames_by_weight = heatmap_frames_cache.get(cache_key)
+    if frames_by_weight is None:
+        # One aggregation serves every month and both weightings of the requested range
+        raw_frames = get_terror_heatmap_frames(
+            start_year=start_year,
+            end_year=end_year,
+            precision=frames_coordinate_precision
+        )
+        frames_by_weight = {
+            frame_weight: build_heatmap_frames(raw_frames, frame_weight)
+            for frame_weight in FRAME_WEIGHTS
+        }
+        heatmap_frames_cache.set(cache_key, frames_by_weight)
+
+    return frames_by_weight[weight]
+
+
+def clear_heatmap_frames_cache() -> None:
+    heatmap_frames_cache.clear()
@@ -0,0 +1,269 @@
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.config.local_files_config.local_files import IMAGE_TILE_CACHE
+from app.repositories.mongo_repositories.terror_events_repository import get_terror_events_version
+from app.services.map_cache_service import get_content_hash
+from app.services.map_service import to_float_array, get_valid_coordinates_mask
+from app.services.terror_events_service import process_terror_heatmap_data, process_casualties_by_region
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+image_cache_dir = Path(os.environ.get('IMAGE_CACHE_DIR', IMAGE_TILE_CACHE))
+image_tile_size = int(os.environ.get('IMAGE_TILE_SIZE', 256))
+image_version_ttl_seconds = int(os.environ.get('IMAGE_VERSION_TTL_SECONDS', 30))
+
+EARTH_RADIUS = 6378137.0
+MAX_LATITUDE = 85.05112878
+WORLD_EXTENT = math.pi * EARTH_RADIUS
+MAX_ZOOM = 18
+MAX_IMAGE_SIZE = 4096
+HEATMAP_CELL_PIXELS = 4
+
+data_version_cache = LRUCache(max_size=1, ttl_seconds=image_version_ttl_seconds)
+image_data_cache = LRUCache(max_size=32)
+
+
+_cached_version: Dict[str, Optional[str]] = {'version': None}
+
+
+def get_data_version() -> str:
+    version = data_version_cache.get('version')
+    if version is None:
+        version = get_terror_events_version()
+        data_version_cache.set('version', version)
+        if version != _cached_version['version']:
+            prune_image_cache(version)
+            _cached_version['version'] = version
+    return version
+
+
+def get_version_dir_name(version: str) -> str:
+    return get_content_hash(version.encode('utf-8'))
+
+
+def prune_image_cache(version: str) -> None:
+    # Images are keyed on the data version, so those of older versions are never served again
+    current = get_version_dir_name(version)
+    if not image_cache_dir.exists():
+        return
+    for layer_dir in image_cache_dir.iterdir():
+        if not layer_dir.is_dir():
+            continue
+        for version_dir in layer_dir.iterdir():
+            if version_dir.is_dir() and version_dir.name != current:
+                shutil.rmtree(version_dir, ignore_errors=True)
+
+
+def to_mercator(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = EARTH_RADIUS * np.radians(longitudes)
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + latitudes / 2))
+    return x, y
+
+
+def get_tile_extent(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    if not 0 <= z <= MAX_ZOOM:
+        raise ValueError(f"z must be between 0 and {MAX_ZOOM}")
+    tiles = 2 ** z
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise ValueError(f"x and y must be between 0 and {tiles - 1} at zoom {z}")
+
+    span = 2 * WORLD_EXTENT / tiles
+    min_x = -WORLD_EXTENT + x * span
+    max_y = WORLD_EXTENT - y * span
+    return min_x, min_x + span, max_y - span, max_y
+
+
+# 7
+def load_heatmap_points(time_period: str = 'year', start_year: int = 1970, **_) -> Dict[str, np.ndarray]:
+    data = process_terror_heatmap_data(time_period=time_period, start_year=start_year)
+    latitudes = to_float_array([point['latitude'] for point in data])
+    longitudes = to_float_array([point['longitude'] for point in data])
+    weights = to_float_array([point['events_count'] for point in data])
+
+    mask = get_valid_coordinates_mask(latitudes, longitudes) & np.isfinite(weights)
+    x, y = to_mercator(latitudes[mask], longitudes[mask])
+    return {'x': x, 'y': y, 'weights': weights[mask]}
+
+
+def get_max_density(points: Dict[str, np.ndarray], cell_size: float) -> float:
+    # Tiles share one color scale per zoom level, otherwise every tile would be stretched to its own maximum
+    max_densities = points.setdefault('max_densities', {})
+    key = round(cell_size, 6)
+    if key not in max_densities:
+        cells_x = np.floor((points['x'] + WORLD_EXTENT) / cell_size).astype(np.int64)
+        cells_y = np.floor((points['y'] + WORLD_EXTENT) / cell_size).astype(np.int64)
+        _, cells = np.unique(cells_x * (2 ** 31) + cells_y, return_inverse=True)
+        max_densities[key] = float(np.bincount(cells, weights=points['weights']).max()) if len(cells) else 0.0
+    return max_densities[key]
+
+
+def draw_heatmap(ax, points: Dict[str, np.ndarray], extent: Tuple[float, float, float, float], width: int, height: int):
+    min_x, max_x, min_y, max_y = extent
+    density, _, _ = np.histogram2d(
+        points['y'], points['x'],
+        bins=(max(height // HEATMAP_CELL_PIXELS, 1), max(width // HEATMAP_CELL_PIXELS, 1)),
+        range=((min_y, max_y), (min_x, max_x)),
+        weights=points['weights']
+    )
+    if not density.any():
+        return
+
+    max_density = get_max_density(points, (max_x - min_x) / max(width // HEATMAP_CELL_PIXELS, 1))
+    density = np.ma.masked_equal(np.log1p(density), 0)
+    ax.imshow(
+        density,
+        extent=extent,
+        origin='lower',
+        cmap='YlOrRd',
+        vmin=0,
+        vmax=np.log1p(max(max_density, density.max())),
+        alpha=0.8,
+        interpolation='bilinear',
+        aspect='auto'
+    )
+
+
+# 2
+def load_casualty_regions(top_n: Optional[int] = None, **_) -> Dict[str, np.ndarray]:
+    data = process_casualties_by_region(top_n=top_n)
+    latitudes = to_float_array([region['latitude'] for region in data])
+    longitudes = to_float_array([region['longitude'] for region in data])
+    events = to_float_array([region['total_events'] for region in data])
+    killed = to_float_array([region['avg_killed'] for region in data])
+
+    mask = get_valid_coordinates_mask(latitudes, longitudes) & np.isfinite(events)
+    x, y = to_mercator(latitudes[mask], longitudes[mask])
+    return {'x': x, 'y': y, 'events': events[mask], 'killed': np.nan_to_num(killed[mask])}
+
+
+def draw_casualties(ax, regions: Dict[str, np.ndarray], extent: Tuple[float, float, float, float], width: int, height: int):
+    if not len(regions['events']):
+        return
+
+    events = regions['events']
+    sizes = 40 + 760 * events / events.max() if events.max() > 0 else np.full(len(events), 400)
+    ax.scatter(
+        regions['x'], regions['y'],
+        s=sizes * min(width, height) / image_tile_size,
+        c=regions['killed'],
+        cmap='Reds',
+        alpha=0.75,
+        edgecolors='black',
+        linewidths=0.5
+    )
+
+
+IMAGE_LAYERS: Dict[str, Dict[str, Any]] = {
+    'heatmap': {
+        'params': ('time_period', 'start_year'),
+        'load': load_heatmap_points,
+        'draw': draw_heatmap
+    },
+    'casualties': {
+        'params': ('top_n',),
+        'load': load_casualty_regions,
+        'draw': draw_casualties
+    }
+}
+
+
+def get_layer_data(layer: str, version: str, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    # Every tile of a layer is drawn from the same arrays, so they are loaded once per data version
+    key = (layer, version, json.dumps(params, sort_keys=True))
+    data = image_data_cache.get(key)
+    if data is None:
+        data = IMAGE_LAYERS[layer]['load'](**params)
+        image_data_cache.set(key, data)
+    return data
+
+
+def render_png(
+        draw: Callable,
+        data: Dict[str, np.ndarray],
+        extent: Tuple[float, float, float, float],
+        width: int,
+        height: int
+) -> bytes:
+    figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+
+    draw(ax, data, extent, width, height)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', transparent=True)
+    return buffer.getvalue()
+
+
+def get_image_path(layer: str, version: str, params: Dict[str, Any], name: str) -> Path:
+    params_hash = get_content_hash(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return image_cache_dir / layer / get_version_dir_name(version) / params_hash / f"{name}.png"
+
+
+def store_image(path: Path, image: bytes) -> None:
+    temp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Every writer gets its own temporary file, concurrent renders of one tile must not replace each other's
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+            f.write(image)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Error writing cached image {path}: {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def get_image(
+        layer: str,
+        params: Dict[str, Any],
+        tile: Optional[Tuple[int, int, int]] = None,
+        width: int = 1024,
+        height: int = 1024
+) -> Tuple[bytes, str]:
+    if layer not in IMAGE_LAYERS:
+        raise KeyError(layer)
+    if not (0 < width <= MAX_IMAGE_SIZE and 0 < height <= MAX_IMAGE_SIZE):
+        raise ValueError(f"width and height must be between 1 and {MAX_IMAGE_SIZE}")
+
+    if tile is not None:
+        extent = get_tile_extent(*tile)
+        width = height = image_tile_size
+        name = '{}/{}/{}'.format(*tile)
+    else:
+        extent = (-WORLD_EXTENT, WORLD_EXTENT, -WORLD_EXTENT, WORLD_EXTENT)
+        name = f"world-{width}x{height}"
+
+    params = {key: params.get(key) for key in IMAGE_LAYERS[layer]['params']}
+    version = get_data_version()
+    path = get_image_path(layer, version, params, name)
+    etag = get_content_hash(str(path).encode('utf-8'))
+
+    if path.exists():
+        try:
+            return path.read_bytes(), etag
+        except OSError as e:
+            print(f"Error reading cached image {path}: {e}")
+
+    data = get_layer_data(layer, version, params)
+    image = render_png(IMAGE_LAYERS[layer]['draw'], data, extent, width, height)
+    store_image(path, image)
+    return image, etag
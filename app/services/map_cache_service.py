@@ -0,0 +1,254 @@
+import hashlib
+import heapq
+import inspect
+import json
+import os
+import pickle
+from concurrent.futures import Future, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+from app.services.popup_service import register_popups
+from app.services.render_executor_service import submit_render, build_map_with_popups, reset_render_executor, \
+    map_render_timeout_seconds
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+map_cache_max_entries = int(os.environ.get('MAP_CACHE_MAX_ENTRIES', 256))
+map_cache_max_bytes = int(os.environ.get('MAP_CACHE_MAX_MB', 256)) * 2 ** 20
+map_cache_dir = os.environ.get('MAP_CACHE_DIR')
+map_degraded_max_points = int(os.environ.get('MAP_DEGRADED_MAX_POINTS', 5000))
+
+
+class RenderedMap(str):
+    def __new__(
+            cls,
+            html: str,
+            etag: str,
+            popups: Optional[Dict[Tuple[str, str], Dict]] = None,
+            degraded: bool = False
+    ):
+        rendered = super().__new__(cls, html)
+        rendered.etag = etag
+        rendered.popups = popups or {}
+        rendered.degraded = degraded
+        return rendered
+
+
+class MapQuery:
+    # Map data named by the query that loads it, so a cached map is found without loading or hashing the records
+    def __init__(
+            self,
+            load: Callable[..., Iterable],
+            params: Dict[str, Any],
+            version: Optional[Callable[[], Any]] = None
+    ):
+        self.load = load
+        self.params = params
+        self.version = version
+
+    def get_key_payload(self) -> Dict[str, Any]:
+        return {
+            'query': f"{self.load.__module__}.{self.load.__name__}",
+            'params': self.params,
+            'version': self.version() if self.version else None
+        }
+
+    def fetch(self) -> List:
+        return list(self.load(**self.params))
+
+
+rendered_maps = LRUCache(max_size=map_cache_max_entries, max_bytes=map_cache_max_bytes)
+
+_pending_maps: Dict[str, Future] = {}
+_pending_maps_lock = Lock()
+
+
+def get_content_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def get_map_cache_key(map_type: str, data: Any, options: dict) -> str:
+    payload = json.dumps([map_type, data, options], sort_keys=True, default=str)
+    return f"{map_type}-{get_content_hash(payload.encode('utf-8'))}"
+
+
+def get_map_cache_path(key: str) -> Optional[Path]:
+    return Path(map_cache_dir) / f"{key}.html" if map_cache_dir else None
+
+
+def get_popups_cache_path(key: str) -> Optional[Path]:
+    return Path(map_cache_dir) / f"{key}.popups.pickle" if map_cache_dir else None
+
+
+def render_map(html: str, popups: Optional[Dict[Tuple[str, str], Dict]] = None) -> RenderedMap:
+    return RenderedMap(html, get_content_hash(html.encode('utf-8')), popups)
+
+
+def load_cached_map(key: str) -> Optional[RenderedMap]:
+    rendered = rendered_maps.get(key)
+    if rendered is not None:
+        # Lazy popup ids in the page are only useful while their records are registered
+        register_popups(rendered.popups)
+        return rendered
+
+    path = get_map_cache_path(key)
+    if path is None or not path.exists():
+        return None
+
+    try:
+        popups = {}
+        popups_path = get_popups_cache_path(key)
+        if popups_path.exists():
+            with open(popups_path, 'rb') as f:
+                popups = pickle.load(f)
+        rendered = render_map(path.read_text(encoding='utf-8'), popups)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f"Error reading cached map {path}: {e}")
+        return None
+
+    register_popups(rendered.popups)
+    rendered_maps.set(key, rendered)
+    return rendered
+
+
+def store_cached_map(key: str, rendered: RenderedMap) -> None:
+    rendered_maps.set(key, rendered)
+
+    path = get_map_cache_path(key)
+    if path is None:
+        return
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix('.tmp')
+        if rendered.popups:
+            popups_path = get_popups_cache_path(key)
+            temp_popups_path = popups_path.with_suffix('.tmp')
+            with open(temp_popups_path, 'wb') as f:
+                pickle.dump(rendered.popups, f)
+            os.replace(temp_popups_path, popups_path)
+
+        temp_path.write_text(rendered, encoding='utf-8')
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Error writing cached map {path}: {e}")
+
+
+def store_rendered_map(key: str, html: str, popups: Dict[Tuple[str, str], Dict]) -> RenderedMap:
+    rendered = render_map(html, popups)
+    register_popups(popups)
+    store_cached_map(key, rendered)
+    return rendered
+
+
+def degrade_with(max_points: Optional[int] = None, weight_key: Optional[str] = None, **options) -> Callable:
+    def degrade(data: List, kwargs: Dict[str, Any]) -> Tuple[List, Dict[str, Any]]:
+        if max_points is not None and len(data) > max_points:
+            data = heapq.nlargest(max_points, data, key=lambda record: record.get(weight_key) or 0) \
+                if weight_key else data[:max_points]
+        return data, {**kwargs, **options}
+
+    return degrade
+
+
+def render_degraded_map(key: str, build_map: Callable[..., str], data: List, kwargs: Dict, degrade: Callable):
+    # Degrading is deterministic, so the degraded variant is keyed on the full map it stands in for
+    key = f"{key}-degraded"
+    rendered = load_cached_map(key)
+    if rendered is None:
+        data, kwargs = degrade(data, kwargs)
+        rendered = store_rendered_map(key, *build_map_with_popups(build_map, data, kwargs))
+    return RenderedMap(rendered, rendered.etag, rendered.popups, degraded=True)
+
+
+def render_cached_map(
+        key: str,
+        build_map: Callable[..., str],
+        data: List,
+        kwargs: Dict[str, Any],
+        degrade: Optional[Callable]
+) -> RenderedMap:
+    try:
+        future = submit_render(
+            key, build_map, data, kwargs,
+            on_complete=lambda html, popups: store_rendered_map(key, html, popups)
+        )
+        if future is not None:
+            # Without a degraded variant there is nothing cheaper to return, so the full render is awaited
+            future.result(timeout=map_render_timeout_seconds if degrade and map_render_timeout_seconds > 0 else None)
+            return load_cached_map(key) or store_rendered_map(key, *future.result())
+    except TimeoutError:
+        # The full render keeps running in the pool and fills the cache for the next request
+        print(f"Rendering {key} exceeded {map_render_timeout_seconds}s, serving a degraded map")
+        return render_degraded_map(key, build_map, data, kwargs, degrade)
+    except BrokenProcessPool as e:
+        print(f"Map render pool failed, rendering {key} in process: {e}")
+        reset_render_executor()
+
+    return store_rendered_map(key, *build_map_with_popups(build_map, data, kwargs))
+
+
+def render_once(key: str, render: Callable[[], RenderedMap]) -> RenderedMap:
+    # Concurrent requests for the same map wait on the first one instead of loading and rendering it again
+    with _pending_maps_lock:
+        pending = _pending_maps.get(key)
+        if pending is not None:
+            leader = False
+        else:
+            pending = _pending_maps[key] = Future()
+            leader = True
+
+    if leader:
+        try:
+            pending.set_result(render())
+        except BaseException as e:
+            pending.set_exception(e)
+        finally:
+            with _pending_maps_lock:
+                _pending_maps.pop(key, None)
+
+    return pending.result()
+
+
+def cached_map(map_type: str, degrade: Optional[Callable] = None) -> Callable:
+    def decorator(build_map: Callable[..., str]) -> Callable[..., RenderedMap]:
+        signature = inspect.signature(build_map)
+        data_name = next(iter(signature.parameters))
+
+        @wraps(build_map)
+        def wrapper(data: Union[MapQuery, Iterable], *args, **kwargs) -> RenderedMap:
+            # Options are passed to the builder by name, so degraded variants can override any of them
+            kwargs = signature.bind(data, *args, **kwargs).arguments
+            kwargs.pop(data_name)
+
+            if isinstance(data, MapQuery):
+                key = get_map_cache_key(map_type, data.get_key_payload(), {'args': (), 'kwargs': kwargs})
+                load = data.fetch
+            else:
+                records = data if isinstance(data, list) else list(data)
+                key = get_map_cache_key(map_type, records, {'args': (), 'kwargs': kwargs})
+                load = lambda: records
+
+            rendered = load_cached_map(key)
+            if rendered is not None:
+                return rendered
+
+            # The cache is checked again once this request leads, another one may have just finished the map
+            return render_once(
+                key, lambda: load_cached_map(key) or render_cached_map(key, build_map, load(), kwargs, degrade)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def clear_map_cache() -> None:
+    rendered_maps.clear()
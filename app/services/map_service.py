@@ -1,25 +1,33 @@
 import folium
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Callable, Iterator
 import branca.colormap as cm
+import numpy as np
+from branca.element import MacroElement
 from folium import plugins
+from folium.template import Template
 
+from app.services.centroid_service import get_centroid
+from app.services.map_cache_service import cached_map, degrade_with, map_degraded_max_points
+from app.services.popup_service import create_popup_factory, add_popup_loader
 
-def get_region_coordinates(region: str) -> Optional[Tuple[float, float]]:
-    coordinates = {
-        'South Asia': (34.516895, 69.147011),
-        'Middle East & North Africa': (41.106178, 28.689863),
-        'Sub-Saharan Africa': (9.145, 40.489673),
-        'Eastern Europe': (52.50153, 13.401851),
-        'Southeast Asia': (14.67428, 121.057495),
-        'Western Europe': (48.8566, 2.3522),
-        'North America': (39.8283, -98.5795),
-        'Central America & Caribbean': (23.6345, -102.5528),
-        'South America': (-15.7801, -47.9292),
-        'Australasia & Oceania': (-35.2809, 149.1300),
-        'Central Asia': (41.2995, 69.2401)
-    }
 
-    return coordinates.get(region)
+FALLBACK_REGION_COORDINATES = {
+    'South Asia': (34.516895, 69.147011),
+    'Middle East & North Africa': (41.106178, 28.689863),
+    'Sub-Saharan Africa': (9.145, 40.489673),
+    'Eastern Europe': (52.50153, 13.401851),
+    'Southeast Asia': (14.67428, 121.057495),
+    'Western Europe': (48.8566, 2.3522),
+    'North America': (39.8283, -98.5795),
+    'Central America & Caribbean': (23.6345, -102.5528),
+    'South America': (-15.7801, -47.9292),
+    'Australasia & Oceania': (-35.2809, 149.1300),
+    'Central Asia': (41.2995, 69.2401)
+}
+
+
+def get_region_coordinates(region: str) -> Optional[Tuple[float, float]]:
+    return get_centroid('region', region) or FALLBACK_REGION_COORDINATES.get(region)
 
 
 # 2
@@ -37,151 +45,220 @@ def create_base_map(
     )
 
 
+MARKER_COLORS = ['yellow', 'orange', 'red']
+MARKER_PALETTE_SIZE = 256
+
+
+class PreparedMarkers:
+    def __init__(
+            self,
+            records: List[Dict[str, Any]],
+            latitudes: np.ndarray,
+            longitudes: np.ndarray,
+            values: np.ndarray,
+            radii: np.ndarray,
+            color_indexes: np.ndarray,
+            palette: List[str],
+            colormap: cm.LinearColormap,
+            popups: List[Optional[str]]
+    ):
+        self.records = records
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.values = values
+        self.radii = radii
+        self.color_indexes = color_indexes
+        self.palette = palette
+        self.colormap = colormap
+        self.popups = popups
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def colors(self) -> List[str]:
+        return [self.palette[index] for index in self.color_indexes.tolist()]
+
+    def iter_rows(self) -> Iterator[Tuple[float, float, float, float, str, Optional[str]]]:
+        return zip(
+            self.latitudes.tolist(),
+            self.longitudes.tolist(),
+            self.values.tolist(),
+            self.radii.tolist(),
+            self.colors,
+            self.popups
+        )
+
+
+def to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def to_float_array(values: List[Any]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([to_float(value) for value in values], dtype=float)
+
+
+def get_valid_coordinates_mask(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    return (
+        np.isfinite(latitudes) & np.isfinite(longitudes)
+        & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180)
+        & ~((latitudes == 0) & (longitudes == 0))
+    )
+
+
+def get_value_ratios(values: np.ndarray) -> np.ndarray:
+    min_value, max_value = values.min(), values.max()
+    if max_value == min_value:
+        return np.full(len(values), 0.5)
+    return (values - min_value) / (max_value - min_value)
+
+
 def create_color_scale(
-        data: List[Dict[str, Any]],
-        value_key: str,
-        colors: List[str] = ['yellow', 'orange', 'red'],
+        values: np.ndarray,
+        colors: List[str] = MARKER_COLORS,
         caption: str = ''
 ) -> cm.LinearColormap:
 
-    valid_values = [item[value_key] for item in data
-                    if item.get('latitude') != 0 or item.get('longitude') != 0]
-
-    if not valid_values:
+    if not len(values):
         raise ValueError("No valid values found for color scale")
 
+    min_value, max_value = float(values.min()), float(values.max())
     return cm.LinearColormap(
         colors=colors,
-        vmin=min(valid_values),
-        vmax=max(valid_values),
+        vmin=min_value,
+        vmax=max_value if max_value > min_value else min_value + 1,
         caption=caption
     )
 
 
-def create_circle_marker(
-        location: Dict[str, Any],
-        colormap: cm.LinearColormap,
+def prepare_markers(
+        data: Iterable[Dict[str, Any]],
         value_key: str,
-        min_value: float,
-        max_value: float,
-        popup_content: str,
+        create_popup: Optional[Callable[[Dict[str, Any]], str]] = None,
+        caption: str = '',
+        colors: List[str] = MARKER_COLORS,
         min_radius: int = 8,
         max_radius: int = 20
-) -> folium.CircleMarker:
-
-    value = location[value_key]
-    value_ratio = (value - min_value) / (max_value - min_value)
-    radius = min_radius + (value_ratio * (max_radius - min_radius))
-
-    return folium.CircleMarker(
-        location=[location['latitude'], location['longitude']],
-        radius=radius,
-        popup=popup_content,
-        color=colormap(value),
-        fill=True,
-        fill_color=colormap(value),
-        fill_opacity=0.7
-    )
+) -> Optional[PreparedMarkers]:
+    records = data if isinstance(data, list) else list(data)
+    latitudes = to_float_array([record.get('latitude') for record in records])
+    longitudes = to_float_array([record.get('longitude') for record in records])
+    values = to_float_array([record.get(value_key) for record in records])
 
+    mask = get_valid_coordinates_mask(latitudes, longitudes) & np.isfinite(values)
+    if not mask.any():
+        return None
 
-def create_popup_content(data: Dict[str, Any], title_key: str, fields: List[Tuple[str, str, Optional[str]]]) -> str:
-
-    rows = ""
-    for label, key, format_str in fields:
-        value = data[key]
-        if format_str:
-            value = format_str.format(value)
-        rows += f"""
-            <tr>
-                <td><b>{label}:</b></td>
-                <td style='text-align: right;'>{value}</td>
-            </tr>
-        """
-
-    return f"""
-        <div style='font-family: Arial; min-width: 180px;'>
-            <h4 style='margin: 0 0 10px 0;'>{data[title_key]}</h4>
-            <table style='width: 100%; border-spacing: 5px;'>
-                {rows}
-            </table>
-        </div>
-    """
+    records = [records[index] for index in np.flatnonzero(mask).tolist()]
+    latitudes, longitudes, values = latitudes[mask], longitudes[mask], values[mask]
 
+    ratios = get_value_ratios(values)
+    radii = np.round(min_radius + ratios * (max_radius - min_radius), 1)
 
-def create_basic_casualties_map(data: List[Dict[str, Any]]) -> str:
+    # Colors are looked up in a fixed palette instead of evaluating the colormap once per marker
+    colormap = create_color_scale(values, colors, caption)
+    palette = [colormap(value) for value in np.linspace(colormap.vmin, colormap.vmax, MARKER_PALETTE_SIZE).tolist()]
+    color_indexes = np.rint(ratios * (MARKER_PALETTE_SIZE - 1)).astype(np.intp)
 
-    m = create_base_map()
+    popups = [create_popup(record) for record in records] if create_popup else [None] * len(records)
+    return PreparedMarkers(records, latitudes, longitudes, values, radii, color_indexes, palette, colormap, popups)
 
-    colormap = create_color_scale(
-        data=data,
-        value_key='total_events',
-        caption='Number of Events'
-    )
-    colormap.add_to(m)
 
-    valid_events = [loc['total_events'] for loc in data
-                    if loc['latitude'] != 0 or loc['longitude'] != 0]
-    if not valid_events:
-        return m._repr_html_()
+def add_circle_markers(
+        m: folium.Map,
+        markers: PreparedMarkers,
+        radius: Optional[float] = None,
+        popup_max_width: Optional[int] = None
+) -> None:
+    for latitude, longitude, _, marker_radius, color, popup in markers.iter_rows():
+        if popup and popup_max_width:
+            popup = folium.Popup(popup, max_width=popup_max_width)
 
-    min_events = min(valid_events)
-    max_events = max(valid_events)
+        folium.CircleMarker(
+            location=[latitude, longitude],
+            radius=radius or marker_radius,
+            popup=popup,
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.7
+        ).add_to(m)
 
-    for location in data:
-        if location['latitude'] == 0 and location['longitude'] == 0:
-            continue
 
-        popup_content = create_popup_content(
-            data=location,
-            title_key='region',
-            fields=[
-                ('Total Events', 'total_events', '{:,}'),
-                ('Avg. Killed', 'avg_killed', '{:.2f}'),
-                ('Avg. Wounded', 'avg_wounded', '{:.2f}')
-            ]
-        )
+CLUSTER_MARKER_CALLBACK = """
+    var callback = function (row) {
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: row[3], color: row[4], fillColor: row[4], fillOpacity: 0.7, weight: 1, value: row[2]
+        });
+        if (row[5]) {
+            marker.bindPopup(row[5]);
+        }
+        return marker;
+    };
+"""
+
+CLUSTER_ICON_FUNCTION = """
+    function (cluster) {
+        var total = 0;
+        cluster.getAllChildMarkers().forEach(function (marker) { total += marker.options.value; });
+        var size = total < %(medium)s ? 'small' : (total < %(large)s ? 'medium' : 'large');
+        return L.divIcon({
+            html: '<div><span>' + total.toLocaleString() + '</span></div>',
+            className: 'marker-cluster marker-cluster-' + size,
+            iconSize: new L.Point(40, 40)
+        });
+    }
+"""
+
+
+def add_clustered_markers(
+        m: folium.Map,
+        markers: PreparedMarkers,
+        name: Optional[str] = None
+) -> plugins.FastMarkerCluster:
+    total = float(markers.values.sum())
+    cluster_rows = [list(row) for row in markers.iter_rows()]
+
+    icon_function = CLUSTER_ICON_FUNCTION % {'medium': max(total * 0.01, 10), 'large': max(total * 0.1, 100)}
+    return plugins.FastMarkerCluster(
+        cluster_rows,
+        callback=CLUSTER_MARKER_CALLBACK,
+        icon_create_function=icon_function,
+        name=name
+    ).add_to(m)
 
-        marker = create_circle_marker(
-            location=location,
-            colormap=colormap,
-            value_key='total_events',
-            min_value=min_events,
-            max_value=max_events,
-            popup_content=popup_content
-        )
-        marker.add_to(m)
 
-    return m._repr_html_()
+@cached_map('basic_casualties')
+def create_basic_casualties_map(data: List[Dict[str, Any]], popups: str = 'lazy') -> str:
 
+    m = create_base_map()
 
-# 6
-def create_popup_content_for_changes(location: Dict[str, Any]) -> str:
-
-    return f"""
-        <div style='font-family: Arial; min-width: 180px;'>
-            <h4 style='margin: 0 0 10px 0;'>{location['region']}</h4>
-            <table style='width: 100%; border-spacing: 5px;'>
-                <tr>
-                    <td><b>Latest Change ({location['latest_years']}):</b></td>
-                    <td style='text-align: right;'>{location['latest_change']:+.2f}%</td>
-                </tr>
-                <tr>
-                    <td><b>Average Change:</b></td>
-                    <td style='text-align: right;'>{location['avg_change']:+.2f}%</td>
-                </tr>
-                <tr>
-                    <td><b>Years Count:</b></td>
-                    <td style='text-align: right;'>{len(location['yearly_changes'])}</td>
-                </tr>
-            </table>
-        </div>
-    """
+    markers = prepare_markers(
+        data, 'total_events', create_popup_factory('casualties', popups), caption='Number of Events'
+    )
+    add_popup_loader(m, popups)
+    if markers is None:
+        return m._repr_html_()
+
+    markers.colormap.add_to(m)
+    add_circle_markers(m, markers)
+
+    return m._repr_html_()
 
 
-def create_attack_change_map(data: List[Dict[str, Any]]) -> str:
+@cached_map('attack_change')
+def create_attack_change_map(data: List[Dict[str, Any]], popups: str = 'lazy') -> str:
 
     m = folium.Map(location=[31.5, 34.8], zoom_start=4,
                    tiles='OpenStreetMap', attr='© OpenStreetMap contributors')
+    create_popup = create_popup_factory('attack_change', popups)
+    add_popup_loader(m, popups)
 
     for region_data in data:
         region = region_data['region']
@@ -201,25 +278,13 @@ def create_attack_change_map(data: List[Dict[str, Any]]) -> str:
 
         color = 'red' if latest_change < 0 else 'blue'
 
-        popup_html = f"""
-            <div style='font-family: Arial; min-width: 180px;'>
-                <h4 style='margin: 0 0 10px 0;'>{region}</h4>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    <tr>
-                        <td><b>Latest Change ({year_range}):</b></td>
-                        <td style='text-align: right;'>{latest_change:+.2f}%</td>
-                    </tr>
-                    <tr>
-                        <td><b>Average Change:</b></td>
-                        <td style='text-align: right;'>{avg_change:+.2f}%</td>
-                    </tr>
-                    <tr>
-                        <td><b>Years Analyzed:</b></td>
-                        <td style='text-align: right;'>{len(changes)}</td>
-                    </tr>
-                </table>
-            </div>
-        """
+        popup_html = create_popup({
+            'region': region,
+            'year_range': year_range,
+            'latest_change': latest_change,
+            'avg_change': avg_change,
+            'years_count': len(changes)
+        }) if create_popup else None
 
         folium.CircleMarker(
             location=coordinates,
@@ -250,10 +315,13 @@ def create_attack_change_map(data: List[Dict[str, Any]]) -> str:
     return m._repr_html_()
 
 
-def create_attack_change_map_detailed(data: List[Dict[str, Any]]) -> str:
+@cached_map('attack_change_detailed')
+def create_attack_change_map_detailed(data: List[Dict[str, Any]], popups: str = 'lazy') -> str:
 
     m = folium.Map(location=[31.5, 34.8], zoom_start=4,
                    tiles='OpenStreetMap', attr='© OpenStreetMap contributors')
+    create_popup = create_popup_factory('attack_change_detailed', popups)
+    add_popup_loader(m, popups)
 
     for region_data in data:
         region = region_data['region']
@@ -272,35 +340,15 @@ def create_attack_change_map_detailed(data: List[Dict[str, Any]]) -> str:
 
         color = 'red' if latest_change < 0 else 'blue'
 
-        changes_rows = ""
-        for change in sorted(changes, key=lambda x: x['year'], reverse=True):
-            changes_rows += f"""
-                <tr>
-                    <td>{change['previous_year']} → {change['year']}:</td>
-                    <td style='text-align: right;'>{change['percent_change']:+.2f}%</td>
-                </tr>
-            """
-
-        popup_html = f"""
-            <div style='font-family: Arial; min-width: 200px; max-height: 300px; overflow-y: auto;'>
-                <h4 style='margin: 0 0 10px 0;'>{region}</h4>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    <tr>
-                        <td><b>Average Change:</b></td>
-                        <td style='text-align: right;'>{avg_change:+.2f}%</td>
-                    </tr>
-                    <tr>
-                        <td><b>Years Analyzed:</b></td>
-                        <td style='text-align: right;'>{len(changes)}</td>
-                    </tr>
-                </table>
-                <hr style='margin: 10px 0;'>
-                <p style='margin: 5px 0;'><b>Historical Changes:</b></p>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    {changes_rows}
-                </table>
-            </div>
-        """
+        popup_html = create_popup({
+            'region': region,
+            'avg_change': avg_change,
+            'years_count': len(changes),
+            'changes': [
+                {key: change[key] for key in ('previous_year', 'year', 'percent_change')}
+                for change in sorted(changes, key=lambda x: x['year'], reverse=True)
+            ]
+        }) if create_popup else None
 
         folium.CircleMarker(
             location=coordinates,
@@ -331,23 +379,34 @@ def create_attack_change_map_detailed(data: List[Dict[str, Any]]) -> str:
     return m._repr_html_()
 
 
+HEATMAP_GRADIENT = {
+    '0.2': '#fee0d2',
+    '0.4': '#fc9272',
+    '0.6': '#de2d26',
+    '1.0': '#a50f15'
+}
+
+
+degrade_heatmap = degrade_with(max_points=map_degraded_max_points, weight_key='events_count')
+
+
+def prepare_heat_data(data: List[Dict[str, Any]], weight_key: str) -> List[List[float]]:
+    latitudes = to_float_array([point.get('latitude') for point in data])
+    longitudes = to_float_array([point.get('longitude') for point in data])
+    weights = to_float_array([point.get(weight_key) for point in data])
+
+    mask = get_valid_coordinates_mask(latitudes, longitudes) & np.isfinite(weights)
+    return np.column_stack([latitudes[mask], longitudes[mask], weights[mask]]).tolist()
+
+
 # 7
+@cached_map('terror_heatmap_90', degrade=degrade_heatmap)
 def create_terror_heatmap_90(data: List[Dict[str, Any]]) -> str:
 
     m = folium.Map(location=[31.5, 34.8], zoom_start=4,
                    tiles='OpenStreetMap', attr='© OpenStreetMap contributors')
 
-    heat_data = []
-    for event in data:
-        try:
-            lat = float(event['latitude'])
-            lon = float(event['longitude'])
-            weight = float(event['events_count'])
-            if lat and lon:
-                heat_data.append([lat, lon, weight])
-        except (TypeError, ValueError) as e:
-            print(f"Error processing data point: {e}")
-            continue
+    heat_data = prepare_heat_data(data, 'events_count')
 
     if heat_data:
         plugins.HeatMap(
@@ -357,29 +416,22 @@ def create_terror_heatmap_90(data: List[Dict[str, Any]]) -> str:
             radius=15,
             blur=10,
             gradient={
-                0.4: '#fee0d2',
-                0.6: '#fc9272',
-                0.8: '#de2d26',
-                1.0: '#a50f15'
+                '0.4': '#fee0d2',
+                '0.6': '#fc9272',
+                '0.8': '#de2d26',
+                '1.0': '#a50f15'
             }
         ).add_to(m)
 
     return m._repr_html_()
 
 
+@cached_map('terror_heatmap', degrade=degrade_heatmap)
 def create_terror_heatmap(data: List[Dict[str, Any]]) -> str:
 
     m = folium.Map(location=[31.5, 34.8], zoom_start=3)
 
-    heat_data = []
-
-    for point in data:
-        lat = point['latitude']
-        lon = point['longitude']
-        weight = point['events_count']
-
-        if lat != 0 and lon != 0:
-            heat_data.append([lat, lon, weight])
+    heat_data = prepare_heat_data(data, 'events_count')
 
     plugins.HeatMap(
         heat_data,
@@ -387,12 +439,7 @@ def create_terror_heatmap(data: List[Dict[str, Any]]) -> str:
         max_opacity=0.8,
         radius=25,
         blur=15,
-        gradient={
-            0.2: '#fee0d2',
-            0.4: '#fc9272',
-            0.6: '#de2d26',
-            1.0: '#a50f15'
-        }
+        gradient=HEATMAP_GRADIENT
     ).add_to(m)
 
     legend_html = '''
@@ -408,73 +455,147 @@ def create_terror_heatmap(data: List[Dict[str, Any]]) -> str:
     return m._repr_html_()
 
 
+class LazyHeatmapFrames(MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function () {
+                var map = {{ this._parent.get_name() }};
+                var heat = {{ this.heat_layer.get_name() }};
+                var index = {{ this.index|tojson }};
+                var frameUrl = {{ this.frame_url|tojson }};
+                var frames = {};
+                var position = 0;
+                var timer = null;
+
+                var control = L.control({position: 'bottomleft'});
+                control.onAdd = function () {
+                    var div = L.DomUtil.create('div', 'leaflet-bar');
+                    div.style.background = 'white';
+                    div.style.padding = '6px 10px';
+                    div.innerHTML = "<button type='button'>&#9654;</button> " +
+                        "<input type='range' min='0' max='" + Math.max(index.length - 1, 0) + "' value='0' " +
+                        "style='width: 300px; vertical-align: middle;'> <span></span>";
+                    L.DomEvent.disableClickPropagation(div);
+                    return div;
+                };
+                control.addTo(map);
+
+                var container = control.getContainer();
+                var button = container.querySelector('button');
+                var slider = container.querySelector('input');
+                var label = container.querySelector('span');
+
+                function loadFrame(key) {
+                    if (!frames[key]) {
+                        frames[key] = fetch(frameUrl.replace('{frame}', key))
+                            .then(function (response) { return response.ok ? response.json() : []; })
+                            .catch(function () { delete frames[key]; return []; });
+                    }
+                    return frames[key];
+                }
+
+                function show(target) {
+                    if (!index.length) {
+                        label.textContent = 'No data';
+                        return;
+                    }
+                    position = target;
+                    slider.value = target;
+                    label.textContent = index[target];
+                    loadFrame(index[target]).then(function (points) {
+                        if (position === target) {
+                            heat.setLatLngs(points);
+                        }
+                    });
+                    // Fetch the next frame ahead of time so playback does not stall on the network
+                    if (target + 1 < index.length) {
+                        loadFrame(index[target + 1]);
+                    }
+                }
+
+                slider.addEventListener('input', function () { show(parseInt(slider.value, 10)); });
+                button.addEventListener('click', function () {
+                    if (timer) {
+                        clearInterval(timer);
+                        timer = null;
+                        button.innerHTML = '&#9654;';
+                        return;
+                    }
+                    button.innerHTML = '&#10074;&#10074;';
+                    timer = setInterval(function () { show((position + 1) % index.length); }, {{ this.interval }});
+                });
+
+                show(0);
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, heat_layer: plugins.HeatMap, index: List[str], frame_url: str, interval: int = 500):
+        super().__init__()
+        self._name = 'LazyHeatmapFrames'
+        self.heat_layer = heat_layer
+        self.index = index
+        self.frame_url = frame_url
+        self.interval = interval
+
+
+# 7 - animated
+@cached_map('animated_heatmap')
+def create_animated_heatmap(
+        index: List[str],
+        frame_url: Optional[str] = None,
+        frames: Optional[List[List[List[float]]]] = None
+) -> str:
+    m = folium.Map(location=[31.5, 34.8], zoom_start=3)
+
+    if frames is not None:
+        plugins.HeatMapWithTime(
+            frames,
+            index=index,
+            radius=25,
+            blur=0.8,
+            min_opacity=0.3,
+            max_opacity=0.8,
+            gradient=HEATMAP_GRADIENT,
+            auto_play=False
+        ).add_to(m)
+        return m._repr_html_()
+
+    heat_layer = plugins.HeatMap(
+        [],
+        min_opacity=0.3,
+        radius=25,
+        blur=15,
+        gradient=HEATMAP_GRADIENT
+    ).add_to(m)
+    LazyHeatmapFrames(heat_layer, index, frame_url).add_to(m)
+
+    return m._repr_html_()
+
+
 #####
 
 # 16
-def create_high_group_activity_map(data: List[Dict[str, Any]]) -> str:
+@cached_map('high_group_activity', degrade=degrade_with(clustered=True, popups='none'))
+def create_high_group_activity_map(
+        data: Iterable[Dict[str, Any]],
+        clustered: bool = False,
+        popups: str = 'lazy'
+) -> str:
     m = folium.Map(location=[31.5, 34.8], zoom_start=4)
 
-    values = [item['total_attacks'] for item in data
-              if item.get('latitude') and item.get('longitude')]
-
-    if not values:
-        return m._repr_html_()
-
-    colormap = cm.LinearColormap(
-        colors=['yellow', 'orange', 'red'],
-        vmin=min(values),
-        vmax=max(values),
-        caption='Number of Attacks'
+    markers = prepare_markers(
+        data, 'total_attacks', create_popup_factory('high_group_activity', popups), caption='Number of Attacks'
     )
-    colormap.add_to(m)
+    add_popup_loader(m, popups)
+    if markers is None:
+        return m._repr_html_()
 
-    for location in data:
-        if not location['latitude'] or not location['longitude']:
-            continue
+    markers.colormap.add_to(m)
 
-        popup_html = f"""
-            <div style='font-family: Arial; min-width: 180px;'>
-                <h4 style='margin: 0 0 10px 0;'>{location['country']}</h4>
-                <table style='width: 100%; border-spacing: 5px;'>
-                    <tr>
-                        <td><b>Region:</b></td>
-                        <td style='text-align: right;'>{location['region']}</td>
-                    </tr>
-                    <tr>
-                        <td><b>Total Attacks:</b></td>
-                        <td style='text-align: right;'>{location['total_attacks']}</td>
-                    </tr>
-                    <tr>
-                        <td><b>Number of Groups:</b></td>
-                        <td style='text-align: right;'>{location['unique_groups_count']}</td>
-                    </tr>
-                </table>
-                <hr style='margin: 10px 0;'>
-                <p style='margin: 5px 0;'><b>Groups Details:</b></p>
-                <table style='width: 100%; border-spacing: 5px;'>
-        """
-
-        for group in location['groups']:
-            popup_html += f"""
-                <tr>
-                    <td>{group['name']}</td>
-                    <td style='text-align: right;'>{group['attacks']} attacks</td>
-                </tr>
-            """
-
-        popup_html += """
-                </table>
-            </div>
-        """
-
-        marker = create_circle_marker(
-            location=location,
-            colormap=colormap,
-            value_key='total_attacks',
-            min_value=min(values),
-            max_value=max(values),
-            popup_content=popup_html
-        )
-        marker.add_to(m)
+    if clustered:
+        add_clustered_markers(m, markers)
+    else:
+        add_circle_markers(m, markers)
 
     return m._repr_html_()
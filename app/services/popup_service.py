@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from branca.element import MacroElement
+from dotenv import load_dotenv
+from folium.template import Template
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+popup_registry_size = int(os.environ.get('POPUP_REGISTRY_SIZE', 100000))
+popup_url_prefix = os.environ.get('POPUP_URL_PREFIX', '/popup')
+
+POPUP_MODES = ('lazy', 'inline', 'none')
+POPUP_TEMPLATES_DIR = Path(__file__).parent.parent / 'templates' / 'popups'
+
+popup_templates = Environment(
+    loader=FileSystemLoader(POPUP_TEMPLATES_DIR),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,
+    cache_size=-1
+)
+
+popup_registry = LRUCache(max_size=popup_registry_size)
+
+_captured_popups: ContextVar[Optional[Dict[Tuple[str, str], Dict]]] = ContextVar('captured_popups', default=None)
+
+
+class LazyPopupLoader(MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            {{ this._parent.get_name() }}.on('popupopen', function (e) {
+                var popup = e.popup;
+                var placeholder = popup.getElement().querySelector('[data-popup-url]');
+                if (!placeholder) {
+                    return;
+                }
+                fetch(placeholder.getAttribute('data-popup-url'))
+                    .then(function (response) { return response.ok ? response.text() : 'Details unavailable'; })
+                    .then(function (html) { popup.setContent(html); popup.update(); })
+                    .catch(function () { popup.setContent('Details unavailable'); });
+            });
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = 'LazyPopupLoader'
+
+
+def get_popup_id(kind: str, record: Dict[str, Any]) -> str:
+    payload = json.dumps([kind, record], sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=12).hexdigest()
+
+
+def register_popup(kind: str, record: Dict[str, Any]) -> str:
+    popup_id = get_popup_id(kind, record)
+    popup_registry.set((kind, popup_id), record)
+
+    captured = _captured_popups.get()
+    if captured is not None:
+        captured[(kind, popup_id)] = record
+    return popup_id
+
+
+def register_popups(popups: Dict[Tuple[str, str], Dict]) -> None:
+    for key, record in popups.items():
+        popup_registry.set(key, record)
+
+
+@contextmanager
+def capture_popups() -> Iterator[Dict[Tuple[str, str], Dict]]:
+    captured = {}
+    token = _captured_popups.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured_popups.reset(token)
+
+
+def render_popup_template(kind: str, record: Dict[str, Any]) -> str:
+    return popup_templates.get_template(f"{kind}.html").render(**record)
+
+
+def render_popup(kind: str, popup_id: str) -> Optional[str]:
+    record = popup_registry.get((kind, popup_id))
+    if record is None:
+        return None
+    return render_popup_template(kind, record)
+
+
+def create_lazy_popup(kind: str, record: Dict[str, Any]) -> str:
+    popup_id = register_popup(kind, record)
+    return f"<div data-popup-url='{popup_url_prefix}/{kind}/{popup_id}'>Loading...</div>"
+
+
+def create_popup_factory(kind: str, mode: str = 'lazy') -> Optional[Callable[[Dict[str, Any]], str]]:
+    if mode not in POPUP_MODES:
+        raise ValueError(f"Invalid popups. Must be one of: {', '.join(POPUP_MODES)}")
+    if mode == 'none':
+        return None
+    if mode == 'inline':
+        return lambda record: render_popup_template(kind, record)
+    return lambda record: create_lazy_popup(kind, record)
+
+
+def add_popup_loader(m, mode: str) -> None:
+    if mode == 'lazy':
+        LazyPopupLoader().add_to(m)
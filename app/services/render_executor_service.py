@@ -0,0 +1,97 @@
+import importlib
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.services.popup_service import capture_popups
+
+load_dotenv(verbose=True)
+
+map_render_workers = int(os.environ.get('MAP_RENDER_WORKERS', min(os.cpu_count() or 1, 4)))
+map_render_timeout_seconds = float(os.environ.get('MAP_RENDER_TIMEOUT_SECONDS', 10))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = Lock()
+
+
+def get_render_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    with _executor_lock:
+        if _executor is None and map_render_workers > 0:
+            # Spawned workers do not inherit the request threads or open client connections of the server process
+            _executor = ProcessPoolExecutor(max_workers=map_render_workers, mp_context=get_context('spawn'))
+        return _executor
+
+
+def reset_render_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def build_map_with_popups(
+        build_map: Callable[..., str],
+        data: Any,
+        kwargs: Dict[str, Any]
+) -> Tuple[str, Dict[Tuple[str, str], Dict]]:
+    with capture_popups() as popups:
+        html = build_map(data, **kwargs)
+    return html, popups
+
+
+def render_in_worker(
+        module_name: str,
+        function_name: str,
+        data: Any,
+        kwargs: Dict[str, Any]
+) -> Tuple[str, Dict[Tuple[str, str], Dict]]:
+    # The cached wrapper is what the module exposes, the worker runs the builder underneath it
+    build_map = getattr(importlib.import_module(module_name), function_name).__wrapped__
+    return build_map_with_popups(build_map, data, kwargs)
+
+
+def submit_render(
+        key: str,
+        build_map: Callable[..., str],
+        data: Any,
+        kwargs: Dict[str, Any],
+        on_complete: Callable[[str, Dict], Any]
+) -> Optional[Future]:
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+
+        executor = get_render_executor()
+        if executor is None:
+            return None
+
+        future = executor.submit(render_in_worker, build_map.__module__, build_map.__name__, data, kwargs)
+        _in_flight[key] = future
+
+    def complete(done: Future) -> None:
+        try:
+            if not done.cancelled() and done.exception() is None:
+                on_complete(*done.result())
+            elif not done.cancelled():
+                print(f"Error rendering map {key}: {done.exception()}")
+        finally:
+            with _in_flight_lock:
+                _in_flight.pop(key, None)
+
+    future.add_done_callback(complete)
+    return future
+
+
+def get_in_flight_renders() -> int:
+    with _in_flight_lock:
+        return len(_in_flight)
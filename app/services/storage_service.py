@@ -1,22 +1,42 @@
 from typing import List, Dict
 
+from pymongo import UpdateOne
+
 from app.config.elastic_config.elastic_connection import elastic_client
 from app.config.mongo_config.mongo_client import terror_events_collection
+from app.services.centroid_service import refresh_centroids
 
 
-def save_terror_events_to_mongo(events: List[Dict]) -> bool:
+def setup_terror_events_collection() -> None:
     try:
-        if events:
-            result = terror_events_collection.insert_many(events)
-            print(f"Inserted {len(result.inserted_ids)} events into MongoDB.")
-            return True
-        else:
-            print("No events to insert.")
-            return False
+        terror_events_collection.create_index('event_id', unique=True)
+    except Exception as e:
+        print(f"Error creating event_id index: {e}")
+
+
+def save_terror_events_to_mongo(events: List[Dict]) -> bool:
+    if not events:
+        print("No events to insert.")
+        return False
 
+    # Upserts keyed on event_id leave events from a redelivered batch untouched
+    operations = [
+        UpdateOne({'event_id': event['event_id']}, {'$setOnInsert': event}, upsert=True)
+        for event in events
+    ]
+    try:
+        result = terror_events_collection.bulk_write(operations, ordered=False)
     except Exception as e:
         print(f"Error saving batch to MongoDB: {str(e)}")
-        return False
+        # Raised so the consumer does not commit offsets for events that were never stored
+        raise
+
+    print(f"Inserted {result.upserted_count} events into MongoDB, {len(events) - result.upserted_count} already stored.")
+    # Only events stored for the first time move the centroids, so a redelivered batch is not counted twice
+    inserted_events = [events[index] for index in sorted(result.upserted_ids)]
+    if inserted_events:
+        refresh_centroids(inserted_events)
+    return True
 
 
 def save_terror_event_to_mongo(event: Dict) -> bool:
@@ -1,11 +1,30 @@
+import os
 from typing import List, Dict, Any, Optional, Union
 
+from dotenv import load_dotenv
+
 from app.repositories.mongo_repositories.terror_events_repository import (
     get_deadly_attack_types, get_casualties_by_region, get_top_terrorist_groups,
     get_attack_frequency, get_attack_type_target_correlation, get_attack_change_by_region,
-    get_terror_heatmap_data
+    get_terror_heatmap_data, get_terror_events_version
 )
-from app.services.map_service import create_basic_casualties_map, create_terror_heatmap
+from app.services.map_cache_service import MapQuery
+from app.services.map_service import create_basic_casualties_map, create_terror_heatmap, get_region_coordinates
+from app.utils.cache_util import LRUCache
+
+load_dotenv(verbose=True)
+
+events_version_ttl_seconds = int(os.environ.get('EVENTS_VERSION_TTL_SECONDS', 30))
+
+events_version_cache = LRUCache(max_size=1, ttl_seconds=events_version_ttl_seconds)
+
+
+def get_events_data_version() -> str:
+    version = events_version_cache.get('version')
+    if version is None:
+        version = get_terror_events_version()
+        events_version_cache.set('version', version)
+    return version
 
 
 # 1
@@ -25,20 +44,26 @@ def process_casualties_by_region(
         top_n: Optional[int] = None,
         include_map: bool = False
 ) -> Union[List[Dict[str, Any]], str]:
+    if include_map:
+        return create_basic_casualties_map(
+            MapQuery(process_casualties_by_region, {'top_n': top_n}, version=get_events_data_version)
+        )
+
     raw_data = get_casualties_by_region(top_n=top_n)
 
-    processed_data = [
-        {
+    processed_data = []
+    for item in raw_data:
+        latitude, longitude = get_region_coordinates(item['_id']) or (0, 0)
+        processed_data.append({
             'region': item['_id'],
             'avg_killed': item.get('avg_killed', 0),
             'avg_wounded': item.get('avg_wounded', 0),
             'total_events': item.get('total_events', 0),
-            'latitude': item.get('representative_location', {}).get('latitude', 0),
-            'longitude': item.get('representative_location', {}).get('longitude', 0),
-        } for item in raw_data
-    ]
+            'latitude': latitude,
+            'longitude': longitude,
+        })
 
-    return create_basic_casualties_map(processed_data) if include_map else processed_data
+    return processed_data
 
 
 def process_casualties_by_region1(top_n: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -122,6 +147,13 @@ def process_terror_heatmap_data(
         start_year: int = 1970,
         include_map: bool = False
 ) -> Union[List[Dict[str, Any]], str]:
+    if include_map:
+        return create_terror_heatmap(MapQuery(
+            process_terror_heatmap_data,
+            {'time_period': time_period, 'start_year': start_year},
+            version=get_events_data_version
+        ))
+
     raw_data = get_terror_heatmap_data(
         time_period=time_period,
         start_year=start_year
@@ -139,7 +171,7 @@ def process_terror_heatmap_data(
         for item in raw_data
     ]
 
-    return create_terror_heatmap(processed_data) if include_map else processed_data
+    return processed_data
 
 
 if __name__ == '__main__':
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(
+            self,
+            max_size: int = 1024,
+            ttl_seconds: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+            size_of: Callable[[Any], int] = len
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.total_bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._items.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+
+            value, expires_at, _ = item
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                return default
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        size = self.size_of(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (value, expires_at, size)
+            self.total_bytes += size
+            while len(self._items) > self.max_size or (self.max_bytes and self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self._items)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,53 @@
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional, Union
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/plain',
+    'text/css',
+    'application/json',
+    'application/geo+json',
+    'application/javascript',
+    'image/svg+xml'
+}
+
+
+def get_supported_encodings() -> tuple:
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    # Brotli wins over gzip when the client accepts both, the server preference breaks quality ties
+    best, best_quality = None, 0
+    for encoding in get_supported_encodings():
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks: Iterable[Union[str, bytes]], encoding: str, level: int) -> Iterator[bytes]:
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compress_chunk, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        data = compress_chunk(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from typing import Optional, Union
+
+from dotenv import load_dotenv
+from flask import Flask, Response, make_response, request
+
+from app.utils.cache_util import LRUCache
+from app.utils.compression_util import COMPRESSIBLE_MIMETYPES, choose_encoding, compress, compress_stream
+
+load_dotenv(verbose=True)
+
+compression_min_bytes = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+compression_levels = {
+    'gzip': int(os.environ.get('RESPONSE_GZIP_LEVEL', 6)),
+    'br': int(os.environ.get('RESPONSE_BROTLI_QUALITY', 5))
+}
+
+# Policies are looked up by endpoint first, then by blueprint, views that set Cache-Control themselves keep it
+CACHE_POLICIES = {
+    'events': 'public, max-age=300',
+    'groups': 'public, max-age=60',
+    'groups.pool_metrics_route': 'no-store',
+    'search': 'private, max-age=30',
+    'geojson': 'public, max-age=300',
+    **json.loads(os.environ.get('RESPONSE_CACHE_POLICIES', '{}'))
+}
+
+compressed_responses = LRUCache(
+    max_size=int(os.environ.get('COMPRESSED_CACHE_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.environ.get('COMPRESSED_CACHE_MAX_MB', 128)) * 2 ** 20
+)
+
+
+def parse_bool(value: str) -> bool:
+    # type=bool would treat any non-empty value, "false" and "0" included, as true
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def make_cached_response(
+        body: Union[str, bytes],
+        mimetype: str,
+        etag: Optional[str] = None,
+        max_age: Optional[int] = None
+) -> Response:
+    response = make_response(body)
+    response.mimetype = mimetype
+
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    if etag:
+        response.set_etag(etag)
+        response.make_conditional(request)
+    return response
+
+
+def make_html_response(html: str) -> Response:
+    response = make_cached_response(html, 'text/html', getattr(html, 'etag', None))
+    if getattr(html, 'degraded', False):
+        # A degraded render stands in only until the full one is cached
+        response.cache_control.no_store = True
+    return response
+
+
+def get_cache_policy(endpoint: Optional[str]) -> Optional[str]:
+    if not endpoint:
+        return None
+    return CACHE_POLICIES.get(endpoint) or CACHE_POLICIES.get(endpoint.split('.', 1)[0])
+
+
+def apply_cache_policy(response: Response) -> None:
+    if request.method != 'GET' or response.status_code not in (200, 304) or 'Cache-Control' in response.headers:
+        return
+
+    policy = get_cache_policy(request.endpoint)
+    if policy:
+        response.headers['Cache-Control'] = policy
+
+
+def compress_response(response: Response) -> None:
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code != 200 \
+            or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, compression_levels[encoding])
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Content-Length', None)
+        return
+
+    body = response.get_data()
+    if len(body) < compression_min_bytes:
+        return
+
+    # Cached maps carry an ETag already, other bodies are hashed so their compressed variant can be reused too
+    etag, _ = response.get_etag()
+    etag = etag or hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    compressed = compressed_responses.get((etag, encoding))
+    if compressed is None:
+        compressed = compress(body, encoding, compression_levels[encoding])
+        compressed_responses.set((etag, encoding), compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # Every encoding is a different representation, so it needs its own strong validator
+    response.set_etag(f"{etag}-{encoding}")
+    response.make_conditional(request)
+
+
+def register_response_layer(app: Flask) -> None:
+    @app.after_request
+    def response_layer(response: Response) -> Response:
+        try:
+            apply_cache_policy(response)
+            compress_response(response)
+        except Exception as e:
+            print(f"Error in response layer: {e}")
+        return response
@@ -0,0 +1,5 @@
+import os
+
+# Modules read their connection settings at import time, clients only connect on first use
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('MONGO_DB_NAME', 'terror_events_test')
@@ -0,0 +1,76 @@
+import pytest
+
+from app.repositories.mongo_repositories.centroid_repository import get_centroid_increments, get_centroid_key, \
+    get_unit_vector, to_coordinates
+
+
+def create_event(latitude, longitude, region='Middle East', country='Iraq', city='Baghdad'):
+    return {'latitude': latitude, 'longitude': longitude, 'region': region, 'country': country, 'city': city}
+
+
+def get_centroid(increment):
+    sums = increment['sums']
+    return to_coordinates(sums['x'], sums['y'], sums['z'])
+
+
+@pytest.mark.parametrize('latitude, longitude', [(33.3, 44.4), (-12.05, -77.04), (64.1, -21.9), (-33.9, 151.2)])
+def test_unit_vector_round_trip(latitude, longitude):
+    assert to_coordinates(*get_unit_vector(create_event(latitude, longitude))) == \
+           (pytest.approx(latitude), pytest.approx(longitude))
+
+
+@pytest.mark.parametrize('latitude, longitude', [(0, 0), (None, 10), ('n/a', 10), (float('nan'), 10), (10, float('inf'))])
+def test_unit_vector_skips_invalid_coordinates(latitude, longitude):
+    assert get_unit_vector(create_event(latitude, longitude)) is None
+
+
+def test_centroid_key_requires_every_field():
+    assert get_centroid_key('city', create_event(1, 1)) == 'city:Iraq/Baghdad'
+    assert get_centroid_key('region', create_event(1, 1)) == 'region:Middle East'
+    assert get_centroid_key('city', create_event(1, 1, city=None)) is None
+    assert get_centroid_key('country', create_event(1, 1, country='')) is None
+
+
+def test_centroid_increments():
+    increments = get_centroid_increments([
+        create_event(30, 40),
+        create_event(36, 48),
+        create_event(0, 0),
+        create_event(35, 45, city='Mosul')
+    ])
+
+    assert set(increments) == {'region:Middle East', 'country:Iraq', 'city:Iraq/Baghdad', 'city:Iraq/Mosul'}
+    assert increments['country:Iraq']['sums']['count'] == 3
+    assert increments['city:Iraq/Baghdad']['sums']['count'] == 2
+    assert increments['city:Iraq/Baghdad']['fields'] == {'country': 'Iraq', 'city': 'Baghdad'}
+    assert increments['city:Iraq/Mosul']['name'] == 'Mosul'
+
+    latitude, longitude = get_centroid(increments['city:Iraq/Baghdad'])
+    assert latitude == pytest.approx(33, abs=0.2)
+    assert longitude == pytest.approx(44, abs=0.2)
+
+
+def test_centroid_across_the_antimeridian():
+    increments = get_centroid_increments([
+        create_event(-17, 179, region='Oceania', country='Fiji', city='Labasa'),
+        create_event(-17, -179, region='Oceania', country='Fiji', city='Labasa')
+    ])
+    latitude, longitude = get_centroid(increments['country:Fiji'])
+
+    # Averaging raw degrees would put this point at longitude 0
+    assert latitude == pytest.approx(-17, abs=0.01)
+    assert abs(longitude) == pytest.approx(180)
+
+
+def test_increments_add_up_like_a_single_batch():
+    events = [create_event(30 + i, 40 + i) for i in range(6)]
+    whole = get_centroid_increments(events)['region:Middle East']['sums']
+    first = get_centroid_increments(events[:2])['region:Middle East']['sums']
+    second = get_centroid_increments(events[2:])['region:Middle East']['sums']
+
+    for field in ('x', 'y', 'z', 'count'):
+        assert first[field] + second[field] == pytest.approx(whole[field])
+
+
+def test_to_coordinates_of_opposite_points():
+    assert to_coordinates(0, 0, 0) is None
@@ -0,0 +1,88 @@
+import networkx as nx
+import numpy as np
+
+from app.repositories.graph_repository.compact_graph_repository import CompactGraph, PropertyColumn
+
+
+def create_fixture_graph() -> nx.Graph:
+    G = nx.Graph()
+    G.add_node('g1', id='g1', name='Group One', type='terror_groups')
+    G.add_node('a1', id='a1', attack_types=['Bombing'], killed=3, type='attacks')
+    G.add_node('a2', id='a2', attack_types=['Armed Assault'], type='attacks')
+    G.add_node('l1', id='l1', country='Iraq', latitude=33.3, longitude=44.4, type='locations')
+    G.add_edge('g1', 'a1', type='ATTACKED')
+    G.add_edge('g1', 'a2', type='ATTACKED')
+    G.add_edge('a1', 'l1', type='OCCURRED_IN', weight=2.0)
+    return G
+
+
+def test_compact_graph_round_trip():
+    G = create_fixture_graph()
+    restored = CompactGraph.from_networkx(G).to_networkx()
+
+    assert dict(restored.nodes(data=True)) == dict(G.nodes(data=True))
+    assert type(restored.nodes['a1']['killed']) is int
+    assert {frozenset((s, t)): d for s, t, d in restored.edges(data=True)} == \
+           {frozenset((s, t)): d for s, t, d in G.edges(data=True)}
+
+
+def test_compact_graph_neighbors():
+    compact = CompactGraph.from_networkx(create_fixture_graph())
+
+    assert sorted(compact.neighbors('g1')) == ['a1', 'a2']
+    assert sorted(compact.neighbors('a1')) == ['g1', 'l1']
+    assert compact.neighbors('l1') == ['a1']
+    assert dict(zip(compact.node_ids, compact.degrees())) == {'g1': 2, 'a1': 2, 'a2': 1, 'l1': 1}
+
+
+def test_compact_graph_expand_two_hops():
+    compact = CompactGraph.from_networkx(create_fixture_graph())
+    first = compact.neighbor_indices(compact.node_index['g1'])
+    reached = {compact.node_ids[i] for i in np.unique(compact.expand(first))}
+
+    assert reached == {'g1', 'l1'}
+
+
+def test_compact_graph_apply_change_is_idempotent():
+    compact = CompactGraph()
+    changes = [
+        {'type': 'nodes', 'node_type': 'attacks', 'data': [{'id': 'a1', 'killed': 1}]},
+        {'type': 'nodes', 'node_type': 'locations', 'data': [{'id': 'l1', 'country': 'Peru'}]},
+        {
+            'type': 'relationships',
+            'data': [{'source_id': 'a1', 'target_id': 'l1', 'relation_type': 'OCCURRED_IN', 'properties': {}}]
+        }
+    ]
+    for change in changes + changes:
+        compact.apply_change(change)
+
+    assert compact.number_of_nodes == 2
+    assert compact.number_of_edges == 1
+    assert compact.neighbors('l1') == ['a1']
+    assert compact.node_data('l1') == {'id': 'l1', 'country': 'Peru', 'type': 'locations'}
+
+
+def test_compact_graph_csr_is_rebuilt_after_new_edges():
+    compact = CompactGraph.from_networkx(create_fixture_graph())
+    assert compact.neighbors('a2') == ['g1']
+
+    compact.add_relationships([
+        {'source_id': 'a2', 'target_id': 'l1', 'relation_type': 'OCCURRED_IN', 'properties': {}}
+    ])
+    assert sorted(compact.neighbors('a2')) == ['g1', 'l1']
+
+
+def test_property_column_keeps_ints_and_nan_values():
+    column = PropertyColumn()
+    column.set(0, 3)
+    column.set(2, 5)
+
+    assert column.kind == 'int'
+    assert [column.get(row) for row in range(3)] == [3, None, 5]
+    assert column.to_numpy().dtype == np.int64
+
+    column.set(3, float('nan'))
+
+    assert column.kind == 'object'
+    assert [column.get(row) for row in range(3)] == [3, None, 5]
+    assert column.get(3) != column.get(3)
@@ -0,0 +1,106 @@
+import networkx as nx
+
+from app.repositories.graph_repository.group_coactivity_repository import GroupCoactivityGraph, \
+    get_regions_high_group_activity_projection, get_shared_attack_types_projection
+from app.repositories.graph_repository.networkx_graph_repository import apply_graph_change
+from app.repositories.graph_repository.networkx_queries_repository import get_regions_high_group_activity_local, \
+    get_shared_attack_types_local
+
+CHANGES = [
+    {
+        'type': 'nodes',
+        'node_type': 'terror_groups',
+        'data': [{'id': 'g1', 'name': 'Alpha'}, {'id': 'g2', 'name': 'Beta'}, {'id': 'g3', 'name': 'Gamma'}]
+    },
+    {
+        'type': 'nodes',
+        'node_type': 'locations',
+        'data': [
+            {'id': 'l1', 'country': 'Iraq', 'region': 'Middle East', 'latitude': 33.3, 'longitude': 44.4},
+            {'id': 'l2', 'country': 'Peru', 'region': 'South America', 'latitude': -12.0, 'longitude': -77.0}
+        ]
+    },
+    {
+        'type': 'nodes',
+        'node_type': 'attacks',
+        'data': [
+            {'id': 'a1', 'attack_types': ['Bombing']},
+            {'id': 'a2', 'attack_types': ['Bombing']},
+            {'id': 'a3', 'attack_types': ['Armed Assault']}
+        ]
+    },
+    {
+        'type': 'relationships',
+        'data': [
+            {'source_id': 'g1', 'target_id': 'a1', 'relation_type': 'ATTACKED', 'properties': {}},
+            {'source_id': 'a1', 'target_id': 'l1', 'relation_type': 'OCCURRED_IN', 'properties': {}},
+            {'source_id': 'g2', 'target_id': 'a2', 'relation_type': 'ATTACKED', 'properties': {}},
+            {'source_id': 'a2', 'target_id': 'l1', 'relation_type': 'OCCURRED_IN', 'properties': {}},
+            {'source_id': 'g3', 'target_id': 'a3', 'relation_type': 'ATTACKED', 'properties': {}},
+            {'source_id': 'a3', 'target_id': 'l2', 'relation_type': 'OCCURRED_IN', 'properties': {}}
+        ]
+    }
+]
+
+
+def apply_changes(G: nx.Graph, projection: GroupCoactivityGraph, changes) -> None:
+    for change in changes:
+        apply_graph_change(G, change)
+        projection.apply_change(G, change)
+
+
+def get_weights(projection: GroupCoactivityGraph):
+    return {frozenset((s, t)): dict(data) for s, t, data in projection.graph.edges(data=True)}
+
+
+def test_coactivity_weights():
+    G, projection = nx.Graph(), GroupCoactivityGraph()
+    apply_changes(G, projection, CHANGES)
+
+    assert get_weights(projection) == {
+        frozenset(('g1', 'g2')): {'weight': 3, 'locations': 1, 'attack_types': 1, 'targets': 1}
+    }
+    [pair] = projection.get_top_pairs(1)
+    assert sorted(pair.pop('groups')) == ['Alpha', 'Beta']
+    assert pair == {'weight': 3, 'shared_locations': 1, 'shared_attack_types': 1, 'shared_targets': 1}
+
+
+def test_coactivity_weights_unchanged_by_replayed_changes():
+    G, projection = nx.Graph(), GroupCoactivityGraph()
+    apply_changes(G, projection, CHANGES)
+    weights = get_weights(projection)
+
+    apply_changes(G, projection, CHANGES)
+    apply_changes(G, projection, CHANGES[-1:])
+
+    assert get_weights(projection) == weights
+
+
+def test_incremental_projection_matches_rebuild():
+    G, projection = nx.Graph(), GroupCoactivityGraph()
+    # Relationships arriving before their nodes are indexed once the attack node shows up
+    apply_changes(G, projection, CHANGES[3:] + CHANGES[:3])
+
+    rebuilt = GroupCoactivityGraph.from_graph(G)
+    assert get_weights(projection) == get_weights(rebuilt)
+    assert projection.location_groups == rebuilt.location_groups
+
+
+def test_projection_queries_match_local_queries():
+    G, projection = nx.Graph(), GroupCoactivityGraph()
+    apply_changes(G, projection, CHANGES)
+
+    local = get_regions_high_group_activity_local(G)
+    projected = get_regions_high_group_activity_projection(projection)
+    assert [(r['country'], r['total_attacks'], r['unique_groups_count']) for r in projected] == \
+           [(r['country'], r['total_attacks'], r['unique_groups_count']) for r in local]
+
+    # The projection keeps groups in sets, so only their membership is compared
+    def normalize(records):
+        return [
+            {**r, 'attack_strategies': [{**s, 'groups': sorted(s['groups'])} for s in r['attack_strategies']]}
+            for r in records
+        ]
+
+    assert normalize(get_shared_attack_types_projection(projection, 'country', 'Iraq')) == \
+           normalize(get_shared_attack_types_local(G, 'country', 'Iraq'))
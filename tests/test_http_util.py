@@ -0,0 +1,110 @@
+import gzip
+
+import pytest
+from flask import Flask, Response
+from werkzeug.http import parse_accept_header
+
+from app.utils import compression_util
+from app.utils.compression_util import choose_encoding, compress_stream
+from app.utils.http_util import register_response_layer, make_cached_response, compressed_responses
+
+BODY = '<html>' + 'terror events map ' * 500 + '</html>'
+
+
+@pytest.fixture
+def client():
+    compressed_responses.clear()
+    app = Flask(__name__)
+
+    @app.route('/map')
+    def map_route():
+        return make_cached_response(BODY, 'text/html', etag='map-etag')
+
+    @app.route('/small')
+    def small_route():
+        return make_cached_response('<p>ok</p>', 'text/html')
+
+    @app.route('/image')
+    def image_route():
+        return make_cached_response(b'\x89PNG' * 1000, 'image/png')
+
+    @app.route('/stream')
+    def stream_route():
+        return Response((BODY[i:i + 100] for i in range(0, len(BODY), 100)), mimetype='text/html')
+
+    register_response_layer(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('header, brotli_available, expected', [
+    ('gzip, deflate, br', True, 'br'),
+    ('gzip, deflate, br', False, 'gzip'),
+    ('gzip;q=1.0, br;q=0.5', True, 'gzip'),
+    ('br;q=0, gzip', True, 'gzip'),
+    ('*', False, 'gzip'),
+    ('identity', True, None),
+    ('', True, None)
+])
+def test_choose_encoding(monkeypatch, header, brotli_available, expected):
+    monkeypatch.setattr(compression_util, 'brotli', object() if brotli_available else None)
+
+    assert choose_encoding(parse_accept_header(header)) == expected
+
+
+def test_compressed_response_gets_its_own_etag(client):
+    response = client.get('/map', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == '"map-etag-gzip"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data).decode('utf-8') == BODY
+
+
+def test_uncompressed_response_keeps_the_original_etag(client):
+    response = client.get('/map', headers={'Accept-Encoding': 'identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"map-etag"'
+    assert response.get_data(as_text=True) == BODY
+
+
+def test_conditional_request_per_encoding(client):
+    gzip_etag = client.get('/map', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    response = client.get('/map', headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # A validator of the gzip variant does not match the identity representation
+    response = client.get('/map', headers={'Accept-Encoding': 'identity', 'If-None-Match': gzip_etag})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == BODY
+
+    response = client.get('/map', headers={'Accept-Encoding': 'identity', 'If-None-Match': '"map-etag"'})
+    assert response.status_code == 304
+
+
+def test_compressed_body_is_reused(client):
+    client.get('/map', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed_responses.get(('map-etag', 'gzip')) is not None
+
+
+def test_small_and_binary_responses_are_not_compressed(client):
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/image', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_streamed_response_is_compressed(client):
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).decode('utf-8') == BODY
+
+
+def test_compress_stream_matches_input():
+    chunks = ['first chunk ', b'second chunk ', 'third']
+
+    assert gzip.decompress(b''.join(compress_stream(chunks, 'gzip', 6))) == b'first chunk second chunk third'
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from app.services import map_cache_service, render_executor_service
+from app.services.map_cache_service import MapQuery, cached_map, clear_map_cache
+
+release = threading.Event()
+loaded = []
+
+
+def load_records():
+    loaded.append(1)
+    release.wait(5)
+    return [{'name': 'a'}, {'name': 'b'}]
+
+
+@cached_map('test_map')
+def build_test_map(data):
+    return ''.join(record['name'] for record in data)
+
+
+def test_concurrent_map_requests_load_and_render_once(monkeypatch):
+    # Rendering in process keeps the builder in this test module
+    monkeypatch.setattr(render_executor_service, 'map_render_workers', 0)
+    clear_map_cache()
+    release.clear()
+    loaded.clear()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(build_test_map(MapQuery(load_records, {}))))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.time() + 5
+    while not map_cache_service._pending_maps and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(loaded) == 1
+    assert results == ['ab'] * 4
+    assert len({rendered.etag for rendered in results}) == 1
+    assert not map_cache_service._pending_maps
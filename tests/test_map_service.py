@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+
+from app.services.map_service import prepare_markers, get_valid_coordinates_mask, to_float_array
+
+
+def create_record(latitude, longitude, value, name):
+    return {'latitude': latitude, 'longitude': longitude, 'total_attacks': value, 'name': name}
+
+
+def test_valid_coordinates_mask():
+    latitudes = to_float_array([33.3, 0, 0, float('nan'), 91, 10, None])
+    longitudes = to_float_array([44.4, 0, 12.5, 10, 10, 181, 10])
+
+    assert get_valid_coordinates_mask(latitudes, longitudes).tolist() == [True, False, True, False, False, False, False]
+
+
+def test_prepare_markers_skips_invalid_records():
+    records = [
+        create_record(33.3, 44.4, 10, 'valid'),
+        create_record(0, 0, 5, 'null island'),
+        create_record(float('nan'), 44.4, 5, 'nan latitude'),
+        create_record(None, 44.4, 5, 'missing latitude'),
+        create_record('n/a', 44.4, 5, 'text latitude'),
+        create_record(-12.0, -77.0, float('nan'), 'nan value'),
+        create_record(-12.0, -77.0, 20, 'also valid')
+    ]
+    markers = prepare_markers(records, 'total_attacks')
+
+    assert [record['name'] for record in markers.records] == ['valid', 'also valid']
+    assert markers.latitudes.tolist() == [33.3, -12.0]
+    assert markers.values.tolist() == [10.0, 20.0]
+    assert markers.radii.tolist() == [8.0, 20.0]
+    assert markers.popups == [None, None]
+
+
+def test_prepare_markers_returns_none_without_valid_records():
+    records = [create_record(0, 0, 1, 'null island'), create_record(None, None, 1, 'missing')]
+
+    assert prepare_markers(records, 'total_attacks') is None
+    assert prepare_markers([], 'total_attacks') is None
+
+
+def test_prepare_markers_equal_values():
+    records = [create_record(10, 10, 3, 'a'), create_record(20, 20, 3, 'b')]
+    markers = prepare_markers(iter(records), 'total_attacks', create_popup=lambda record: record['name'])
+
+    assert markers.radii.tolist() == [14.0, 14.0]
+    assert len(set(markers.colors)) == 1
+    assert markers.popups == ['a', 'b']
+    assert markers.colormap.vmax > markers.colormap.vmin
+
+
+def test_prepare_markers_colors_follow_values():
+    records = [create_record(10, 10, value, str(value)) for value in (1, 50, 100)]
+    markers = prepare_markers(records, 'total_attacks')
+
+    assert markers.colors[0] == markers.colormap(1)
+    assert markers.colors[-1] == markers.colormap(100)
+    assert np.all(np.diff(markers.radii) > 0)
+    assert all(math.isfinite(radius) for radius in markers.radii)
@@ -0,0 +1,109 @@
+import json
+
+import networkx as nx
+import pytest
+
+from app.repositories.graph_repository.networkx_graph_repository import read_change_log
+from app.repositories.graph_repository.networkx_queries_repository import get_regions_high_group_activity_local, \
+    get_shared_attack_types_local, get_groups_shared_targets_local
+
+IRAQ = {'country': 'Iraq', 'region': 'Middle East', 'latitude': 33.3, 'longitude': 44.4}
+PERU = {'country': 'Peru', 'region': 'South America', 'latitude': -12.0, 'longitude': -77.0}
+
+
+def create_fixture_graph() -> nx.Graph:
+    G = nx.Graph()
+    G.add_node('l1', id='l1', type='locations', **IRAQ)
+    G.add_node('l2', id='l2', type='locations', **PERU)
+    for group, name in (('g1', 'Alpha'), ('g2', 'Beta'), ('g3', 'Gamma')):
+        G.add_node(group, id=group, name=name, subname=None, type='terror_groups')
+
+    attacks = [
+        ('a1', ['Bombing'], 'g1', 'l1'),
+        ('a2', ['Bombing'], 'g2', 'l1'),
+        ('a3', ['Armed Assault'], 'g1', 'l1'),
+        ('a4', ['Bombing', 'Armed Assault'], 'g3', 'l2')
+    ]
+    for attack, attack_types, group, location in attacks:
+        G.add_node(attack, id=attack, attack_types=attack_types, type='attacks')
+        # Endpoints are added in both orders, the analytics must not depend on edge direction
+        G.add_edge(attack, group, type='ATTACKED')
+        G.add_edge(location, attack, type='OCCURRED_IN')
+    return G
+
+
+def test_regions_high_group_activity_local():
+    records = get_regions_high_group_activity_local(create_fixture_graph())
+
+    assert records == [
+        {
+            **IRAQ,
+            'groups': [
+                {'id': 'g1', 'name': 'Alpha', 'subname': None, 'attacks': 2},
+                {'id': 'g2', 'name': 'Beta', 'subname': None, 'attacks': 1}
+            ],
+            'unique_groups_count': 2,
+            'total_attacks': 3
+        },
+        {
+            **PERU,
+            'groups': [{'id': 'g3', 'name': 'Gamma', 'subname': None, 'attacks': 1}],
+            'unique_groups_count': 1,
+            'total_attacks': 1
+        }
+    ]
+
+
+def test_regions_high_group_activity_local_filter_and_limit():
+    G = create_fixture_graph()
+
+    assert [r['country'] for r in get_regions_high_group_activity_local(G, limit=1)] == ['Iraq']
+    assert [r['country'] for r in get_regions_high_group_activity_local(G, 'country', 'Peru')] == ['Peru']
+    with pytest.raises(ValueError):
+        get_regions_high_group_activity_local(G, 'city', 'Lima')
+
+
+def test_shared_attack_types_local():
+    records = get_shared_attack_types_local(create_fixture_graph())
+
+    assert records[0] == {
+        **IRAQ,
+        'attack_strategies': [
+            {'attack_type': 'Bombing', 'groups': ['Alpha', 'Beta'], 'groups_count': 2},
+            {'attack_type': 'Armed Assault', 'groups': ['Alpha'], 'groups_count': 1}
+        ],
+        'unique_attack_types_count': 2
+    }
+    assert records[1]['country'] == 'Peru'
+    assert records[1]['unique_attack_types_count'] == 2
+
+
+def test_groups_shared_targets_local():
+    records = {r['country']: r for r in get_groups_shared_targets_local(create_fixture_graph())}
+
+    assert sorted(records['Iraq']['shared_targets'], key=lambda t: t['groups']) == [
+        {'target_types': [['Armed Assault'], ['Bombing']], 'groups': ['Alpha'], 'groups_count': 1},
+        {'target_types': [['Bombing']], 'groups': ['Beta'], 'groups_count': 1}
+    ]
+    assert records['Peru']['shared_targets'] == [
+        {'target_types': [['Bombing', 'Armed Assault']], 'groups': ['Gamma'], 'groups_count': 1}
+    ]
+    assert records['Iraq']['max_shared_groups'] == 1
+
+
+def test_read_change_log_resumes_from_offset(tmp_path):
+    log_path = tmp_path / 'graph.log'
+    first = {'type': 'nodes', 'node_type': 'attacks', 'data': [{'id': 'a1'}]}
+    second = {'type': 'nodes', 'node_type': 'attacks', 'data': [{'id': 'a2'}]}
+    log_path.write_text(json.dumps(first) + '\n' + json.dumps(second)[:10], encoding='utf-8')
+
+    changes, offset = read_change_log(log_path)
+    assert changes == [first]
+    assert offset == len(json.dumps(first)) + 1
+
+    # The partially written entry is picked up once the consumer finishes the line
+    log_path.write_text(json.dumps(first) + '\n' + json.dumps(second) + '\n', encoding='utf-8')
+    changes, offset = read_change_log(log_path, offset)
+    assert changes == [second]
+    assert offset == log_path.stat().st_size
+    assert read_change_log(log_path, offset) == ([], offset)